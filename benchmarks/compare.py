@@ -0,0 +1,61 @@
+""" compare.py
+    Nicholas Boucher 2020
+
+    Comparison of two benchmark result files, flagging the metrics
+    which regressed between them.
+"""
+
+from json import load
+from argparse import ArgumentParser
+
+
+# Default relative slowdown beyond which a metric is flagged as a regression
+THRESHOLD: float = 0.1
+# Default absolute slowdown in seconds below which changes are treated as noise
+MIN_SECONDS: float = 0.01
+READ: str = 'r'
+
+
+def compare(base: dict, new: dict, threshold: float = THRESHOLD, min_seconds: float = MIN_SECONDS) -> list[str]:
+    """Prints each metric of the `base` and `new` benchmark results side by side, returning
+       the metrics which slowed down by more than both `threshold` and `min_seconds`."""
+    regressions: list[str] = []
+    for key in ('parameters', 'options'):
+        if base.get(key) != new.get(key):
+            print(f'Warning: benchmark {key} differ, so results may not be comparable.')
+    print(f'{"metric":<70} {"base":>10} {"new":>10} {"change":>8}')
+    for metric in sorted(set(base['metrics']) | set(new['metrics'])):
+        if metric not in base['metrics'] or metric not in new['metrics']:
+            print(f'{metric:<70} {"only in " + ("new" if metric in new["metrics"] else "base"):>30}')
+            continue
+        before: float = base['metrics'][metric]
+        after: float = new['metrics'][metric]
+        change: float = (after - before) / before if before > 0 else 0
+        regressed: bool = after - before > min_seconds and change > threshold
+        if regressed:
+            regressions.append(metric)
+        print(f'{metric:<70} {before:9.3f}s {after:9.3f}s {change:+8.1%}{"  REGRESSION" if regressed else ""}')
+    return regressions
+
+def main() -> int:
+    """Compares the benchmark result files given on the command line, exiting with a failure
+       status if any metric regressed."""
+    parser = ArgumentParser(description='Compare two ElectionGuard Verify benchmark result files.')
+    parser.add_argument('base', help='Benchmark results JSON to compare against.')
+    parser.add_argument('new', help='Benchmark results JSON to compare.')
+    parser.add_argument('-t', '--threshold', default=THRESHOLD, type=float, help='Relative slowdown beyond which a metric is flagged as a regression.')
+    parser.add_argument('-s', '--min-seconds', default=MIN_SECONDS, type=float, help='Absolute slowdown in seconds below which changes are ignored.')
+    args = parser.parse_args()
+    with open(args.base, READ) as f:
+        base: dict = load(f)
+    with open(args.new, READ) as f:
+        new: dict = load(f)
+    regressions: list[str] = compare(base, new, args.threshold, args.min_seconds)
+    if regressions:
+        print(f'{len(regressions)} metrics regressed.')
+        return 1
+    print('No regressions.')
+    return 0
+
+if __name__ == '__main__':
+    exit(main())
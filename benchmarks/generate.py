@@ -0,0 +1,174 @@
+""" generate.py
+    Nicholas Boucher 2020
+
+    Generation of seeded synthetic ElectionGuard elections using the
+    electionguard package itself, for use as benchmark data.
+
+    Guardian keys, votes, and ballot encryptions are derived from the seed.
+    Proofs generated internally by the electionguard package during the key
+    ceremony and decryption remain randomized.
+"""
+
+from os import getcwd, chdir
+from os.path import abspath, join
+from shutil import move
+from tempfile import TemporaryDirectory
+from random import Random
+from datetime import datetime
+from argparse import ArgumentParser
+from electionguard.election import (ElectionDescription, ElectionType, GeopoliticalUnit, ReportingUnitType, Party,
+                                    Candidate, ContestDescription, SelectionDescription, VoteVariationType, BallotStyle,
+                                    ElectionConstants)
+from electionguard.election_builder import ElectionBuilder
+from electionguard.guardian import Guardian
+from electionguard.key_ceremony import CeremonyDetails
+from electionguard.key_ceremony_mediator import KeyCeremonyMediator
+from electionguard.encrypt import EncryptionDevice, encrypt_ballot
+from electionguard.ballot import PlaintextBallot, PlaintextBallotContest, PlaintextBallotSelection
+from electionguard.ballot_box import BallotBox
+from electionguard.ballot_store import BallotStore
+from electionguard.tally import tally_ballots, publish_ciphertext_tally
+from electionguard.decryption_mediator import DecryptionMediator
+from electionguard.publish import publish, RESULTS_DIR
+from electionguard.group import ElementModQ, int_to_q_unchecked
+from electionguard_verify.constants import Q
+
+
+class Parameters():
+    """The shape of a synthetic election."""
+
+    guardians: int
+    quorum: int
+    missing: int
+    contests: int
+    selections: int
+    ballots: int
+    spoiled: int
+    seed: int
+
+    def __init__(self, guardians: int = 3, quorum: int = 2, missing: int = 1, contests: int = 2, selections: int = 3, ballots: int = 20, spoiled: int = 2, seed: int = 0):
+        """Instantiate election parameters, validating that they describe a decryptable election."""
+        if not 1 <= quorum <= guardians:
+            raise ValueError('The quorum must be between 1 and the number of guardians.')
+        if not 0 <= missing <= guardians - quorum:
+            raise ValueError('At most the number of guardians less the quorum may be missing.')
+        self.guardians = guardians
+        self.quorum = quorum
+        self.missing = missing
+        self.contests = contests
+        self.selections = selections
+        self.ballots = ballots
+        self.spoiled = spoiled
+        self.seed = seed
+
+    def name(self) -> str:
+        """Returns a name uniquely identifying elections generated with these parameters."""
+        return f'n{self.guardians}-k{self.quorum}-m{self.missing}-c{self.contests}-s{self.selections}-b{self.ballots}-x{self.spoiled}-seed{self.seed}'
+
+    def as_dict(self) -> dict[str, int]:
+        """Returns the parameters as a dictionary, for inclusion in benchmark results."""
+        return dict(vars(self))
+
+def generate(directory: str, parameters: Parameters) -> None:
+    """Runs a complete election with the given `parameters`, publishing its results to `directory`."""
+    rng: Random = Random(parameters.seed)
+
+    # Describe an election of one-of-m contests
+    candidates: list[Candidate] = []
+    contests: list[ContestDescription] = []
+    for c in range(parameters.contests):
+        selections: list[SelectionDescription] = []
+        for s in range(parameters.selections):
+            candidates.append(Candidate(f'candidate-{c}-{s}', party_id='party'))
+            selections.append(SelectionDescription(f'selection-{c}-{s}', f'candidate-{c}-{s}', s))
+        contests.append(ContestDescription(f'contest-{c}', 'district', c, VoteVariationType.one_of_m, 1, 1, f'Contest {c}', selections))
+    description: ElectionDescription = ElectionDescription('benchmark', ElectionType.general, datetime(2020, 11, 3), datetime(2020, 11, 3),
+                                                           [GeopoliticalUnit('district', 'District', ReportingUnitType.county)], [Party('party')],
+                                                           candidates, contests, [BallotStyle('style', ['district'])])
+
+    # Hold the key ceremony
+    guardians: list[Guardian] = [Guardian(f'guardian-{i}', i + 1, parameters.guardians, parameters.quorum, random_q(rng)) for i in range(parameters.guardians)]
+    mediator: KeyCeremonyMediator = KeyCeremonyMediator(CeremonyDetails(parameters.guardians, parameters.quorum))
+    # The electionguard package shares the list of announced guardians between mediators
+    mediator._guardians = []
+    for guardian in guardians:
+        mediator.announce(guardian)
+    mediator.orchestrate()
+    if not mediator.verify():
+        raise RuntimeError('Key ceremony failed.')
+    builder: ElectionBuilder = ElectionBuilder(parameters.guardians, parameters.quorum, description)
+    builder.set_public_key(mediator.publish_joint_key())
+    metadata, context = builder.build()
+
+    # Encrypt, then cast or spoil, every ballot
+    device: EncryptionDevice = EncryptionDevice('polling-place')
+    seed_hash: ElementModQ = device.get_hash()
+    store: BallotStore = BallotStore()
+    box: BallotBox = BallotBox(metadata, context, store)
+    cast: list = []
+    spoiled: list = []
+    for b in range(parameters.ballots + parameters.spoiled):
+        plaintext: PlaintextBallot = PlaintextBallot(f'ballot-{b}', 'style', [
+            PlaintextBallotContest(f'contest-{c}', [PlaintextBallotSelection(f'selection-{c}-{rng.randrange(parameters.selections)}', '1')])
+            for c in range(parameters.contests)
+        ])
+        ballot = encrypt_ballot(plaintext, metadata, context, seed_hash, random_q(rng))
+        seed_hash = ballot.tracking_hash
+        if b < parameters.ballots:
+            cast.append(box.cast(ballot))
+        else:
+            spoiled.append(box.spoil(ballot))
+
+    # Decrypt the tally without the missing guardians
+    tally = tally_ballots(store, metadata, context)
+    decryption: DecryptionMediator = DecryptionMediator(metadata, context, tally)
+    for guardian in guardians[:parameters.guardians - parameters.missing]:
+        decryption.announce(guardian)
+    plaintext_tally = decryption.get_plaintext_tally()
+    if plaintext_tally is None:
+        raise RuntimeError('Tally decryption failed.')
+
+    # Publish the results, which the electionguard package writes to fixed paths relative to the working directory
+    cwd: str = getcwd()
+    destination: str = abspath(directory)
+    with TemporaryDirectory() as staging:
+        chdir(staging)
+        try:
+            publish(description, context, ElectionConstants(), [device], cast, spoiled, publish_ciphertext_tally(tally), plaintext_tally,
+                    [guardian.share_coefficient_validation_set() for guardian in guardians], RESULTS_DIR)
+        finally:
+            chdir(cwd)
+        move(join(staging, RESULTS_DIR), destination)
+
+def random_q(rng: Random) -> ElementModQ:
+    """Returns an element of Zᵩ drawn from `rng`."""
+    return int_to_q_unchecked(rng.randrange(1, Q))
+
+def parser_for(description: str) -> ArgumentParser:
+    """Returns an argument parser accepting the election parameters."""
+    defaults: Parameters = Parameters()
+    parser = ArgumentParser(description=description)
+    parser.add_argument('--guardians', default=defaults.guardians, type=int, help='Number of guardians n.')
+    parser.add_argument('--quorum', default=defaults.quorum, type=int, help='Number of guardians k required to decrypt.')
+    parser.add_argument('--missing', default=defaults.missing, type=int, help='Number of guardians missing at decryption.')
+    parser.add_argument('--contests', default=defaults.contests, type=int, help='Number of contests.')
+    parser.add_argument('--selections', default=defaults.selections, type=int, help='Number of selections per contest.')
+    parser.add_argument('--ballots', default=defaults.ballots, type=int, help='Number of cast ballots.')
+    parser.add_argument('--spoiled', default=defaults.spoiled, type=int, help='Number of spoiled ballots.')
+    parser.add_argument('--seed', default=defaults.seed, type=int, help='Seed from which keys, votes, and encryptions are derived.')
+    return parser
+
+def parameters_from(args) -> Parameters:
+    """Returns the election parameters given to a parser from `parser_for`."""
+    return Parameters(args.guardians, args.quorum, args.missing, args.contests, args.selections, args.ballots, args.spoiled, args.seed)
+
+def main() -> int:
+    """Generates a synthetic election from command line arguments."""
+    parser = parser_for('Generate a seeded synthetic ElectionGuard election.')
+    parser.add_argument('directory', help='Directory to publish the election results to.')
+    args = parser.parse_args()
+    generate(args.directory, parameters_from(args))
+    return 0
+
+if __name__ == '__main__':
+    exit(main())
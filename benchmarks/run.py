@@ -0,0 +1,178 @@
+""" run.py
+    Nicholas Boucher 2020
+
+    Benchmarks each verification stage, and the command line utility,
+    against a seeded synthetic election, writing the results as JSON.
+"""
+
+from sys import argv, executable, version
+from os import makedirs
+from os.path import join, exists, split
+from json import dump
+from time import perf_counter
+from datetime import datetime
+from platform import platform
+from statistics import median
+from subprocess import run, DEVNULL
+from importlib.metadata import version as package_version
+from io import StringIO
+from contextlib import redirect_stdout
+from logging import basicConfig, ERROR
+from electionguard.serializable import read_json
+from electionguard.election import CiphertextElectionContext, ElectionDescription, ElectionConstants
+from electionguard.tally import PublishedCiphertextTally, PlaintextTally
+from electionguard.encrypt import EncryptionDevice
+from electionguard.ballot import CiphertextAcceptedBallot
+from electionguard.key_ceremony import CoefficientValidationSet
+from electionguard.publish import (DESCRIPTION_FILE_NAME, CONTEXT_FILE_NAME, CONSTANTS_FILE_NAME, ENCRYPTED_TALLY_FILE_NAME,
+                                  TALLY_FILE_NAME, DEVICES_DIR, BALLOTS_DIR, SPOILED_DIR, COEFFICIENTS_DIR)
+from electionguard_verify import command_line
+from electionguard_verify.verify import verify
+from electionguard_verify.metrics import Report
+from electionguard_verify.loader import Loader, json_files
+from benchmarks.generate import Parameters, generate, parser_for, parameters_from
+
+
+# Default directory in which generated elections are kept between runs
+WORK_DIR: str = '.benchmarks'
+READ: str = 'r'
+JSON_EXT: str = '.json'
+
+
+def election_for(parameters: Parameters, work_dir: str) -> str:
+    """Returns the results directory of an election with the given `parameters`, generating it
+       if it does not already exist in `work_dir`."""
+    directory: str = join(work_dir, parameters.name())
+    if not exists(directory):
+        makedirs(work_dir, exist_ok=True)
+        print(f'Generating election {parameters.name()}...')
+        generate(directory, parameters)
+    return directory
+
+def read(path: str, cls):
+    """Returns the contents of the JSON file at `path` deserialized as `cls`."""
+    with open(path, READ) as f:
+        return read_json(f.read(), cls)
+
+def time_stages(directory: str, options: dict) -> tuple[dict[str, float], float, bool]:
+    """Verifies the election in `directory` with the verify() keyword arguments `options`, returning
+       the seconds spent in each stage, the total seconds, and the verification result. All
+       election artifacts are loaded beforehand so that only verification is timed."""
+    description = read(join(directory, DESCRIPTION_FILE_NAME + JSON_EXT), ElectionDescription)
+    context = read(join(directory, CONTEXT_FILE_NAME + JSON_EXT), CiphertextElectionContext)
+    constants = read(join(directory, CONSTANTS_FILE_NAME + JSON_EXT), ElectionConstants)
+    ciphertext_tally = read(join(directory, ENCRYPTED_TALLY_FILE_NAME + JSON_EXT), PublishedCiphertextTally)
+    plaintext_tally = read(join(directory, TALLY_FILE_NAME + JSON_EXT), PlaintextTally)
+    with Loader() as loader:
+        devices = list(loader.load(json_files(join(directory, split(DEVICES_DIR)[-1])), EncryptionDevice))
+        ballots = list(loader.load(json_files(join(directory, split(BALLOTS_DIR)[-1])), CiphertextAcceptedBallot))
+        spoiled = list(loader.load(json_files(join(directory, split(SPOILED_DIR)[-1])), CiphertextAcceptedBallot))
+        coefficients = list(loader.load(json_files(join(directory, split(COEFFICIENTS_DIR)[-1])), CoefficientValidationSet))
+
+    # As ballots are verified in a single pass, the ballot selection encryption stage includes the vote limit checks
+    report: Report = Report()
+    start: float = perf_counter()
+    valid: bool = verify(description, context, constants, devices, ballots, spoiled, ciphertext_tally, plaintext_tally, coefficients, report=report, **options)
+    total: float = perf_counter() - start
+    return {stage.title: stage.wall_seconds for stage in report.stages}, total, valid
+
+def load_only(description, context, constants, devices, ciphertext_ballots, spoiled_ballots, ciphertext_tally, plaintext_tally, coefficient_validation_sets, *args, **kwargs) -> bool:
+    """Stands in for verify(), consuming every lazily loaded ballot and streamed tally member
+       without verifying them, so that loading and deserialization are still timed."""
+    for _ in ciphertext_ballots:
+        pass
+    for _ in spoiled_ballots:
+        pass
+    for _ in ciphertext_tally.cast.values():
+        pass
+    for _ in plaintext_tally.spoiled_ballots.values():
+        pass
+    return True
+
+def time_cli_load(directory: str) -> float:
+    """Returns the seconds taken by the command line utility to load the election in `directory`,
+       with verification itself replaced by `load_only`."""
+    verify_function = command_line.verify
+    command_line.verify = load_only
+    arguments: list[str] = argv[:]
+    argv[1:] = [directory, '--no-cache', '-n']
+    try:
+        start: float = perf_counter()
+        with redirect_stdout(StringIO()):
+            command_line.main()
+        return perf_counter() - start
+    finally:
+        command_line.verify = verify_function
+        argv[:] = arguments
+
+def time_cli(directory: str, arguments: list[str]) -> float:
+    """Returns the wall time of a complete command line verification of `directory`, including
+       interpreter start up, raising if the election does not verify."""
+    start: float = perf_counter()
+    run([executable, '-c', 'import sys; from electionguard_verify.command_line import main; sys.exit(main())', directory, '--no-cache', '-n', *arguments],
+        stdout=DEVNULL, check=True)
+    return perf_counter() - start
+
+def environment() -> dict[str, str]:
+    """Returns a description of the environment the benchmarks were run in."""
+    return {
+        'timestamp': datetime.now().isoformat(),
+        'python': version,
+        'platform': platform(),
+        'electionguard': package_version('electionguard'),
+        'gmpy2': package_version('gmpy2')
+    }
+
+def main() -> int:
+    """Runs the benchmarks with the parameters given on the command line."""
+    parser = parser_for('Benchmark ElectionGuard Verify against a seeded synthetic election.')
+    parser.add_argument('-o', '--output', default='benchmark.json', help='File to write the benchmark results JSON to.')
+    parser.add_argument('-r', '--repeat', default=3, type=int, help='Number of times each measurement is repeated. The median is reported.')
+    parser.add_argument('--work-dir', default=WORK_DIR, help='Directory in which generated elections are kept between runs.')
+    parser.add_argument('--jobs', default=1, type=int, help='Number of worker processes used to verify ballot selection proofs.')
+    parser.add_argument('--batch', default=False, action='store_true', help='Check proof equations with the randomized small-exponents batch test.')
+    parser.add_argument('--strict-residues', default=False, action='store_true', help='Check membership of every element in Zₚʳ with a full exponentiation.')
+    args = parser.parse_args()
+
+    basicConfig(level=ERROR, format='%(message)s')
+
+    parameters: Parameters = parameters_from(args)
+    directory: str = election_for(parameters, args.work_dir)
+    options: dict = {'workers': args.jobs, 'batch': args.batch, 'strict_residues': args.strict_residues}
+    cli_arguments: list[str] = ['--jobs', str(args.jobs)] + (['--batch'] if args.batch else []) + (['--strict-residues'] if args.strict_residues else [])
+
+    # Take the median of each measurement over all repetitions
+    stage_runs: list[dict[str, float]] = []
+    verify_runs: list[float] = []
+    for i in range(args.repeat):
+        print(f'Timing verification stages ({i + 1}/{args.repeat})...')
+        stages, total, valid = time_stages(directory, options)
+        if not valid:
+            raise RuntimeError(f'Synthetic election {directory} failed verification.')
+        stage_runs.append(stages)
+        verify_runs.append(total)
+    print('Timing command line utility...')
+    cli_load_runs: list[float] = [time_cli_load(directory) for _ in range(args.repeat)]
+    cli_runs: list[float] = [time_cli(directory, cli_arguments) for _ in range(args.repeat)]
+
+    results: dict = {
+        'environment': environment(),
+        'parameters': parameters.as_dict(),
+        'options': options,
+        'repeat': args.repeat,
+        'metrics': {
+            **{f'stage/{title}': median(stage_run[title] for stage_run in stage_runs) for title in stage_runs[0]},
+            'verify': median(verify_runs),
+            'cli/load': median(cli_load_runs),
+            'cli/total': median(cli_runs)
+        }
+    }
+    with open(args.output, 'w') as f:
+        dump(results, f, indent=2, ensure_ascii=False)
+    for metric, seconds in results['metrics'].items():
+        print(f'{metric:<70} {seconds:10.3f}s')
+    print(f'Results written to {args.output}.')
+    return 0
+
+if __name__ == '__main__':
+    exit(main())
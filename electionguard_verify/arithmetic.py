@@ -0,0 +1,114 @@
+""" arithmetic.py
+    Nicholas Boucher 2020
+
+    Big-integer arithmetic backends for the verification hot paths, which work on
+    raw integers rather than allocating electionguard group elements for every
+    intermediate value. A GMP-backed backend is used when gmpy2 is installed,
+    falling back to a pure Python backend otherwise.
+"""
+
+from abc import ABC, abstractmethod
+from electionguard_verify.constants import P, Q
+
+try:
+    import gmpy2
+except ImportError:
+    gmpy2 = None
+
+
+class Backend(ABC):
+    """Modular arithmetic on the backend's native integer type. Values of the native type
+       support the usual integer operators, so hot loops multiply and reduce them directly.
+       Backends must implement every abstract method to be instantiated."""
+
+    name: str
+    p: int
+    q: int
+
+    def __init__(self):
+        """Instantiate the backend, converting the group moduli to its integer type once."""
+        self.p = self.integer(P)
+        self.q = self.integer(Q)
+
+    @abstractmethod
+    def integer(self, value: int) -> int:
+        """Returns `value` as the backend's native integer type."""
+
+    @abstractmethod
+    def powmod(self, base: int, exponent: int, modulus: int) -> int:
+        """Returns base^exponent mod `modulus` for a non-negative `exponent`."""
+
+    @abstractmethod
+    def invert(self, value: int, modulus: int) -> int:
+        """Returns the inverse of `value` mod `modulus`, raising ZeroDivisionError if none exists."""
+
+    @abstractmethod
+    def jacobi(self, value: int, modulus: int) -> int:
+        """Returns the Jacobi symbol of `value` over the odd positive `modulus`."""
+
+class PythonBackend(Backend):
+    """Arithmetic using Python's built-in integers."""
+
+    name: str = 'python'
+
+    def integer(self, value: int) -> int:
+        return int(value)
+
+    def powmod(self, base: int, exponent: int, modulus: int) -> int:
+        return pow(base, exponent, modulus)
+
+    def invert(self, value: int, modulus: int) -> int:
+        try:
+            return pow(value, -1, modulus)
+        except ValueError:
+            raise ZeroDivisionError('Value is not invertible.')
+
+    def jacobi(self, value: int, modulus: int) -> int:
+        value %= modulus
+        result: int = 1
+        while value:
+            while value % 2 == 0:
+                value //= 2
+                if modulus % 8 in (3, 5):
+                    result = -result
+            value, modulus = modulus, value
+            if value % 4 == 3 and modulus % 4 == 3:
+                result = -result
+            value %= modulus
+        return result if modulus == 1 else 0
+
+class GmpyBackend(Backend):
+    """Arithmetic using GMP through gmpy2."""
+
+    name: str = 'gmpy2'
+
+    def integer(self, value: int) -> int:
+        return gmpy2.mpz(value)
+
+    def powmod(self, base: int, exponent: int, modulus: int) -> int:
+        return gmpy2.powmod(base, exponent, modulus)
+
+    def invert(self, value: int, modulus: int) -> int:
+        return gmpy2.invert(value, modulus)
+
+    def jacobi(self, value: int, modulus: int) -> int:
+        return gmpy2.jacobi(value, modulus)
+
+# Backends available in this environment, by name, in order of preference
+BACKENDS: dict[str, type] = {backend.name: backend for backend in ([GmpyBackend] if gmpy2 else []) + [PythonBackend]}
+# Backend used by the verification hot paths, chosen at startup
+BACKEND: Backend = next(iter(BACKENDS.values()))()
+
+
+def backend() -> Backend:
+    """Returns the backend currently in use."""
+    return BACKEND
+
+def set_backend(name: str) -> Backend:
+    """Selects the backend `name` for all following arithmetic, raising ValueError if it is not available.
+       Worker processes do not inherit the selection, and select the backend again when started."""
+    global BACKEND
+    if name not in BACKENDS:
+        raise ValueError(f'Arithmetic backend {name} is not available. Available backends are: {", ".join(BACKENDS)}.')
+    BACKEND = BACKENDS[name]()
+    return BACKEND
@@ -0,0 +1,167 @@
+""" checkpoint.py
+    Nicholas Boucher 2020
+
+    Periodic checkpoints of the progress of a verification run, allowing a run
+    which was interrupted, e.g. by the process being killed or the machine being
+    preempted, to resume from the last checkpoint rather than from the start.
+"""
+
+from os import replace, remove, makedirs
+from os.path import exists, dirname
+from json import dump, load
+from time import monotonic
+from logging import info
+from typing import Iterable, Iterator
+from itertools import islice
+from electionguard.ballot import CiphertextAcceptedBallot
+from electionguard_verify.store import encode_products, decode_products
+from electionguard_verify.pack import stat_digest
+from electionguard_verify.utils import Invariants, Aggregates, warn
+
+
+# Default file name of the checkpoint within the cache directory of an election results directory
+CHECKPOINT_FILE_NAME: str = 'egverify_checkpoint.json'
+# Default number of seconds between checkpoints of the ballot verification progress
+CHECKPOINT_INTERVAL: float = 300
+# Version of the checkpoint format, to be incremented whenever the checks of any stage change
+CHECKPOINT_VERSION: int = 2
+READ: str = 'r'
+WRITE: str = 'w'
+
+
+class Checkpoint():
+    """The verification stages which have finished, with the outcome of their invariants,
+       along with the progress of the encrypted ballot stage: the number of ballots verified
+       so far, the running states of the ballot selection encryption and vote limit invariants,
+       and the running aggregates (A,B). Once the ballot stage has finished, the aggregates hold
+       the products over every cast ballot. A checkpoint without a `path` is never saved."""
+
+    path: str
+    digest: str
+    interval: float
+    stages: dict[str, dict]
+    ballots: int
+    skipped: int
+    progress: dict[str, dict]
+    aggregates: Aggregates
+    saved: float
+
+    def __init__(self, path: str = None, digest: str = None, interval: float = CHECKPOINT_INTERVAL):
+        """Instantiate an empty checkpoint of a run over the inputs with `digest`, saved to `path`
+           at most once every `interval` seconds during the encrypted ballot stage."""
+        self.path = path
+        self.digest = digest
+        self.interval = interval
+        self.stages = {}
+        self.ballots = 0
+        self.skipped = 0
+        self.progress = {}
+        self.aggregates = Aggregates()
+        self.saved = monotonic()
+
+    def restore(self, *stages: Invariants) -> bool:
+        """Returns whether every stage of `stages` had finished, in which case the outcome of their
+           invariants is restored into them and the stages need not be verified again."""
+        if not all(invariants.title in self.stages for invariants in stages):
+            return False
+        for invariants in stages:
+            invariants.conditions = dict(self.stages[invariants.title]['conditions'])
+            invariants.failures = {invariant: list(elements) for invariant, elements in self.stages[invariants.title]['failures'].items()}
+            info(f'Restored {invariants.title} from checkpoint {self.path}.' if self.path else f'Restored {invariants.title} from earlier verification.')
+        return True
+
+    def finish(self, *stages: Invariants, aggregates: Aggregates = None) -> None:
+        """Records that every stage of `stages` has finished, along with the final `aggregates`
+           if given, and saves the checkpoint."""
+        for invariants in stages:
+            self.stages[invariants.title] = {'conditions': invariants.conditions, 'failures': invariants.failures}
+        if aggregates is not None:
+            self.ballots = 0
+            self.progress = {}
+            self.aggregates = aggregates
+        self.save()
+
+    def skip(self) -> int:
+        """Returns the number of encrypted ballots which were already verified, for a caller which leaves
+           them out of the ballots passed to resume(), so that their files need not be loaded at all."""
+        self.skipped = self.ballots
+        return self.skipped
+
+    def resume(self, ballots: Iterable[CiphertextAcceptedBallot], aggregates: Aggregates, *stages: Invariants) -> Iterator[CiphertextAcceptedBallot]:
+        """Restores the running invariants of the encrypted ballot `stages` and the running `aggregates`
+           into them, returning the remainder of `ballots` following the ballots which were already
+           verified, less those left out after skip(). Ballots must be supplied in the same order as
+           in the interrupted run."""
+        for invariants in stages:
+            invariants.merge(self.running(invariants.title))
+        aggregates.merge(self.aggregates)
+        if self.ballots:
+            info(f'Resuming encrypted ballot verification after {self.ballots} ballots from checkpoint {self.path}.')
+        return islice(ballots, self.ballots - self.skipped, None)
+
+    def advance(self, ballots: int, aggregates: Aggregates, *stages: Invariants) -> None:
+        """Records that a further `ballots` encrypted ballots were verified, leaving the running
+           invariants `stages` and `aggregates`, and saves the checkpoint if `interval` seconds
+           have passed since it was last saved."""
+        self.ballots += ballots
+        if self.path and monotonic() - self.saved >= self.interval:
+            self.progress = {invariants.title: {'conditions': invariants.conditions, 'failures': invariants.failures} for invariants in stages}
+            self.aggregates = aggregates
+            self.save()
+
+    def running(self, title: str) -> Invariants:
+        """Returns the running invariants of the encrypted ballot stage `title`."""
+        invariants: Invariants = Invariants(title)
+        if title in self.progress:
+            invariants.conditions = dict(self.progress[title]['conditions'])
+            invariants.failures = {invariant: list(elements) for invariant, elements in self.progress[title]['failures'].items()}
+        return invariants
+
+    def save(self) -> None:
+        """Writes the checkpoint as JSON to `path`, replacing the previous checkpoint atomically
+           so that an interruption while saving leaves the previous checkpoint intact."""
+        self.saved = monotonic()
+        if not self.path:
+            return
+        makedirs(dirname(self.path) or '.', exist_ok=True)
+        with open(self.path + '.tmp', WRITE) as f:
+            dump({
+                'version': CHECKPOINT_VERSION,
+                'digest': self.digest,
+                'stages': self.stages,
+                'ballots': self.ballots,
+                'progress': self.progress,
+                'products': encode_products(self.aggregates)
+            }, f, ensure_ascii=False)
+        replace(self.path + '.tmp', self.path)
+        info(f'Saved checkpoint {self.path}.')
+
+    def remove(self) -> None:
+        """Deletes the saved checkpoint, once the run it records has completed."""
+        if self.path and exists(self.path):
+            remove(self.path)
+
+def read_checkpoint(path: str, digest: str, interval: float = CHECKPOINT_INTERVAL) -> Checkpoint:
+    """Returns the checkpoint saved to `path` if it was taken over the inputs with `digest`,
+       otherwise an empty checkpoint to be saved to `path` in its place."""
+    checkpoint: Checkpoint = Checkpoint(path, digest, interval)
+    if not exists(path):
+        warn(f'No checkpoint {path} was found to resume from. Verifying from the start.')
+        return checkpoint
+    with open(path, READ) as f:
+        saved: dict = load(f)
+    if saved['version'] != CHECKPOINT_VERSION:
+        warn(f'Checkpoint {path} was saved by an incompatible version of the verifier and will be ignored.')
+    elif saved['digest'] != digest:
+        warn(f'Checkpoint {path} was saved over different election inputs and will be ignored.')
+    else:
+        checkpoint.stages = saved['stages']
+        checkpoint.ballots = saved['ballots']
+        checkpoint.progress = saved['progress']
+        checkpoint.aggregates = decode_products(saved['products'])
+    return checkpoint
+
+def input_digest(files: Iterable[str]) -> str:
+    """Returns a digest over the names, sizes, and modification times of the election input `files`, to
+       which a checkpoint is tied. Contents are not read, so that resuming does not read every input."""
+    return stat_digest(files).hex()
@@ -5,19 +5,37 @@
     and invoking verification utility on the deserialized data.
 """
 
+from sys import argv
+from time import sleep
+from contextlib import nullcontext
+from secrets import randbits
 from os import getcwd
 from os.path import join, split
-from glob import glob
-from typing import Iterable
-from argparse import ArgumentParser
-from logging import basicConfig, INFO, ERROR
+from typing import Iterator, Callable
+from sqlite3 import Error as SQLiteError
+from argparse import ArgumentParser, ArgumentTypeError
+from logging import basicConfig, info, INFO, ERROR
 from electionguard.serializable import read_json
 from electionguard.election import CiphertextElectionContext, ElectionDescription, ElectionConstants
 from electionguard.tally import PublishedCiphertextTally, PlaintextTally
 from electionguard.encrypt import EncryptionDevice
 from electionguard.ballot import CiphertextAcceptedBallot
 from electionguard.key_ceremony import CoefficientValidationSet
-from electionguard_verify.verify import verify
+from electionguard_verify.verify import verify, verify_shard, ballot_pool, IN_FLIGHT, STAGES
+from electionguard_verify.fixed_base import TABLE_MEMORY, window_for
+from electionguard_verify.equations import SOUNDNESS
+from electionguard_verify.loader import Loader, LOAD_CONCURRENCY, json_files
+from electionguard_verify.metrics import Report
+from electionguard_verify.arithmetic import BACKENDS, backend, set_backend
+from electionguard_verify.selftest import TRIALS, self_test as self_test_backends
+from electionguard_verify.store import ResultStore, STORE_FILE_NAME, STORE_SIZE
+from electionguard_verify.pack import Pack, PACK_FILE_NAME, fresh_pack, source_digest, stat_digest, write_pack
+from electionguard_verify.watch import Watcher, POLL_INTERVAL
+from electionguard_verify.sample import Sample, CONFIDENCE
+from electionguard_verify.stream import read_plaintext_tally, read_ciphertext_tally
+from electionguard_verify.utils import Contests, cache_path, warn
+from electionguard_verify.checkpoint import Checkpoint, CHECKPOINT_FILE_NAME, CHECKPOINT_INTERVAL, read_checkpoint, input_digest
+from electionguard_verify.shard import Partial, SHARD_PREFIX, shard_of, manifest_digest, read_partial, merge_partials, read_key
 from electionguard.publish import (DESCRIPTION_FILE_NAME, CONTEXT_FILE_NAME, CONSTANTS_FILE_NAME, ENCRYPTED_TALLY_FILE_NAME,
                                   TALLY_FILE_NAME, DEVICES_DIR, DEVICE_PREFIX, BALLOTS_DIR, BALLOT_PREFIX, SPOILED_DIR,
                                   COEFFICIENTS_DIR, COEFFICIENT_PREFIX)
@@ -33,8 +51,356 @@ def main() -> int:
     """Function which reads and deserializes election results into memory via command line arguments
        and then invokes verification function. Primary target of command line utility."""
 
+    # Dispatch subcommands, otherwise verify the election results directory given
+    if len(argv) > 1 and argv[1] in COMMANDS:
+        return COMMANDS[argv[1]](argv[2:])
+
     # Parse argument from command line
     parser = ArgumentParser(description='ElectionGuard Verifier.')
+    add_election_arguments(parser)
+    parser.add_argument('-P', '--pack', help="Ballot pack file created by egverify pack, overriding the pack in the user's cache directory.")
+    parser.add_argument('-r', '--result-store', help="File storing the results of previously verified ballots, overriding the file in the user's cache directory.")
+    parser.add_argument('--result-store-size', default=STORE_SIZE // (1024 * 1024), type=int, help='Maximum size in MiB of the result store, beyond which the least recently used results are evicted.')
+    parser.add_argument('--no-cache', default=False, action='store_true', help='Verify every ballot without reading or saving stored results.')
+    parser.add_argument('--rebuild-cache', default=False, action='store_true', help='Discard all stored results before verifying.')
+    parser.add_argument('--checkpoint', default=False, action='store_true', help='Periodically save verification progress, so that an interrupted run can be resumed with --resume.')
+    parser.add_argument('--checkpoint-file', help="File to save verification progress to, overriding the file in the user's cache directory.")
+    parser.add_argument('--checkpoint-interval', default=CHECKPOINT_INTERVAL, type=float, help='Seconds between saves of encrypted ballot verification progress.')
+    parser.add_argument('--resume', default=False, action='store_true', help='Resume from the progress saved by an interrupted run over the same election inputs. Implies --checkpoint.')
+    parser.add_argument('--fail-fast', default=False, action='store_true', help='Stop at the first failing check, reporting the element that failed it.')
+    parser.add_argument('--sample-rate', type=float, help='Verify the encrypted ballot proofs of a random sample of this fraction of ballots, while aggregating every ballot.')
+    parser.add_argument('--confidence', default=CONFIDENCE, type=float, help='Confidence of the bound on ballots with invalid proofs missed by the sample.')
+    parser.add_argument('--seed', default=randbits(64), type=int, help='Seed from which the sample is drawn, to reproduce a previous sample.')
+    parser.add_argument('--stages', type=stage_list, default=STAGES, help=f'Comma-separated verification stages to run, skipping the others and the inputs only they read. Stages are: {",".join(STAGES)}.')
+    add_loading_arguments(parser)
+    add_proof_arguments(parser)
+    add_output_arguments(parser)
+    args = parser.parse_args()
+    configure_logging(args)
+    set_backend(args.backend)
+
+    # Draw the sample of a sampling audit, which stands in for every ballot only within its own run
+    sample: Sample = None
+    if args.sample_rate is not None:
+        if args.checkpoint or args.resume:
+            parser.error('--sample-rate cannot be combined with --checkpoint or --resume.')
+        try:
+            sample = Sample(args.sample_rate, args.seed, args.confidence)
+        except ValueError as e:
+            parser.error(str(e))
+
+    # Deserialize election results, skipping the tallies if no selected stage reads them
+    description, context, constants, ciphertext_tally, plaintext_tally = read_election(args, selects(args, 'aggregation', 'recovery', 'decryption', 'spoiled'))
+
+    # Open the result store of previously verified ballots
+    store: ResultStore = None if args.no_cache else open_store(args)
+
+    with Loader(args.load_concurrency, args.decode_processes) as loader:
+        devices: list[EncryptionDevice] = []
+        if selects(args, 'ballots', 'limits'):
+            devices = list(loader.load(device_files(args), EncryptionDevice, 'device'))
+
+        # Only a pack written by egverify pack or chosen by the user is read, never one found among the published files
+        enc_ballot_files: list[str] = encrypted_ballot_files(args)
+        pack: Pack = None
+        if selects(args, 'ballots', 'limits', 'aggregation'):
+            pack = fresh_pack(args.pack or cache_path(args.directory, PACK_FILE_NAME), enc_ballot_files, args.pack != None)
+
+        coefficient_validation_sets: list[CoefficientValidationSet] = []
+        if selects(args, 'keys', 'aggregation', 'recovery', 'spoiled'):
+            coefficient_validation_sets = list(loader.load(coefficient_files(args), CoefficientValidationSet, 'coefficient validation set'))
+
+        # Tie checkpoints to the election inputs read by the selected stages, including the ballot pack, which determines the order ballots are verified in
+        checkpoint: Checkpoint = None
+        if args.checkpoint or args.resume:
+            checkpoint_path: str = args.checkpoint_file or cache_path(args.directory, CHECKPOINT_FILE_NAME)
+            digest: str = input_digest(input_files(args, enc_ballot_files) + ([pack.path] if pack else []))
+            if args.resume:
+                checkpoint = read_checkpoint(checkpoint_path, digest, args.checkpoint_interval)
+            else:
+                checkpoint = Checkpoint(checkpoint_path, digest, args.checkpoint_interval)
+
+        # Encrypted ballots are read lazily, and only if a selected stage reads them, skipping those a checkpoint records as verified
+        ciphertext_ballots: Iterator[CiphertextAcceptedBallot] = iter([])
+        if selects(args, 'ballots', 'limits', 'aggregation'):
+            start: int = checkpoint.skip() if checkpoint else 0
+            if pack:
+                ciphertext_ballots = pack.ballots(start)
+            else:
+                ciphertext_ballots = loader.load(enc_ballot_files[start:], CiphertextAcceptedBallot, 'encrypted ballot')
+
+        spoiled_ballots: Iterator[CiphertextAcceptedBallot] = loader.load(spoiled_ballot_files(args), CiphertextAcceptedBallot, 'spoiled ballot')
+
+        # Verify election
+        report: Report = Report()
+        is_valid: bool = verify(
+            description,
+            context,
+            constants,
+            devices,
+            ciphertext_ballots,
+            spoiled_ballots,
+            ciphertext_tally,
+            plaintext_tally,
+            coefficient_validation_sets,
+            args.jobs,
+            args.window,
+            args.table_memory * 1024 * 1024,
+            args.batch,
+            args.soundness,
+            args.strict_residues,
+            args.in_flight,
+            store,
+            report,
+            checkpoint=checkpoint,
+            fail_fast=args.fail_fast,
+            stages=args.stages,
+            sample=sample
+        )
+    if store:
+        store.close()
+    if checkpoint:
+        checkpoint.remove()
+    write_report(args, report)
+
+    # Exit with result
+    return verdict(args, is_valid, sample)
+
+def pack(args: list[str]) -> int:
+    """Function which packs the encrypted ballots of an election results directory into a single
+       binary file, which later verifications read in place of the ballot JSON files."""
+
+    # Parse arguments from command line
+    parser = ArgumentParser(prog='egverify pack', description='Pack ElectionGuard encrypted ballots into a compact binary file.')
+    parser.add_argument('directory', default=getcwd(), nargs='?', help='Directory containing election files.')
+    parser.add_argument('-o', '--output', help="File to write the ballot pack to, overriding the default file in the user's cache directory.")
+    parser.add_argument('-b', '--encrypted-ballots-prefix', help="Prefix for encrypted ballot JSON file names, overriding default prefix.")
+    parser.add_argument('-B', '--encrypted-ballots-dir', help="Directory containing encrypted ballots JSON, overriding election subdirectory.")
+    parser.add_argument('-l', '--load-concurrency', default=LOAD_CONCURRENCY, type=int, help='Number of JSON files read and deserialized concurrently.')
+    parser.add_argument('-v', '--verbose', default=False, action='store_true', help='Output packing details.')
+    args = parser.parse_args(args)
+    basicConfig(level=INFO if args.verbose else ERROR, format='%(message)s')
+
+    # Pack encrypted ballots
+    enc_ballot_files: list[str] = encrypted_ballot_files(args)
+    output: str = args.output or cache_path(args.directory, PACK_FILE_NAME)
+    with Loader(args.load_concurrency) as loader:
+        try:
+            count: int = write_pack(output, loader.load(enc_ballot_files, CiphertextAcceptedBallot, 'encrypted ballot'), source_digest(enc_ballot_files), stat_digest(enc_ballot_files))
+        except ValueError as e:
+            print(e)
+            return EXIT_FAILURE
+    print(f"Packed {count} encrypted ballots into {output}.")
+    return EXIT_SUCCESS
+
+def shard(args: list[str]) -> int:
+    """Function which verifies one shard of the encrypted ballot files and spoiled ballots of an
+       election results directory, writing a partial result to be combined by egverify merge."""
+
+    # Parse arguments from command line
+    parser = ArgumentParser(prog='egverify shard', description='Verify one shard of the ballots of an ElectionGuard election.')
+    add_election_arguments(parser)
+    parser.add_argument('--shard-index', required=True, type=int, help='Index of the shard to verify, from 0 to the number of shards less one.')
+    parser.add_argument('--shard-count', required=True, type=int, help='Number of shards the ballots are divided into.')
+    parser.add_argument('-o', '--output', help='File to write the partial result to, overriding the default file in election directory.')
+    parser.add_argument('--key', help='File containing a secret key with which the partial result is signed.')
+    add_loading_arguments(parser)
+    add_proof_arguments(parser)
+    add_output_arguments(parser)
+    args = parser.parse_args(args)
+    if not 0 <= args.shard_index < args.shard_count:
+        parser.error('The shard index must be between 0 and the number of shards less one.')
+    configure_logging(args)
+    set_backend(args.backend)
+
+    # Select the ballots of this shard
+    description, context, constants, _, plaintext_tally = read_election(args)
+    enc_ballot_files: list[str] = encrypted_ballot_files(args)
+    shard_files: list[str] = [file for file in enc_ballot_files if shard_of(file, args.shard_count) == args.shard_index]
+    spoiled_ballots: dict = {ballot_id: ballot for ballot_id, ballot in plaintext_tally.spoiled_ballots.items() if shard_of(ballot_id, args.shard_count) == args.shard_index}
+
+    # Verify the shard
+    report: Report = Report()
+    with Loader(args.load_concurrency, args.decode_processes) as loader:
+        coefficient_validation_sets: list[CoefficientValidationSet] = list(loader.load(coefficient_files(args), CoefficientValidationSet, 'coefficient validation set'))
+        ballot_selections, vote_limits, spoils, aggregates = verify_shard(
+            description,
+            context,
+            constants,
+            loader.load(shard_files, CiphertextAcceptedBallot, 'encrypted ballot'),
+            spoiled_ballots,
+            coefficient_validation_sets,
+            args.jobs,
+            args.window,
+            args.table_memory * 1024 * 1024,
+            args.batch,
+            args.soundness,
+            args.strict_residues,
+            args.in_flight,
+            report
+        )
+    partial: Partial = Partial(args.shard_index, args.shard_count, hex(context.crypto_extended_base_hash.elem), manifest_digest(enc_ballot_files), len(enc_ballot_files),
+                               len(shard_files), sorted(spoiled_ballots), ballot_selections, vote_limits, spoils, aggregates)
+    output: str = args.output or join(args.directory, f'{SHARD_PREFIX}{args.shard_index}_of_{args.shard_count}{JSON_EXT}')
+    partial.write(output, read_key(args.key) if args.key else None)
+    write_report(args, report)
+
+    # Exit with the result of this shard
+    print(f"Verified {len(shard_files)} of {len(enc_ballot_files)} encrypted ballot files and {len(spoiled_ballots)} spoiled ballots, writing the partial result to {output}.")
+    if report.valid():
+        print(f"Shard {args.shard_index} of {args.shard_count} valid.")
+        return EXIT_SUCCESS
+    else:
+        print(f"Shard {args.shard_index} of {args.shard_count} invalid.")
+        return EXIT_FAILURE
+
+def merge(args: list[str]) -> int:
+    """Function which combines the partial results written by egverify shard for every shard of an
+       election results directory, completing the tally-level verification of the election."""
+
+    # Parse arguments from command line
+    parser = ArgumentParser(prog='egverify merge', description='Merge the partial results of every shard of an ElectionGuard election and verify the election.')
+    add_election_arguments(parser)
+    parser.add_argument('partials', nargs='*', help='Partial result files written by egverify shard, overriding the files found in election directory.')
+    parser.add_argument('--key', help='File containing the secret key every partial result must be signed with.')
+    parser.add_argument('-l', '--load-concurrency', default=LOAD_CONCURRENCY, type=int, help='Number of JSON files read and deserialized concurrently.')
+    add_proof_arguments(parser)
+    add_output_arguments(parser)
+    args = parser.parse_args(args)
+    configure_logging(args)
+    set_backend(args.backend)
+
+    # Combine the partial results
+    try:
+        key: bytes = read_key(args.key) if args.key else None
+        partial: Partial = merge_partials([read_partial(path, key) for path in args.partials or json_files(args.directory, SHARD_PREFIX)], manifest_digest(encrypted_ballot_files(args)))
+    except ValueError as e:
+        print(e)
+        return EXIT_FAILURE
+
+    # Verify election from the combined partial results
+    description, context, constants, ciphertext_tally, plaintext_tally = read_election(args)
+    report: Report = Report()
+    with Loader(args.load_concurrency) as loader:
+        devices: list[EncryptionDevice] = list(loader.load(device_files(args), EncryptionDevice, 'device'))
+        coefficient_validation_sets: list[CoefficientValidationSet] = list(loader.load(coefficient_files(args), CoefficientValidationSet, 'coefficient validation set'))
+    is_valid: bool = verify(
+        description,
+        context,
+        constants,
+        devices,
+        [],
+        [],
+        ciphertext_tally,
+        plaintext_tally,
+        coefficient_validation_sets,
+        window=args.window,
+        table_memory=args.table_memory * 1024 * 1024,
+        batch=args.batch,
+        soundness=args.soundness,
+        strict_residues=args.strict_residues,
+        report=report,
+        partial=partial
+    )
+    write_report(args, report)
+
+    # Exit with result
+    return verdict(args, is_valid)
+
+def watch(args: list[str]) -> int:
+    """Function which verifies the encrypted ballots of an election results directory as they are
+       published during voting, then completes verification once the tally is published."""
+
+    # Parse arguments from command line
+    parser = ArgumentParser(prog='egverify watch', description='Verify the ballots of an ElectionGuard election as they are published.')
+    add_election_arguments(parser)
+    parser.add_argument('--poll-interval', default=POLL_INTERVAL, type=float, help='Seconds between scans of the election directory for newly published files.')
+    add_loading_arguments(parser)
+    add_proof_arguments(parser)
+    add_output_arguments(parser)
+    args = parser.parse_args(args)
+    configure_logging(args)
+    set_backend(args.backend)
+
+    # Wait for the election artifacts which are published before voting opens
+    watcher: Watcher = Watcher()
+    description_path, context_path, constants_path, ciphertext_tally_path, plaintext_tally_path = election_paths(args)
+    published: list[str] = []
+    while len(published) < 3:
+        published += watcher.settled([description_path, context_path, constants_path])
+        sleep(args.poll_interval)
+    description: ElectionDescription = read_artifact(description_path, ElectionDescription)
+    context: CiphertextElectionContext = read_artifact(context_path, CiphertextElectionContext)
+    constants: ElectionConstants = read_artifact(constants_path, ElectionConstants)
+    contests: Contests = Contests(description)
+
+    # Window of the fixed-base tables for g and K, built on first use by whichever process verifies the ballots
+    window: int = args.window or window_for(args.table_memory * 1024 * 1024, 2)
+
+    # Verify ballots as they are published, until the tally is published and every ballot published before it has been verified.
+    # One pool of worker processes serves the whole watch, so that workers build their fixed-base tables only once
+    tally: list[str] = []
+    with Loader(args.load_concurrency, args.decode_processes) as loader, ballot_pool(args.jobs, context, constants, window) if args.jobs > 1 else nullcontext() as pool:
+        while True:
+            tally += watcher.settled([ciphertext_tally_path, plaintext_tally_path])
+            ballot_files: list[str] = watcher.settled(encrypted_ballot_files(args) + spoiled_ballot_files(args))
+            if ballot_files:
+                # A malformed file is recorded as a failure rather than ending the watch
+                unreadable: list[str] = []
+                watcher.verify(loader.load(ballot_files, CiphertextAcceptedBallot, 'encrypted ballot', unreadable), context, constants, contests, window, args.jobs,
+                               args.in_flight, args.batch, args.soundness, args.strict_residues, pool, unreadable)
+            elif len(tally) == 2 and not watcher.pending:
+                break
+            sleep(args.poll_interval)
+        devices: list[EncryptionDevice] = list(loader.load(device_files(args), EncryptionDevice, 'device'))
+        coefficient_validation_sets: list[CoefficientValidationSet] = list(loader.load(coefficient_files(args), CoefficientValidationSet, 'coefficient validation set'))
+
+    # Verify the tally, with the ballot stages standing on the ballots verified while watching
+    info(f'The tally was published. Verifying the tally against {watcher.cast} cast encrypted ballots.')
+    report: Report = Report()
+    is_valid: bool = verify(
+        description,
+        context,
+        constants,
+        devices,
+        [],
+        [],
+        read_ciphertext_tally(ciphertext_tally_path),
+        read_plaintext_tally(plaintext_tally_path),
+        coefficient_validation_sets,
+        window=window,
+        table_memory=args.table_memory * 1024 * 1024,
+        batch=args.batch,
+        soundness=args.soundness,
+        strict_residues=args.strict_residues,
+        report=report,
+        checkpoint=watcher.checkpoint()
+    )
+    write_report(args, report)
+
+    # Exit with result
+    return verdict(args, is_valid)
+
+def self_test(args: list[str]) -> int:
+    """Function which checks that every available arithmetic backend computes exactly the same
+       results as built-in integer arithmetic on random inputs, and that elements are hashed
+       exactly as by the electionguard package."""
+
+    # Parse arguments from command line
+    parser = ArgumentParser(prog='egverify self-test', description='Check the arithmetic backends of the verifier against each other.')
+    parser.add_argument('--trials', default=TRIALS, type=int, help='Number of random inputs each operation is checked against.')
+    parser.add_argument('--seed', default=randbits(32), type=int, help='Seed from which the random inputs are drawn, to reproduce a previous run.')
+    args = parser.parse_args(args)
+
+    # Check every backend
+    failures: dict[str, list[str]] = self_test_backends(args.trials, args.seed)
+    for name, operations in failures.items():
+        print(f"Backend {name}: {'failed ' + ', '.join(operations) if operations else 'passed'}.")
+    print(f"Checked {args.trials} random inputs per operation with seed {args.seed}.")
+    return EXIT_FAILURE if any(failures.values()) else EXIT_SUCCESS
+
+def add_election_arguments(parser: ArgumentParser) -> None:
+    """Adds the arguments locating the files of an election results directory to `parser`."""
     parser.add_argument('directory', default=getcwd(), nargs='?', help='Directory containing election files.')
     parser.add_argument('-c', '--context', help='File containing election context JSON, overriding files found in election directory.')
     parser.add_argument('-d', '--description', help='File containing election description JSON, overriding files found in election directory.')
@@ -49,64 +415,32 @@ def main() -> int:
     parser.add_argument('-S', '--spoiled-ballots-dir', help="Directory containing spoiled ballots JSON, overriding election subdirectory.")
     parser.add_argument('-f', '--coefficients-prefix', help="Prefix for coefficient validation set JSON file names, overriding default prefix.")
     parser.add_argument('-F', '--coefficients-dir', help="Directory containing coefficient validation set JSON, overriding election subdirectory.")
+
+def add_loading_arguments(parser: ArgumentParser) -> None:
+    """Adds the arguments controlling how encrypted ballots are loaded and distributed to worker processes to `parser`."""
+    parser.add_argument('-j', '--jobs', default=1, type=int, help='Number of worker processes used to verify ballot selection proofs.')
+    parser.add_argument('-i', '--in-flight', default=IN_FLIGHT, type=int, help='Maximum number of encrypted ballots loaded and queued for verification at a time.')
+    parser.add_argument('-l', '--load-concurrency', default=LOAD_CONCURRENCY, type=int, help='Number of JSON files read and deserialized concurrently.')
+    parser.add_argument('--decode-processes', default=0, type=int, help='Number of worker processes used to deserialize JSON files. Deserializes in the loading threads if 0.')
+
+def add_proof_arguments(parser: ArgumentParser) -> None:
+    """Adds the arguments controlling how proofs and group elements are checked to `parser`."""
+    parser.add_argument('-w', '--window', type=int, help='Window size in bits of the fixed-base exponentiation tables for g and K, overriding the memory budget.')
+    parser.add_argument('-m', '--table-memory', default=TABLE_MEMORY // (1024 * 1024), type=int, help='Memory budget in MiB for the fixed-base exponentiation tables.')
+    parser.add_argument('--batch', default=False, action='store_true', help='Check proof equations with the randomized small-exponents batch test.')
+    parser.add_argument('--soundness', default=SOUNDNESS, type=int, help='Soundness parameter λ in bits for batch verification. A false proof is accepted with probability at most 2^-λ.')
+    parser.add_argument('--strict-residues', default=False, action='store_true', help='Check membership of every element in Zₚʳ with a full exponentiation rather than in randomized batches.')
+    parser.add_argument('--backend', default=backend().name, choices=list(BACKENDS), help='Big-integer arithmetic backend, defaulting to the fastest available.')
+
+def add_output_arguments(parser: ArgumentParser) -> None:
+    """Adds the arguments controlling logging and reporting to `parser`."""
+    parser.add_argument('--report', help='File to write a JSON report of the time, resources, and failures of each verification stage to.')
+    parser.add_argument('--prometheus', help='File to write the verification report to in the Prometheus textfile format.')
     parser.add_argument('-v', '--verbose', default=False, action='store_true', help='Output vaildation details.')
     parser.add_argument('-n', '--no-warn', default=False, action='store_true', help='Silence all warnings. Has no effect in verbose mode.')
-    args = parser.parse_args()
 
-    # Deserialize election results
-    context_path: str = args.context or join(args.directory, CONTEXT_FILE_NAME + JSON_EXT)
-    with open(context_path, READ) as f:
-        context: CiphertextElectionContext = read_json(f.read(), CiphertextElectionContext)
-
-    description_path: str = args.description or join(args.directory, DESCRIPTION_FILE_NAME + JSON_EXT)
-    with open(description_path, READ) as f:
-        description: ElectionDescription = read_json(f.read(), ElectionDescription)
-
-    ciphertext_tally_path: str = args.encrypted_tally or join(args.directory, ENCRYPTED_TALLY_FILE_NAME + JSON_EXT)
-    with open(ciphertext_tally_path, READ) as f:
-        ciphertext_tally: PublishedCiphertextTally = read_json(f.read(), PublishedCiphertextTally)
-
-    constants_path: str = args.constants or join(args.directory, CONSTANTS_FILE_NAME + JSON_EXT)
-    with open(constants_path, READ) as f:
-        constants: ElectionConstants = read_json(f.read(), ElectionConstants)
-
-    plaintext_tally_path: str = args.tally or join(args.directory, TALLY_FILE_NAME + JSON_EXT)
-    with open(plaintext_tally_path, READ) as f:
-        plaintext_tally: PlaintextTally = read_json(f.read(), PlaintextTally)
-
-    devices_dir: str = args.devices_dir or join(args.directory, split(DEVICES_DIR)[-1])
-    devices_prefix: str = args.devices_prefix or DEVICE_PREFIX
-    device_files: list[str] = glob(join(devices_dir, f'{devices_prefix}*{JSON_EXT}'))
-    devices: list[EncryptionDevice] = []
-    for device_file in device_files:
-        with open(device_file, READ) as f:
-            devices.append(read_json(f.read(), EncryptionDevice))
-
-    enc_ballots_dir: str = args.encrypted_ballots_dir or join(args.directory, split(BALLOTS_DIR)[-1])
-    enc_ballots_prefix: str = args.encrypted_ballots_prefix or BALLOT_PREFIX
-    enc_ballot_files: list[str] = glob(join(enc_ballots_dir, f'{enc_ballots_prefix}*{JSON_EXT}'))
-    ciphertext_ballots: list[CiphertextAcceptedBallot] = []
-    for enc_ballot in enc_ballot_files:
-        with open(enc_ballot, READ) as f:
-            ciphertext_ballots.append(read_json(f.read(), CiphertextAcceptedBallot))
-
-    spoiled_ballots_dir: str = args.spoiled_ballots_dir or join(args.directory, split(SPOILED_DIR)[-1])
-    spoiled_ballots_prefix: str = args.spoiled_ballots_prefix or BALLOT_PREFIX
-    spoiled_ballot_files: list[str] = glob(join(spoiled_ballots_dir, f'{spoiled_ballots_prefix}*{JSON_EXT}'))
-    spoiled_ballots: list[CiphertextAcceptedBallot] = []
-    for spoiled_ballot in spoiled_ballot_files:
-        with open(spoiled_ballot, READ) as f:
-            spoiled_ballots.append(read_json(f.read(), CiphertextAcceptedBallot))
-
-    coefficients_dir: str = args.coefficients_dir or join(args.directory, split(COEFFICIENTS_DIR)[-1])
-    coefficients_prefix: str = args.coefficients_prefix or COEFFICIENT_PREFIX
-    coefficients_files: list[str] = glob(join(coefficients_dir, f'{coefficients_prefix}*{JSON_EXT}'))
-    coefficient_validation_sets: list[CoefficientValidationSet] = []
-    for coefficient in coefficients_files:
-        with open(coefficient, READ) as f:
-            coefficient_validation_sets.append(read_json(f.read(), CoefficientValidationSet))
-
-    # Set logging verbosity
+def configure_logging(args) -> None:
+    """Sets logging verbosity from the parsed output arguments `args`."""
     if (args.verbose):
         basicConfig(level=INFO, format='%(message)s')
     elif (args.no_warn):
@@ -114,23 +448,117 @@ def main() -> int:
     else:
         basicConfig(format='%(message)s')
 
-    # Verify election
-    is_valid: bool = verify(
-        description,
-        context,
-        constants,
-        devices,
-        ciphertext_ballots,
-        spoiled_ballots,
-        ciphertext_tally,
-        plaintext_tally,
-        coefficient_validation_sets
-    )
+def read_election(args, tallies: bool = True) -> tuple[ElectionDescription, CiphertextElectionContext, ElectionConstants, PublishedCiphertextTally, PlaintextTally]:
+    """Deserializes the single-file election artifacts located by the parsed election arguments `args`.
+       The tallies are None unless `tallies` is set, and are otherwise streamed from their files."""
+    description_path, context_path, constants_path, ciphertext_tally_path, plaintext_tally_path = election_paths(args)
+    context: CiphertextElectionContext = read_artifact(context_path, CiphertextElectionContext)
+    description: ElectionDescription = read_artifact(description_path, ElectionDescription)
+    ciphertext_tally: PublishedCiphertextTally = read_ciphertext_tally(ciphertext_tally_path) if tallies else None
+    constants: ElectionConstants = read_artifact(constants_path, ElectionConstants)
+    plaintext_tally: PlaintextTally = read_plaintext_tally(plaintext_tally_path) if tallies else None
+    return description, context, constants, ciphertext_tally, plaintext_tally
 
-    # Exit with result
+def read_artifact(path: str, cls):
+    """Returns the contents of the JSON file at `path` deserialized as `cls`."""
+    with open(path, READ) as f:
+        return read_json(f.read(), cls)
+
+def election_paths(args) -> list[str]:
+    """Returns the paths of the description, context, constants, encrypted tally, and tally JSON files
+       located by the parsed election arguments `args`."""
+    return [
+        args.description or join(args.directory, DESCRIPTION_FILE_NAME + JSON_EXT),
+        args.context or join(args.directory, CONTEXT_FILE_NAME + JSON_EXT),
+        args.constants or join(args.directory, CONSTANTS_FILE_NAME + JSON_EXT),
+        args.encrypted_tally or join(args.directory, ENCRYPTED_TALLY_FILE_NAME + JSON_EXT),
+        args.tally or join(args.directory, TALLY_FILE_NAME + JSON_EXT)
+    ]
+
+def input_files(args, enc_ballot_files: list[str]) -> list[str]:
+    """Returns the election input files read by the stages selected by the parsed arguments `args`,
+       given the encrypted ballot files `enc_ballot_files`."""
+    description_path, context_path, constants_path, ciphertext_tally_path, plaintext_tally_path = election_paths(args)
+    files: list[str] = [description_path, context_path, constants_path]
+    if selects(args, 'aggregation', 'recovery', 'decryption', 'spoiled'):
+        files += [ciphertext_tally_path, plaintext_tally_path]
+    if selects(args, 'ballots', 'limits'):
+        files += device_files(args)
+    if selects(args, 'ballots', 'limits', 'aggregation'):
+        files += enc_ballot_files
+    if selects(args, 'keys', 'aggregation', 'recovery', 'spoiled'):
+        files += coefficient_files(args)
+    return files + spoiled_ballot_files(args)
+
+def device_files(args) -> list[str]:
+    """Returns the device JSON files located by the parsed election arguments `args`."""
+    return json_files(args.devices_dir or join(args.directory, split(DEVICES_DIR)[-1]), args.devices_prefix or DEVICE_PREFIX)
+
+def encrypted_ballot_files(args) -> list[str]:
+    """Returns the encrypted ballot JSON files located by the parsed election arguments `args`."""
+    return json_files(args.encrypted_ballots_dir or join(args.directory, split(BALLOTS_DIR)[-1]), args.encrypted_ballots_prefix or BALLOT_PREFIX)
+
+def spoiled_ballot_files(args) -> list[str]:
+    """Returns the spoiled ballot JSON files located by the parsed election arguments `args`."""
+    return json_files(args.spoiled_ballots_dir or join(args.directory, split(SPOILED_DIR)[-1]), args.spoiled_ballots_prefix or BALLOT_PREFIX)
+
+def coefficient_files(args) -> list[str]:
+    """Returns the coefficient validation set JSON files located by the parsed election arguments `args`."""
+    return json_files(args.coefficients_dir or join(args.directory, split(COEFFICIENTS_DIR)[-1]), args.coefficients_prefix or COEFFICIENT_PREFIX)
+
+def stage_list(text: str) -> list[str]:
+    """Parses a comma-separated list of verification stage names, for use as an argument type."""
+    stages: list[str] = [stage.strip() for stage in text.split(',') if stage.strip()]
+    unknown: list[str] = [stage for stage in stages if stage not in STAGES]
+    if unknown:
+        raise ArgumentTypeError(f'unknown stages {", ".join(unknown)}, choose from {",".join(STAGES)}')
+    return stages
+
+def selects(args, *stages: str) -> bool:
+    """Returns whether any of `stages` is selected by the parsed arguments `args`."""
+    return any(stage in args.stages for stage in stages)
+
+def open_store(args) -> ResultStore:
+    """Opens the result store given by command line arguments, returning None with a warning if it
+       cannot be opened for writing. The default store is kept in the user's cache directory, as a
+       store in the election directory could be published alongside the ballots it vouches for."""
+    path: str = args.result_store or cache_path(args.directory, STORE_FILE_NAME)
+    try:
+        return ResultStore(path, args.result_store_size * 1024 * 1024, args.rebuild_cache)
+    except (SQLiteError, OSError) as e:
+        warn(f'Result store {path} could not be opened ({e}). Every ballot will be verified without reading or saving stored results.')
+        return None
+
+def write_report(args, report: Report) -> None:
+    """Writes `report` to the files given by the parsed output arguments `args`."""
+    if args.report:
+        report.write_json(args.report)
+    if args.prometheus:
+        report.write_prometheus(args.prometheus)
+
+def verdict(args, is_valid: bool, sample: Sample = None) -> int:
+    """Prints the verification result `is_valid` and the soundness of the checks chosen by the
+       parsed proof arguments `args` and of the `sample` of a sampling audit, returning the exit status."""
+    if (args.batch):
+        print(f"Proofs were batch verified with soundness error at most 2^-{args.soundness}.")
+    if (not args.strict_residues):
+        print(f"Subgroup membership was batch verified with soundness error at most 2^-{args.soundness}.")
+    if (sample and sample.ballots):
+        print(f"Encrypted ballot proofs were verified for a random sample of {sample.sampled} of {sample.ballots} ballots, drawn with seed {sample.seed}.")
+        if (is_valid):
+            print(f"With confidence {sample.confidence:.2%}, at most {sample.undetected()} ballots ({sample.bound():.2%}) outside the sample have invalid proofs.")
     if (is_valid):
         print("Election valid.")
         return EXIT_SUCCESS
     else:
         print("Election invalid.")
         return EXIT_FAILURE
+
+# Subcommands of egverify, by name
+COMMANDS: dict[str, Callable[[list[str]], int]] = {
+    'pack': pack,
+    'shard': shard,
+    'merge': merge,
+    'watch': watch,
+    'self-test': self_test
+}
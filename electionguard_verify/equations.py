@@ -0,0 +1,150 @@
+""" equations.py
+    Nicholas Boucher 2020
+
+    Checking of the exponentiation equations ∏ bᵢᵉⁱ = ∏ bⱼᵉʲ (mod p) which make up
+    the Chaum-Pedersen and Schnorr proof verifications, either one at a time or
+    folded together using the small-exponents batch test. The variable bases of
+    each side are exponentiated simultaneously.
+"""
+
+from typing import Union
+from secrets import randbelow
+from electionguard.group import ElementModP, ElementModQ, ElementModPorInt, ElementModPOrQorInt
+from electionguard_verify.constants import P
+from electionguard_verify.arithmetic import Backend, backend
+from electionguard_verify.fixed_base import FixedBase
+from electionguard_verify.multiexp import multiexp
+from electionguard_verify.metrics import MODEXP, count
+from electionguard_verify.utils import Invariants, bisect
+
+
+# Default soundness parameter λ: a batch containing a false equation passes with probability at most 2^-λ
+SOUNDNESS: int = 64
+# Default number of equations folded into a single batch check
+BATCH_SIZE: int = 1024
+
+Base = Union[FixedBase, ElementModPorInt]
+Term = tuple[Base, ElementModPOrQorInt]
+
+
+class Equations():
+    """Checks each equation ∏ lhs = ∏ rhs (mod p) as it is supplied, recording
+       the outcome in `invariants` under the equation's invariant label."""
+
+    invariants: Invariants
+
+    def __init__(self, invariants: Invariants):
+        """Instantiate a checker recording outcomes in `invariants`."""
+        self.invariants = invariants
+
+    def check(self, invariant: str, lhs: list[Term], rhs: list[Term], element: str = None) -> None:
+        """Checks that the product of the (base, exponent) terms `lhs` equals that of `rhs`."""
+        self.invariants.ensure(invariant, equal(lhs, rhs), element)
+
+    def flush(self) -> None:
+        """Completes any outstanding checks. Equations are checked immediately, so this does nothing."""
+        pass
+
+class BatchEquations(Equations):
+    """Defers equations and checks up to `size` of them at once with the small-exponents batch test:
+       each equation is raised to a random `soundness`-bit exponent δ and the products of all left
+       and right hand sides are compared, merging repeated bases such as g and K into a single
+       exponentiation. A failing batch is bisected with fresh exponents until the failing
+       equations are isolated and checked individually, so failures are still reported per element."""
+
+    soundness: int
+    size: int
+    pending: list[tuple[str, list[Term], list[Term], str]]
+
+    def __init__(self, invariants: Invariants, soundness: int = SOUNDNESS, size: int = BATCH_SIZE):
+        """Instantiate a batch checker recording outcomes in `invariants`."""
+        super().__init__(invariants)
+        self.soundness = soundness
+        self.size = size
+        self.pending = []
+
+    def check(self, invariant: str, lhs: list[Term], rhs: list[Term], element: str = None) -> None:
+        """Queues the equation ∏ lhs = ∏ rhs, checking the queue once it holds `size` equations."""
+        self.pending.append((invariant, lhs, rhs, element))
+        if len(self.pending) >= self.size:
+            self.flush()
+
+    def flush(self) -> None:
+        """Checks all queued equations."""
+        pending, self.pending = self.pending, []
+        if pending:
+            bisect(self.invariants, pending, self.holds, lambda equation: equal(equation[1], equation[2]))
+
+    def holds(self, equations: list[tuple[str, list[Term], list[Term], str]]) -> bool:
+        """Returns the outcome of the small-exponents batch test over `equations`.
+           As p - 1 = 2qr for primes q and r, the test is only sound against the order-2
+           component of the elements if that component is compared exactly, so the
+           Legendre symbols of both sides of every equation are checked first."""
+        symbols: dict[int, int] = {}
+        lhs_exponents: dict[int, int] = {}
+        rhs_exponents: dict[int, int] = {}
+        for _, lhs, rhs, _ in equations:
+            lhs_terms: list[tuple[int, int]] = [(to_int(base), to_int(exponent)) for base, exponent in lhs]
+            rhs_terms: list[tuple[int, int]] = [(to_int(base), to_int(exponent)) for base, exponent in rhs]
+            if any(not 0 < base < P for base, _ in lhs_terms + rhs_terms):
+                return False
+            if legendre(lhs_terms, symbols) != legendre(rhs_terms, symbols):
+                return False
+            delta: int = 1 + randbelow((1 << self.soundness) - 1)
+            for base, exponent in lhs_terms:
+                lhs_exponents[base] = lhs_exponents.get(base, 0) + delta * exponent
+            for base, exponent in rhs_terms:
+                rhs_exponents[base] = rhs_exponents.get(base, 0) + delta * exponent
+        return evaluate(list(lhs_exponents.items())) == evaluate(list(rhs_exponents.items()))
+
+def equations_for(invariants: Invariants, batch: bool, soundness: int = SOUNDNESS) -> Equations:
+    """Returns a batch checker with the given `soundness` if `batch` is set, otherwise an exact checker."""
+    if batch:
+        return BatchEquations(invariants, soundness)
+    else:
+        return Equations(invariants)
+
+def equal(lhs: list[Term], rhs: list[Term]) -> bool:
+    """Returns whether ∏ lhs = ∏ rhs (mod p). When both sides raise variable bases to an exponent,
+       as in Aᵛ = bMᶜ, the variable bases of `rhs` are inverted and moved to `lhs`, so that the
+       check costs one simultaneous exponentiation, e.g. Aᵛ(M⁻¹)ᶜ = b, rather than two."""
+    moved: list[Term] = [(base, exponent) for base, exponent in rhs if is_variable(base, exponent)]
+    if not moved or not any(is_variable(base, exponent) for base, exponent in lhs) or any(to_int(base) % P == 0 for base, _ in moved):
+        return evaluate(lhs) == evaluate(rhs)
+    arithmetic: Backend = backend()
+    return evaluate(lhs + [(arithmetic.invert(to_int(base), arithmetic.p), exponent) for base, exponent in moved]) == evaluate([term for term in rhs if not is_variable(*term)])
+
+def evaluate(terms: list[Term]) -> int:
+    """Returns the product of `terms` mod p as a raw integer, using fixed-base tables where
+       supplied and exponentiating the remaining bases simultaneously."""
+    p: int = backend().p
+    variable: list[tuple[int, int]] = [(to_int(base), to_int(exponent)) for base, exponent in terms if not isinstance(base, FixedBase)]
+    count(MODEXP, sum(1 for _, exponent in variable if exponent != 1))
+    result: int = multiexp(variable)
+    for base, exponent in terms:
+        if isinstance(base, FixedBase):
+            result = result * base.raw_pow(to_int(exponent)) % p
+    return result
+
+def is_variable(base: Base, exponent: ElementModPOrQorInt) -> bool:
+    """Returns whether the term base^exponent needs a variable-base exponentiation."""
+    return not isinstance(base, FixedBase) and to_int(exponent) != 1
+
+def legendre(terms: list[tuple[int, int]], symbols: dict[int, int]) -> int:
+    """Returns the Legendre symbol of the product of `terms` mod p, caching per-base symbols in `symbols`."""
+    result: int = 1
+    for base, exponent in terms:
+        if exponent % 2:
+            if base not in symbols:
+                symbols[base] = backend().jacobi(base, P)
+            result *= symbols[base]
+    return result
+
+def to_int(value: Union[Base, ElementModPOrQorInt]) -> int:
+    """Returns the integer value of a base or exponent, as the native integer type of the arithmetic backend in use."""
+    if isinstance(value, FixedBase):
+        return backend().integer(value.base.elem)
+    elif isinstance(value, (ElementModP, ElementModQ)):
+        return backend().integer(value.elem)
+    else:
+        return value
@@ -0,0 +1,109 @@
+""" fixed_base.py
+    Nicholas Boucher 2020
+
+    Fixed-base exponentiation using precomputed windowed tables for the bases
+    which are raised to a new exponent in nearly every verification check,
+    namely the generator g and the joint election public key K.
+"""
+
+from functools import lru_cache
+from electionguard.group import ElementModP, ElementModPorInt, ElementModPOrQorInt, int_to_p_unchecked
+from electionguard_verify.constants import P, Q
+from electionguard_verify.arithmetic import Backend, backend
+from electionguard_verify.metrics import MODEXP, count
+
+
+# Default memory budget, in bytes, shared by all fixed-base tables in a run
+TABLE_MEMORY: int = 32 * 1024 * 1024
+# Largest window size that will be selected from a memory budget
+MAX_WINDOW: int = 12
+# Approximate size in bytes of one precomputed element mod p
+ELEMENT_SIZE: int = P.bit_length() // 8 + 32
+# Approximate cost of a variable-base exponentiation, in multiplications mod p per exponent bit
+EXPONENTIATION_COST: float = 1.0
+
+
+class FixedBase():
+    """Raises a fixed `base` to arbitrary exponents mod p using a windowed table.
+       Row i of the table holds base^(d·2^(w·i)) for every nonzero w-bit digit d, so an
+       exponent of `exponent_bits` bits costs ⌈exponent_bits/w⌉ multiplications and no squarings."""
+
+    base: ElementModP
+    window: int
+    exponent_bits: int
+    arithmetic: Backend
+    table: list[list[int]]
+
+    def __init__(self, base: ElementModPorInt, window: int, exponent_bits: int = Q.bit_length()):
+        """Precomputes the table for `base` covering exponents of up to `exponent_bits` bits,
+           holding its entries in the native integer type of the arithmetic backend in use."""
+        self.base = int_to_p_unchecked(base) if isinstance(base, int) else base
+        self.window = window
+        self.exponent_bits = exponent_bits
+        self.arithmetic = backend()
+        self.table = []
+        p: int = self.arithmetic.p
+        row_base: int = self.arithmetic.integer(self.base.elem)
+        for _ in range(rows(window, exponent_bits)):
+            row: list[int] = [row_base]
+            for _ in range(2, 1 << window):
+                row.append(row[-1] * row_base % p)
+            self.table.append(row)
+            row_base = row[-1] * row_base % p
+
+    def pow(self, exponent: ElementModPOrQorInt) -> ElementModP:
+        """Computes base^exponent mod p. Exponents too large for the table fall back to a full exponentiation."""
+        return int_to_p_unchecked(self.raw_pow(exponent if isinstance(exponent, int) else exponent.elem))
+
+    def raw_pow(self, e: int) -> int:
+        """Computes base^e mod p for the integer `e`, as an integer of the table's arithmetic backend."""
+        count(MODEXP)
+        p: int = self.arithmetic.p
+        if e < 0 or e.bit_length() > self.exponent_bits:
+            return self.arithmetic.powmod(self.table[0][0], e, p) if e >= 0 else self.arithmetic.powmod(self.arithmetic.invert(self.table[0][0], p), -e, p)
+        mask: int = (1 << self.window) - 1
+        result: int = self.arithmetic.integer(1)
+        for row in self.table:
+            if not e:
+                break
+            digit: int = e & mask
+            if digit:
+                result = result * row[digit - 1] % p
+            e >>= self.window
+        return result
+
+def rows(window: int, exponent_bits: int) -> int:
+    """Returns the number of table rows needed to cover `exponent_bits` with `window`-bit digits."""
+    return -(-exponent_bits // window)
+
+def table_size(window: int, exponent_bits: int = Q.bit_length()) -> int:
+    """Returns the approximate memory footprint in bytes of a table with the given dimensions."""
+    return rows(window, exponent_bits) * ((1 << window) - 1) * ELEMENT_SIZE
+
+def window_for(memory: int, tables: int = 1, exponent_bits: int = Q.bit_length()) -> int:
+    """Returns the largest window size for which `tables` tables fit within `memory` bytes."""
+    window: int = 1
+    while window < MAX_WINDOW and tables * table_size(window + 1, exponent_bits) <= memory:
+        window += 1
+    return window
+
+def window_for_uses(uses: int, memory: int, tables: int = 1, exponent_bits: int = Q.bit_length()) -> int:
+    """Returns the window size minimizing the multiplications needed to build a table and raise its
+       base to `uses` exponents, among those for which `tables` tables fit within `memory` bytes,
+       or 0 if no table pays back its cost against `uses` variable-base exponentiations."""
+    window: int = min(range(1, window_for(memory, tables, exponent_bits) + 1), key=lambda w: rows(w, exponent_bits) * ((1 << w) - 1 + uses))
+    if rows(window, exponent_bits) * ((1 << window) - 1 + uses) >= uses * exponent_bits * EXPONENTIATION_COST:
+        return 0
+    return window
+
+def fixed_base(base: ElementModPorInt, window: int) -> FixedBase:
+    """Returns the table for `base` with the given `window`, building it on first use.
+       Tables are shared by every verification stage within a process, and worker
+       processes build their own when started."""
+    return fixed_base_for(base, window, backend().name)
+
+@lru_cache(maxsize=None)
+def fixed_base_for(base: ElementModPorInt, window: int, backend_name: str) -> FixedBase:
+    """Returns the table for `base` with the given `window` built with the arithmetic backend `backend_name`,
+       which must be the backend in use, so that a table is rebuilt when the backend changes."""
+    return FixedBase(base, window)
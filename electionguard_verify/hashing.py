@@ -0,0 +1,89 @@
+""" hashing.py
+    Nicholas Boucher 2020
+
+    Hashing of election elements identical to electionguard.hash.hash_elems,
+    which serializes and hashes the leading elements shared by many challenge
+    hashes only once, such as the extended base hash Q̅ which begins the
+    challenge of every ballot selection proof.
+"""
+
+from hashlib import sha256
+from collections import OrderedDict
+from typing import Sequence
+from electionguard.hash import CryptoHashable, CRYPTO_HASHABLE_ALL
+from electionguard.group import ElementModP, ElementModQ, Q_MINUS_ONE, int_to_q_unchecked
+from electionguard_verify.metrics import HASH, count
+
+
+# Number of hash prefixes held, covering the (Q̅,A,B) prefixes of the selections of a tally
+PREFIX_CACHE_SIZE: int = 4096
+SEPARATOR: str = '|'
+NULL: str = 'null'
+ENCODING: str = 'utf-8'
+
+
+class HashPrefix():
+    """The SHA-256 state of the electionguard hash after a fixed sequence of leading elements,
+       from which the hash of any elements following those leading elements is completed."""
+
+    state: 'sha256'
+
+    def __init__(self, *a: CRYPTO_HASHABLE_ALL):
+        """Serializes and hashes the leading elements `a`."""
+        self.state = sha256(SEPARATOR.encode(ENCODING))
+        for x in a:
+            self.state.update(encode(x))
+
+    def hash(self, *a: CRYPTO_HASHABLE_ALL) -> ElementModQ:
+        """Counts and computes the electionguard hash of the leading elements followed by `a`."""
+        count(HASH)
+        h = self.state.copy()
+        for x in a:
+            h.update(encode(x))
+        return to_q(h)
+
+# Prefix of no elements, from which hashes without a shared prefix are computed
+EMPTY_PREFIX: HashPrefix = HashPrefix()
+# Recently used hash prefixes, by the types and values of their leading elements
+PREFIXES: OrderedDict = OrderedDict()
+
+
+def hash_elems(*a: CRYPTO_HASHABLE_ALL) -> ElementModQ:
+    """Counts and computes the electionguard hash of the elements `a`."""
+    return EMPTY_PREFIX.hash(*a)
+
+def hash_prefix(*a: CRYPTO_HASHABLE_ALL) -> HashPrefix:
+    """Returns the hash prefix of the leading elements `a`, which must be group elements, strings,
+       integers, or None. The most recently used prefixes are kept, so that the elements of a prefix
+       shared by hashes in different places are only serialized and hashed once."""
+    key: tuple = tuple((type(x), x.elem) if isinstance(x, (ElementModP, ElementModQ)) else (type(x), x) for x in a)
+    prefix: HashPrefix = PREFIXES.get(key)
+    if prefix is None:
+        prefix = HashPrefix(*a)
+        PREFIXES[key] = prefix
+        if len(PREFIXES) > PREFIX_CACHE_SIZE:
+            PREFIXES.popitem(last=False)
+    else:
+        PREFIXES.move_to_end(key)
+    return prefix
+
+def encode(x: CRYPTO_HASHABLE_ALL) -> bytes:
+    """Returns the serialization of the element `x` fed to the hash, following the rules of
+       electionguard.hash.hash_elems exactly, including its treatment of falsy values as null."""
+    if not x:
+        text: str = NULL
+    elif isinstance(x, ElementModP) or isinstance(x, ElementModQ):
+        text = x.to_hex()
+    elif isinstance(x, CryptoHashable):
+        text = x.crypto_hash().to_hex()
+    elif isinstance(x, str):
+        text = x
+    elif isinstance(x, Sequence):
+        text = to_q(HashPrefix(*x).state).to_hex()
+    else:
+        text = str(x)
+    return (text + SEPARATOR).encode(ENCODING)
+
+def to_q(h: 'sha256') -> ElementModQ:
+    """Returns the digest of the hash state `h` reduced to an element mod q, as electionguard does."""
+    return int_to_q_unchecked(int.from_bytes(h.digest(), byteorder='big') % Q_MINUS_ONE)
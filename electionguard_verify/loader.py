@@ -0,0 +1,111 @@
+""" loader.py
+    Nicholas Boucher 2020
+
+    Concurrent loading of the directories of JSON election artifacts,
+    overlapping file reads with deserialization.
+"""
+
+from os.path import join, getsize
+from glob import glob
+from time import perf_counter
+from typing import TypeVar, Type, Iterable, Iterator
+from logging import info
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from electionguard.serializable import read_json
+from electionguard_verify.utils import bounded_map, process_pool, warn
+from electionguard_verify.metrics import measured, absorb
+
+
+T: TypeVar = TypeVar('T')
+
+# Default number of files read and deserialized concurrently
+LOAD_CONCURRENCY: int = 16
+READ: str = 'r'
+JSON_EXT: str = '.json'
+MB: int = 1024 * 1024
+
+
+class Loader():
+    """Reads and deserializes JSON files using a pool of `concurrency` threads, so that
+       waiting on storage overlaps with decoding. If `decoders` is nonzero, decoding is
+       offloaded to that many worker processes for when it, rather than I/O, is the bottleneck.
+       Use as a context manager so that the pools are shut down once loading is complete."""
+
+    concurrency: int
+    readers: ThreadPoolExecutor
+    decoders: ProcessPoolExecutor
+
+    def __init__(self, concurrency: int = LOAD_CONCURRENCY, decoders: int = 0):
+        """Instantiate a loader reading up to `concurrency` files at a time."""
+        self.concurrency = concurrency
+        self.readers = ThreadPoolExecutor(max_workers=concurrency)
+        self.decoders = process_pool(decoders) if decoders > 0 else None
+
+    def __enter__(self) -> 'Loader':
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.readers.shutdown()
+        if self.decoders:
+            self.decoders.shutdown()
+
+    def load(self, files: Iterable[str], cls: Type[T], label: str = 'JSON', unreadable: list[str] = None) -> Iterator[T]:
+        """Yields the contents of each file in `files` deserialized as `cls`, in order. Files are
+           read at most `concurrency` ahead of the consumer, so memory use stays bounded when the
+           results are streamed. Load throughput is logged, labelled `label`, once all are loaded,
+           along with the time the consumer spent waiting on the loader. If `unreadable` is given,
+           files which cannot be read or deserialized are appended to it and skipped, rather than raising."""
+        count: int = 0
+        size: int = 0
+        waited: float = 0
+        start: float = perf_counter()
+        results: Iterator[tuple[T, int]] = bounded_map(self.readers, self.read, files, self.concurrency, cls, unreadable)
+        while True:
+            requested: float = perf_counter()
+            result: tuple[T, int] = next(results, None)
+            waited += perf_counter() - requested
+            if result is None:
+                break
+            el, file_size = result
+            if file_size is None:
+                continue
+            count += 1
+            size += file_size
+            yield el
+        report(label, count, size, perf_counter() - start, waited)
+
+    def read(self, file: str, cls: Type[T], unreadable: list[str] = None) -> tuple[T, int]:
+        """Returns the contents of `file` deserialized as `cls`, along with the file's size in bytes.
+           If `unreadable` is given, a file which cannot be read or deserialized is appended to it
+           and (None, None) is returned in place of raising."""
+        if unreadable is None:
+            return self.decode(file, cls)
+        try:
+            return self.decode(file, cls)
+        except Exception as e:
+            warn(f'{file} could not be read or deserialized ({e}) and will be treated as a failed ballot.')
+            unreadable.append(file)
+            return None, None
+
+    def decode(self, file: str, cls: Type[T]) -> tuple[T, int]:
+        """Returns the contents of `file` deserialized as `cls`, along with the file's size in bytes."""
+        with open(file, READ) as f:
+            data: str = f.read()
+        if self.decoders:
+            el, used = self.decoders.submit(measured, data, read_json, cls).result()
+            absorb(used)
+            return el, getsize(file)
+        else:
+            return read_json(data, cls), getsize(file)
+
+def json_files(directory: str, prefix: str = '') -> list[str]:
+    """Returns the paths of the JSON files in `directory` whose names start with `prefix`, sorted so
+       that every run visits them in the same order."""
+    return sorted(glob(join(directory, f'{prefix}*{JSON_EXT}')))
+
+def report(label: str, count: int, size: int, seconds: float, waited: float) -> None:
+    """Logs the throughput of loading `count` files totalling `size` bytes in `seconds`, of which
+       `waited` were spent by the consumer blocked on the loader. When results are streamed,
+       throughput is bounded by the consumer and a short wait shows loading was not the bottleneck."""
+    seconds = max(seconds, 1e-9)
+    info(f'Loaded {count} {label} files ({size / MB:.1f} MB) in {seconds:.2f}s: {count / seconds:.1f} files/s, {size / MB / seconds:.1f} MB/s, {waited:.2f}s waiting on loads.')
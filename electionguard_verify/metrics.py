@@ -0,0 +1,191 @@
+""" metrics.py
+    Nicholas Boucher 2020
+
+    Instrumentation of verification: counts of expensive operations, and a
+    report of the time, resources, and failures of each verification stage
+    which can be written as JSON or as a Prometheus textfile.
+"""
+
+from os import replace
+from json import dump
+from time import perf_counter, process_time, time
+from threading import Lock
+from typing import Callable, Iterable, Iterator, TypeVar
+from collections import Counter
+
+# Peak resident set size is only available where the resource module is, which excludes Windows
+try:
+    from resource import getrusage, RUSAGE_SELF
+except ImportError:
+    getrusage = None
+
+
+T: TypeVar = TypeVar('T')
+
+# Counts of operations performed by this process, by operation name
+COUNTERS: Counter = Counter()
+# CPU seconds and peak resident set size reported by worker processes along with their results.
+# Workers are not children of this process when started by a fork server, so getrusage cannot see them.
+WORKER_USAGE: dict[str, float] = {'cpu_seconds': 0.0, 'peak_rss_bytes': 0}
+WORKER_USAGE_LOCK: Lock = Lock()
+# CPU seconds of this process already reported by usage(), when it is a worker process
+REPORTED_CPU: float = 0.0
+# Operations which are counted
+MODEXP: str = 'modexp'
+HASH: str = 'hash'
+RESIDUE: str = 'residue'
+OPERATIONS: list[str] = [MODEXP, HASH, RESIDUE]
+# Bytes per unit of the maximum resident set size reported by getrusage on Linux
+RSS_UNIT: int = 1024
+WRITE: str = 'w'
+
+
+class Snapshot():
+    """The resource usage of this process and of the work reported by its worker processes at one point in time."""
+
+    wall: float
+    cpu: float
+    counters: Counter
+    peak_rss: int
+
+    def __init__(self):
+        """Takes a snapshot of current resource usage."""
+        self.wall = perf_counter()
+        with WORKER_USAGE_LOCK:
+            self.cpu = process_time() + WORKER_USAGE['cpu_seconds']
+            self.peak_rss = max(peak_rss(), WORKER_USAGE['peak_rss_bytes']) if getrusage else None
+        self.counters = Counter(COUNTERS)
+
+class Stage():
+    """The outcome of one verification stage and the resources used by it."""
+
+    title: str
+    valid: bool
+    wall_seconds: float
+    cpu_seconds: float
+    operations: dict[str, int]
+    peak_rss_bytes: int
+    failures: dict[str, list[str]]
+
+    def __init__(self, title: str, valid: bool, start: Snapshot, end: Snapshot, conditions: dict[str, bool], failures: dict[str, list[str]]):
+        """Records the stage `title` which ran between the snapshots `start` and `end`."""
+        self.title = title
+        self.valid = valid
+        self.wall_seconds = end.wall - start.wall
+        self.cpu_seconds = end.cpu - start.cpu
+        self.operations = {operation: end.counters[operation] - start.counters[operation] for operation in OPERATIONS}
+        self.peak_rss_bytes = end.peak_rss
+        self.failures = {invariant: failures.get(invariant, []) for invariant, condition in conditions.items() if not condition}
+
+class Report():
+    """Collects a Stage for each verification stage as its invariants are validated. Each stage
+       is attributed the resources used since the previous stage was validated, as ballots are
+       checked against the invariants of several stages in a single pass. The sample verified
+       by a sampling audit is recorded alongside the stages."""
+
+    started: float
+    stages: list[Stage]
+    last: Snapshot
+    sample: dict
+
+    def __init__(self):
+        """Instantiate an empty report, starting the clock for the first stage."""
+        self.started = time()
+        self.stages = []
+        self.last = Snapshot()
+        self.sample = None
+
+    def record(self, title: str, valid: bool, conditions: dict[str, bool], failures: dict[str, list[str]]) -> None:
+        """Records the validation of the stage `title`."""
+        end: Snapshot = Snapshot()
+        self.stages.append(Stage(title, valid, self.last, end, conditions, failures))
+        self.last = end
+
+    def valid(self) -> bool:
+        """Returns whether every stage recorded so far was valid. As verification stops at the first
+           invalid stage, this is the verification result once verification has completed."""
+        return all(stage.valid for stage in self.stages)
+
+    def as_dict(self) -> dict:
+        """Returns the report as a dictionary suitable for serializing as JSON."""
+        return {
+            'valid': self.valid(),
+            'started': self.started,
+            'wall_seconds': sum(stage.wall_seconds for stage in self.stages),
+            'cpu_seconds': sum(stage.cpu_seconds for stage in self.stages),
+            'operations': {operation: sum(stage.operations[operation] for stage in self.stages) for operation in OPERATIONS},
+            'peak_rss_bytes': max((stage.peak_rss_bytes for stage in self.stages), default=0) if getrusage else None,
+            'stages': [vars(stage) for stage in self.stages],
+            'sample': self.sample
+        }
+
+    def write_json(self, path: str) -> None:
+        """Writes the report as JSON to `path`."""
+        with open(path, WRITE) as f:
+            dump(self.as_dict(), f, indent=2, ensure_ascii=False)
+
+    def write_prometheus(self, path: str) -> None:
+        """Writes the report in the Prometheus text exposition format to `path`, replacing the
+           file atomically as required by the node exporter textfile collector."""
+        lines: list[str] = []
+        def metric(name: str, help: str, samples: list[tuple[dict[str, str], float]]) -> None:
+            lines.append(f'# HELP egverify_{name} {help}')
+            lines.append(f'# TYPE egverify_{name} gauge')
+            for labels, value in samples:
+                label_text: str = ','.join(f'{label}="{escape(text)}"' for label, text in labels.items())
+                lines.append(f'egverify_{name}{{{label_text}}} {float(value)}' if label_text else f'egverify_{name} {float(value)}')
+        metric('valid', 'Whether the election was verified as valid.', [({}, self.valid())])
+        metric('last_run_timestamp_seconds', 'Time at which the verification started.', [({}, self.started)])
+        if getrusage:
+            metric('peak_rss_bytes', 'Peak resident set size of the verifier.', [({}, self.as_dict()['peak_rss_bytes'])])
+        metric('stage_valid', 'Whether each verification stage was valid.', [({'stage': stage.title}, stage.valid) for stage in self.stages])
+        metric('stage_wall_seconds', 'Wall time spent in each verification stage.', [({'stage': stage.title}, stage.wall_seconds) for stage in self.stages])
+        metric('stage_cpu_seconds', 'CPU time spent in each verification stage, including worker processes.', [({'stage': stage.title}, stage.cpu_seconds) for stage in self.stages])
+        metric('stage_operations', 'Operations performed in each verification stage.', [({'stage': stage.title, 'operation': operation}, count) for stage in self.stages for operation, count in stage.operations.items()])
+        metric('stage_failures', 'Elements failing each invariant of each verification stage.', [({'stage': stage.title, 'invariant': invariant}, len(elements)) for stage in self.stages for invariant, elements in stage.failures.items()])
+        if self.sample:
+            metric('sample_ballots', 'Encrypted ballots whose proofs were verified by a sampling audit.', [({}, self.sample['sampled'])])
+            metric('sample_undetected_bound', 'Largest number of ballots with invalid proofs which the sampling audit could have missed, with its confidence.', [({'confidence': str(self.sample['confidence'])}, self.sample['undetected_bound'])])
+        with open(path + '.tmp', WRITE) as f:
+            f.write('\n'.join(lines) + '\n')
+        replace(path + '.tmp', path)
+
+def count(operation: str, n: int = 1) -> None:
+    """Counts `n` occurrences of `operation`."""
+    COUNTERS[operation] += n
+
+def peak_rss() -> int:
+    """Returns the peak resident set size of this process in bytes, or 0 where the
+       resource module is unavailable, such as on Windows."""
+    return getrusage(RUSAGE_SELF).ru_maxrss * RSS_UNIT if getrusage else 0
+
+def usage() -> tuple[float, int]:
+    """Returns the CPU seconds used by this process since the previous call, including its start up
+       the first time, along with its peak resident set size in bytes."""
+    global REPORTED_CPU
+    cpu: float = process_time()
+    used: float = cpu - REPORTED_CPU
+    REPORTED_CPU = cpu
+    return used, peak_rss()
+
+def measured(el, fn: Callable[..., T], *args) -> tuple[T, tuple[float, int]]:
+    """Returns fn(el, *args) along with the usage() of the worker process it was called in."""
+    result: T = fn(el, *args)
+    return result, usage()
+
+def absorb(used: tuple[float, int]) -> None:
+    """Adds the usage reported by a worker process with one of its results to this process's report."""
+    cpu, rss = used
+    with WORKER_USAGE_LOCK:
+        WORKER_USAGE['cpu_seconds'] += cpu
+        WORKER_USAGE['peak_rss_bytes'] = max(WORKER_USAGE['peak_rss_bytes'], rss)
+
+def absorbed(results: Iterable[tuple[T, tuple[float, int]]]) -> Iterator[T]:
+    """Yields the results of calls to measured() made in worker processes, absorbing their usage."""
+    for result, used in results:
+        absorb(used)
+        yield result
+
+def escape(text: str) -> str:
+    """Escapes `text` for use as a Prometheus label value."""
+    return text.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
@@ -0,0 +1,75 @@
+""" multiexp.py
+    Nicholas Boucher 2020
+
+    Simultaneous exponentiation of several variable bases, computing ∏ bᵢᵉⁱ mod p
+    with a single shared chain of squarings rather than one chain per base.
+"""
+
+from electionguard_verify.arithmetic import Backend, backend
+
+
+# Largest exponent bit length for which each window size is selected, by window size from 1
+WINDOW_THRESHOLDS: list[int] = [8, 24, 80, 240, 680]
+
+
+def multiexp(terms: list[tuple[int, int]]) -> int:
+    """Returns the product of base^exponent mod p over the (base, exponent) `terms`, for
+       non-negative exponents. Two or more exponentiations are interleaved: each base is
+       split into sliding windows over its own precomputed odd powers, and every window
+       is multiplied into one accumulator which is squared once per exponent bit.
+       The result is of the native integer type of the arithmetic backend in use."""
+    arithmetic: Backend = backend()
+    p: int = arithmetic.p
+    result: int = arithmetic.integer(1)
+    exponentiations: list[tuple[int, int]] = []
+    for base, exponent in terms:
+        if exponent == 1:
+            result = result * base % p
+        elif exponent:
+            exponentiations.append((arithmetic.integer(base), int(exponent)))
+    if len(exponentiations) == 1:
+        base, exponent = exponentiations[0]
+        return result * arithmetic.powmod(base, exponent, p) % p
+    if not exponentiations:
+        return result
+
+    # Schedule the multiplication by each window's odd power at the bit where the window ends
+    bits: int = max(exponent.bit_length() for _, exponent in exponentiations)
+    schedule: list[list[int]] = [[] for _ in range(bits)]
+    for base, exponent in exponentiations:
+        window: int = window_size(exponent.bit_length())
+        powers: list[int] = odd_powers(base, window, p)
+        i: int = exponent.bit_length() - 1
+        while i >= 0:
+            if not (exponent >> i) & 1:
+                i -= 1
+                continue
+            j: int = max(i - window + 1, 0)
+            while not (exponent >> j) & 1:
+                j += 1
+            schedule[j].append(powers[((exponent >> j) & ((1 << (i - j + 1)) - 1)) >> 1])
+            i = j - 1
+
+    # Square once per bit, multiplying in the windows ending at each bit
+    accumulator: int = arithmetic.integer(1)
+    for factors in reversed(schedule):
+        accumulator = accumulator * accumulator % p
+        for factor in factors:
+            accumulator = accumulator * factor % p
+    return result * accumulator % p
+
+def window_size(exponent_bits: int) -> int:
+    """Returns the sliding window size minimizing the multiplications needed for an exponent of
+       `exponent_bits` bits, balancing the precomputed odd powers against the windows multiplied in."""
+    for window, threshold in enumerate(WINDOW_THRESHOLDS, 1):
+        if exponent_bits <= threshold:
+            return window
+    return len(WINDOW_THRESHOLDS) + 1
+
+def odd_powers(base: int, window: int, p: int) -> list[int]:
+    """Returns base^1, base^3, ..., base^(2^window - 1) mod `p`."""
+    powers: list[int] = [base % p]
+    square: int = base * base % p
+    for _ in range((1 << (window - 1)) - 1):
+        powers.append(powers[-1] * square % p)
+    return powers
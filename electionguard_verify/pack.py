@@ -0,0 +1,277 @@
+""" pack.py
+    Nicholas Boucher 2020
+
+    Compact binary pack format for the encrypted ballots of an election,
+    allowing ballot values to be read directly from a memory-mapped file
+    rather than re-parsing every ballot JSON file on each verification.
+
+    A pack consists of a fixed header, followed by one fixed-width big-endian
+    column per ballot selection value and per ballot contest value, followed
+    by a JSON index of ballot, contest, and selection ids in record order.
+"""
+
+from os import replace, makedirs, stat
+from os.path import exists, dirname, basename
+from logging import info
+from mmap import mmap, ACCESS_READ
+from json import dumps, loads
+from struct import Struct
+from hashlib import sha256
+from shutil import copyfileobj
+from tempfile import TemporaryFile
+from functools import lru_cache
+from typing import Iterable, Iterator, Union
+from electionguard.group import ElementModP, ElementModQ, int_to_p_unchecked, int_to_q_unchecked
+from electionguard.ballot import CiphertextAcceptedBallot, BallotBoxState
+from electionguard_verify.constants import P, Q
+from electionguard_verify.utils import warn
+
+
+# Default file name of the pack within the cache directory of an election results directory
+PACK_FILE_NAME: str = 'ballots.egpack'
+MAGIC: bytes = b'EGVPACK\x00'
+VERSION: int = 2
+# Header layout: magic, version, source digest, source stat digest, selection count, contest count, index offset, index length
+HEADER: Struct = Struct('<8sH32s32sQQQQ')
+P_BYTES: int = (P.bit_length() + 7) // 8
+Q_BYTES: int = (Q.bit_length() + 7) // 8
+READ_BINARY: str = 'rb'
+WRITE_BINARY: str = 'wb'
+CHUNK: int = 1024 * 1024
+
+# Columns stored for each ballot selection and ballot contest, as (attribute group, attribute, byte width)
+SELECTION_COLUMNS: list[tuple[str, str, int]] = [
+    ('ciphertext', 'pad', P_BYTES),
+    ('ciphertext', 'data', P_BYTES),
+    ('proof', 'proof_zero_pad', P_BYTES),
+    ('proof', 'proof_zero_data', P_BYTES),
+    ('proof', 'proof_one_pad', P_BYTES),
+    ('proof', 'proof_one_data', P_BYTES),
+    ('proof', 'proof_zero_challenge', Q_BYTES),
+    ('proof', 'proof_one_challenge', Q_BYTES),
+    ('proof', 'proof_zero_response', Q_BYTES),
+    ('proof', 'proof_one_response', Q_BYTES),
+    ('proof', 'challenge', Q_BYTES)
+]
+CONTEST_COLUMNS: list[tuple[str, str, int]] = [
+    ('proof', 'response', Q_BYTES)
+]
+
+
+class Pack():
+    """A memory-mapped pack file. Ballots are reconstructed as lightweight views
+       whose values are read from the mapping on access."""
+
+    path: str
+    digest: bytes
+    stats: bytes
+    selections: int
+    contests: int
+    offsets: dict[tuple[str, str, str], tuple[int, int]]
+    index: list
+    data: mmap
+
+    def __init__(self, path: str):
+        """Maps the pack at `path`, raising ValueError if it is not a pack of a supported version."""
+        self.path = path
+        with open(path, READ_BINARY) as f:
+            self.data = mmap(f.fileno(), 0, access=ACCESS_READ)
+        magic, version, self.digest, self.stats, self.selections, self.contests, index_offset, index_length = HEADER.unpack_from(self.data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f'{path} is not a version {VERSION} ballot pack.')
+        self.offsets = {}
+        offset: int = HEADER.size
+        for kind, columns, count in (('selection', SELECTION_COLUMNS, self.selections), ('contest', CONTEST_COLUMNS, self.contests)):
+            for group, attribute, width in columns:
+                self.offsets[kind, group, attribute] = (offset, width)
+                offset += count * width
+        self.index = loads(self.data[index_offset:index_offset + index_length])
+
+    def __reduce__(self):
+        """Pickles the pack by path, so views can be sent to worker processes which map it themselves."""
+        return (open_pack, (self.path,))
+
+    def read(self, kind: str, group: str, attribute: str, record: int) -> Union[ElementModP, ElementModQ]:
+        """Returns the value of `group`.`attribute` for record number `record` of the `kind` columns."""
+        offset, width = self.offsets[kind, group, attribute]
+        value: int = int.from_bytes(self.data[offset + record * width:offset + (record + 1) * width], 'big')
+        return int_to_p_unchecked(value) if width == P_BYTES else int_to_q_unchecked(value)
+
+    def ballots(self, start: int = 0) -> Iterator['PackedBallot']:
+        """Yields a view of each ballot in the pack from ballot number `start`, in the order they were packed."""
+        selection: int = sum(len(selections) for _, _, contests in self.index[:start] for _, selections in contests)
+        contest: int = sum(len(contests) for _, _, contests in self.index[:start])
+        for ballot_id, state, contests in self.index[start:]:
+            packed_contests: list[PackedContest] = []
+            for contest_id, selections in contests:
+                packed_selections: list[PackedSelection] = []
+                for selection_id, is_placeholder in selections:
+                    packed_selections.append(PackedSelection(self, selection, selection_id, is_placeholder))
+                    selection += 1
+                packed_contests.append(PackedContest(self, contest, contest_id, packed_selections))
+                contest += 1
+            yield PackedBallot(ballot_id, BallotBoxState[state], packed_contests)
+
+class Columns():
+    """Exposes the columns of one `group` of a pack record as attributes, mirroring
+       the attributes of the corresponding electionguard object."""
+
+    __slots__ = ('pack', 'kind', 'group', 'record')
+
+    def __init__(self, pack: Pack, kind: str, group: str, record: int):
+        self.pack = pack
+        self.kind = kind
+        self.group = group
+        self.record = record
+
+    def __getattr__(self, attribute: str) -> Union[ElementModP, ElementModQ]:
+        # Slots are looked up here while unpickling, before they are set
+        if attribute in Columns.__slots__ or attribute.startswith('__'):
+            raise AttributeError(attribute)
+        if (self.kind, self.group, attribute) not in self.pack.offsets:
+            raise AttributeError(attribute)
+        return self.pack.read(self.kind, self.group, attribute, self.record)
+
+class PackedSelection():
+    """View of a packed ballot selection, standing in for CiphertextBallotSelection."""
+
+    object_id: str
+    is_placeholder_selection: bool
+    ciphertext: Columns
+    proof: Columns
+
+    def __init__(self, pack: Pack, record: int, object_id: str, is_placeholder_selection: bool):
+        self.object_id = object_id
+        self.is_placeholder_selection = is_placeholder_selection
+        self.ciphertext = Columns(pack, 'selection', 'ciphertext', record)
+        self.proof = Columns(pack, 'selection', 'proof', record)
+
+class PackedContest():
+    """View of a packed ballot contest, standing in for CiphertextBallotContest."""
+
+    object_id: str
+    ballot_selections: list[PackedSelection]
+    proof: Columns
+
+    def __init__(self, pack: Pack, record: int, object_id: str, ballot_selections: list[PackedSelection]):
+        self.object_id = object_id
+        self.ballot_selections = ballot_selections
+        self.proof = Columns(pack, 'contest', 'proof', record)
+
+class PackedBallot():
+    """View of a packed ballot, standing in for CiphertextAcceptedBallot."""
+
+    object_id: str
+    state: BallotBoxState
+    contests: list[PackedContest]
+
+    def __init__(self, object_id: str, state: BallotBoxState, contests: list[PackedContest]):
+        self.object_id = object_id
+        self.state = state
+        self.contests = contests
+
+@lru_cache(maxsize=None)
+def open_pack(path: str) -> Pack:
+    """Returns the pack at `path`, mapping it only once per process."""
+    return Pack(path)
+
+def fresh_pack(path: str, files: list[str], required: bool = False) -> Pack:
+    """Returns the pack at `path` if it was packed from the source ballot `files`, or None if it
+       is stale or, unless `required`, does not exist or is not a pack of the supported version.
+       Freshness is checked against the names, sizes, and modification times of `files`, so that
+       their contents are not read. If no source files are present the pack is used as is, as
+       its freshness cannot be checked."""
+    if not required and not exists(path):
+        return None
+    try:
+        pack: Pack = open_pack(path)
+    except ValueError as e:
+        if required:
+            raise
+        warn(f'{e} It will be ignored. Run egverify pack to update it.')
+        return None
+    if not files:
+        warn(f'No source ballot files were found to check ballot pack {path} against. The pack is assumed to be current.')
+    elif pack.stats != stat_digest(files):
+        warn(f'Ballot pack {path} does not match the source ballot files and will be ignored. Run egverify pack to update it.')
+        return None
+    info(f'Reading encrypted ballots from ballot pack {path}.')
+    return pack
+
+def source_digest(files: Iterable[str]) -> bytes:
+    """Returns a SHA-256 digest over the contents of `files`, independent of their order."""
+    digest = sha256()
+    for file in sorted(files):
+        file_digest = sha256()
+        with open(file, READ_BINARY) as f:
+            for chunk in iter(lambda: f.read(CHUNK), b''):
+                file_digest.update(chunk)
+        digest.update(file_digest.digest())
+    return digest.digest()
+
+def stat_digest(files: Iterable[str]) -> bytes:
+    """Returns a SHA-256 digest over the names, sizes, and modification times of `files`, independent
+       of their order, which changes whenever a file is replaced without reading any file's contents."""
+    digest = sha256()
+    for file in sorted(files):
+        status = stat(file)
+        digest.update(dumps([basename(file), status.st_size, status.st_mtime_ns]).encode())
+    return digest.digest()
+
+def encode(el, columns: list[tuple[str, str, int]]) -> list[bytes]:
+    """Returns the fixed-width encodings of the `columns` values of a ballot selection or contest `el`,
+       raising ValueError if a value is negative or too wide for its column."""
+    encoded: list[bytes] = []
+    for group, attribute, width in columns:
+        value: int = int(getattr(getattr(el, group), attribute).elem)
+        if not 0 <= value < 1 << (8 * width):
+            raise ValueError(f'{el.object_id} has a {attribute} value outside the range of the ballot pack format.')
+        encoded.append(value.to_bytes(width, 'big'))
+    return encoded
+
+def packed(ballot: CiphertextAcceptedBallot, el, columns: list[tuple[str, str, int]]) -> list[bytes]:
+    """Returns encode(el, columns) for a selection or contest `el` of `ballot`, naming the ballot in any error."""
+    try:
+        return encode(el, columns)
+    except ValueError as e:
+        raise ValueError(f'Encrypted ballot {ballot.object_id} cannot be packed: {e} Verify the ballot files without a pack.')
+
+def write_pack(path: str, ballots: Iterable[CiphertextAcceptedBallot], digest: bytes, stats: bytes) -> int:
+    """Writes `ballots` as a pack to `path`, recording the `digest` of the source files' contents and
+       the `stats` digest of their names, sizes, and modification times. Columns are spooled
+       to temporary files so that ballots may be streamed. Returns the number of ballots packed.
+       Raises ValueError, leaving any existing pack at `path` in place, if a ballot value cannot be packed."""
+    selection_columns: list = [TemporaryFile() for _ in SELECTION_COLUMNS]
+    contest_columns: list = [TemporaryFile() for _ in CONTEST_COLUMNS]
+    index: list = []
+    selections: int = 0
+    contests: int = 0
+    for ballot in ballots:
+        ballot_index: list = []
+        for contest in ballot.contests:
+            contest_index: list = []
+            for selection in contest.ballot_selections:
+                for column, value in zip(selection_columns, packed(ballot, selection, SELECTION_COLUMNS)):
+                    column.write(value)
+                contest_index.append([selection.object_id, selection.is_placeholder_selection])
+                selections += 1
+            for column, value in zip(contest_columns, packed(ballot, contest, CONTEST_COLUMNS)):
+                column.write(value)
+            ballot_index.append([contest.object_id, contest_index])
+            contests += 1
+        index.append([ballot.object_id, ballot.state.name, ballot_index])
+
+    # Write to a temporary path first so that an interrupted pack never replaces a valid one
+    encoded_index: bytes = dumps(index, separators=(',', ':')).encode()
+    index_offset: int = HEADER.size + selections * sum(width for _, _, width in SELECTION_COLUMNS) + contests * sum(width for _, _, width in CONTEST_COLUMNS)
+    partial_path: str = path + '.partial'
+    makedirs(dirname(path) or '.', exist_ok=True)
+    with open(partial_path, WRITE_BINARY) as f:
+        f.write(HEADER.pack(MAGIC, VERSION, digest, stats, selections, contests, index_offset, len(encoded_index)))
+        for column in selection_columns + contest_columns:
+            column.seek(0)
+            copyfileobj(column, f, CHUNK)
+            column.close()
+        f.write(encoded_index)
+    replace(partial_path, path)
+    return len(index)
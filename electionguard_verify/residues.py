@@ -0,0 +1,97 @@
+""" residues.py
+    Nicholas Boucher 2020
+
+    Checking of membership of elements in the order q subgroup Zₚʳ of Zₚ*,
+    either one element at a time or in batches.
+"""
+
+from secrets import randbelow
+from electionguard.group import ElementModP
+from electionguard_verify.constants import P
+from electionguard_verify.arithmetic import Backend, backend
+from electionguard_verify.multiexp import multiexp
+from electionguard_verify.metrics import MODEXP, RESIDUE, count
+from electionguard_verify.utils import Invariants, bisect
+
+
+# Default number of elements folded into a single batch membership check
+BATCH_SIZE: int = 1024
+
+
+class Residues():
+    """Checks each element's membership in Zₚʳ with a full exponentiation xᵠ = 1 (mod p)
+       as it is supplied, recording the outcome in `invariants`."""
+
+    invariants: Invariants
+
+    def __init__(self, invariants: Invariants):
+        """Instantiate a checker recording outcomes in `invariants`."""
+        self.invariants = invariants
+
+    def check(self, invariant: str, value: ElementModP, element: str = None) -> None:
+        """Checks that `value` is a valid residue in Zₚʳ."""
+        count(RESIDUE)
+        self.invariants.ensure(invariant, is_valid_residue(value), element)
+
+    def flush(self) -> None:
+        """Completes any outstanding checks. Elements are checked immediately, so this does nothing."""
+        pass
+
+class BatchResidues(Residues):
+    """Defers membership checks and resolves up to `size` of them at once.
+       As p - 1 = 2qr for primes q and r, an element x of Zₚ* lies in Zₚʳ exactly when its
+       Legendre symbol is 1 and its order r component is trivial. The Legendre symbol is
+       cheap and is checked exactly per element, while the order r components of a batch
+       are checked together by testing (∏ xᵢᵟⁱ)ᵠ = 1 (mod p) for random `soundness`-bit δᵢ,
+       which a batch containing a non-member passes with probability at most 2^-`soundness`.
+       A failing batch is bisected until the non-members are isolated and checked exactly."""
+
+    soundness: int
+    size: int
+    pending: list[tuple[str, ElementModP, str]]
+
+    def __init__(self, invariants: Invariants, soundness: int, size: int = BATCH_SIZE):
+        """Instantiate a batch checker recording outcomes in `invariants`."""
+        super().__init__(invariants)
+        self.soundness = soundness
+        self.size = size
+        self.pending = []
+
+    def check(self, invariant: str, value: ElementModP, element: str = None) -> None:
+        """Queues `value` for a membership check, checking the queue once it holds `size` elements."""
+        count(RESIDUE)
+        self.pending.append((invariant, value, element))
+        if len(self.pending) >= self.size:
+            self.flush()
+
+    def flush(self) -> None:
+        """Checks all queued elements."""
+        pending, self.pending = self.pending, []
+        if pending:
+            bisect(self.invariants, pending, self.holds, lambda residue: is_valid_residue(residue[1]))
+
+    def holds(self, residues: list[tuple[str, ElementModP, str]]) -> bool:
+        """Returns whether every element of `residues` passes the batch membership test."""
+        arithmetic: Backend = backend()
+        terms: list[tuple[int, int]] = []
+        count(MODEXP, len(residues) + 1)
+        for _, value, _ in residues:
+            element: int = arithmetic.integer(value.elem)
+            if not 0 < element < P or arithmetic.jacobi(element, arithmetic.p) != 1:
+                return False
+            terms.append((element, 1 + randbelow((1 << self.soundness) - 1)))
+        return arithmetic.powmod(multiexp(terms), arithmetic.q, arithmetic.p) == 1
+
+def is_valid_residue(value: ElementModP) -> bool:
+    """Returns whether `value` is in Zₚʳ, checked with a full exponentiation."""
+    arithmetic: Backend = backend()
+    element: int = arithmetic.integer(value.elem)
+    count(MODEXP)
+    return 0 <= element < P and arithmetic.powmod(element, arithmetic.q, arithmetic.p) == 1
+
+def residues_for(invariants: Invariants, strict: bool, soundness: int) -> Residues:
+    """Returns an exact checker if `strict` is set, otherwise a batch checker with the given `soundness`."""
+    if strict:
+        return Residues(invariants)
+    else:
+        return BatchResidues(invariants, soundness)
@@ -0,0 +1,80 @@
+""" sample.py
+    Nicholas Boucher 2020
+
+    Sampling audits of encrypted ballots, verifying the proofs of a reproducibly
+    seeded random sample of ballots and bounding, with a chosen confidence, the
+    number of ballots with invalid proofs which the sample could have missed.
+"""
+
+from hashlib import sha256
+from math import ceil, log
+from electionguard.ballot import CiphertextAcceptedBallot
+
+
+# Default confidence of the bound on the ballots with invalid proofs outside the sample
+CONFIDENCE: float = 0.95
+# Number of bytes of the digest of each ballot compared against the sample rate
+SAMPLE_BYTES: int = 8
+
+
+class Sample():
+    """A random sample of encrypted ballots, each included independently with probability `rate`
+       by a digest of its object_id under `seed`, so that the same seed selects the same ballots
+       whatever order they are read in. If the ballots had D invalid proofs, the sample would miss
+       all of them with probability (1 - rate)^D, which bounds the invalid ballots left unsampled."""
+
+    rate: float
+    confidence: float
+    seed: int
+    ballots: int
+    sampled: int
+
+    def __init__(self, rate: float, seed: int, confidence: float = CONFIDENCE):
+        """Instantiate a sample of a fraction `rate` of ballots drawn with `seed`, raising ValueError
+           unless `rate` is in (0,1] and `confidence` is in (0,1)."""
+        if not 0 < rate <= 1:
+            raise ValueError(f'Sample rate {rate} is not in (0,1].')
+        if not 0 < confidence < 1:
+            raise ValueError(f'Confidence {confidence} is not in (0,1).')
+        self.rate = rate
+        self.confidence = confidence
+        self.seed = seed
+        self.ballots = 0
+        self.sampled = 0
+
+    def includes(self, ballot: CiphertextAcceptedBallot) -> bool:
+        """Returns whether `ballot` is in the sample, counting it among the ballots drawn."""
+        digest: bytes = sha256(f'{self.seed}:{ballot.object_id}'.encode('utf-8')).digest()
+        included: bool = int.from_bytes(digest[:SAMPLE_BYTES], 'big') < self.rate * (1 << (8 * SAMPLE_BYTES))
+        self.ballots += 1
+        self.sampled += included
+        return included
+
+    def undetected(self) -> int:
+        """Returns the largest number of ballots with invalid proofs which could have been missed by a
+           sample containing none, with the sample's confidence: a sample misses D invalid ballots with
+           probability at most 1 - confidence once D reaches the smallest D with (1 - rate)^D ≤ 1 - confidence."""
+        if self.rate >= 1:
+            return 0
+        threshold: int = max(ceil(log(1 - self.confidence) / log(1 - self.rate)), 1)
+        # Correct for rounding in the logarithms
+        while threshold > 1 and (1 - self.rate) ** (threshold - 1) <= 1 - self.confidence:
+            threshold -= 1
+        return min(threshold - 1, self.ballots - self.sampled)
+
+    def bound(self) -> float:
+        """Returns the largest fraction of ballots with invalid proofs which could have been missed,
+           with the sample's confidence."""
+        return self.undetected() / self.ballots if self.ballots else 0.0
+
+    def as_dict(self) -> dict:
+        """Returns the sample as a dictionary suitable for serializing as JSON."""
+        return {
+            'rate': self.rate,
+            'seed': self.seed,
+            'confidence': self.confidence,
+            'ballots': self.ballots,
+            'sampled': self.sampled,
+            'undetected_bound': self.undetected(),
+            'fraction_bound': self.bound()
+        }
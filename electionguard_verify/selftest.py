@@ -0,0 +1,98 @@
+""" selftest.py
+    Nicholas Boucher 2020
+
+    Self-test of the arithmetic backends, checking that every available backend
+    computes exactly the same results on random inputs as Python's built-in
+    integer arithmetic, both for the primitive operations and for the
+    exponentiation routines built on them, and that hashing of elements
+    matches the electionguard package byte for byte.
+"""
+
+from random import Random
+from electionguard.group import int_to_p_unchecked, int_to_q_unchecked
+from electionguard.hash import hash_elems as electionguard_hash_elems, CRYPTO_HASHABLE_ALL
+from electionguard_verify.constants import P, Q, G
+from electionguard_verify.arithmetic import BACKENDS, backend, set_backend
+from electionguard_verify.fixed_base import FixedBase
+from electionguard_verify.multiexp import multiexp
+from electionguard_verify.residues import is_valid_residue
+from electionguard_verify.hashing import hash_elems, hash_prefix
+
+
+# Default number of random inputs each operation is checked against
+TRIALS: int = 25
+# Largest exponent size checked, covering exponents mod q scaled by the batch soundness parameter
+EXPONENT_BITS: int = Q.bit_length() + 64
+# Largest number of elements hashed together, and depth of nested sequences of elements
+HASHED_ELEMENTS: int = 8
+HASHED_DEPTH: int = 2
+
+
+def self_test(trials: int = TRIALS, seed: int = 0) -> dict[str, list[str]]:
+    """Checks each available backend against built-in integer arithmetic on `trials` random
+       inputs per operation drawn from `seed`, returning the operations failing for each backend."""
+    previous: str = backend().name
+    failures: dict[str, list[str]] = {}
+    try:
+        for name in BACKENDS:
+            set_backend(name)
+            failures[name] = check_backend(Random(seed), trials)
+    finally:
+        set_backend(previous)
+    return failures
+
+def check_backend(rng: Random, trials: int) -> list[str]:
+    """Returns the operations of the backend in use which disagree with built-in integer arithmetic.
+       As the Legendre symbol has no cheap built-in equivalent, it is checked to be multiplicative,
+       to be 1 on squares, and to be -1 on the non-residue p - 1, which together determine it."""
+    arithmetic = backend()
+    failed: set[str] = set()
+    def ensure(operation: str, condition: bool) -> None:
+        if not condition:
+            failed.add(operation)
+    for _ in range(trials):
+        x: int = rng.randrange(1, P)
+        e: int = rng.getrandbits(rng.randrange(1, EXPONENT_BITS))
+        ensure('powmod', int(arithmetic.powmod(arithmetic.integer(x), e, arithmetic.p)) == pow(x, e, P))
+        ensure('invert', int(arithmetic.invert(arithmetic.integer(x), arithmetic.p)) == pow(x, -1, P))
+        y: int = rng.randrange(1, P)
+        symbol: int = int(arithmetic.jacobi(arithmetic.integer(x), arithmetic.p))
+        ensure('jacobi', symbol in (-1, 1) and symbol * arithmetic.jacobi(arithmetic.integer(y), arithmetic.p) == arithmetic.jacobi(arithmetic.integer(x * y % P), arithmetic.p))
+        ensure('jacobi', arithmetic.jacobi(arithmetic.integer(x * x % P), arithmetic.p) == 1)
+        ensure('jacobi', arithmetic.jacobi(arithmetic.integer(P - 1), arithmetic.p) == -1)
+        terms: list[tuple[int, int]] = [(rng.randrange(P), rng.getrandbits(rng.randrange(1, EXPONENT_BITS))) for _ in range(rng.randrange(6))]
+        expected: int = 1
+        for base, exponent in terms:
+            expected = expected * pow(base, exponent, P) % P
+        ensure('multiexp', int(multiexp(terms)) == expected)
+        table: FixedBase = FixedBase(x, rng.randrange(1, 5), 64)
+        exponent: int = rng.getrandbits(rng.randrange(1, 96))
+        ensure('fixed-base exponentiation', int(table.pow(exponent).elem) == pow(x, exponent, P))
+        residue: int = pow(G, rng.randrange(Q), P) if rng.randrange(2) else x
+        ensure('subgroup membership', is_valid_residue(int_to_p_unchecked(residue)) == (pow(residue, Q, P) == 1))
+        elements: list[CRYPTO_HASHABLE_ALL] = [random_hashable(rng) for _ in range(rng.randrange(HASHED_ELEMENTS))]
+        leading: int = rng.randrange(len(elements) + 1)
+        while any(isinstance(element, list) for element in elements[:leading]):
+            leading -= 1
+        expected_hash: int = int(electionguard_hash_elems(*elements).elem)
+        ensure('hashing', int(hash_elems(*elements).elem) == expected_hash)
+        ensure('prefix hashing', int(hash_prefix(*elements[:leading]).hash(*elements[leading:]).elem) == expected_hash)
+    return sorted(failed)
+
+def random_hashable(rng: Random, depth: int = 0) -> CRYPTO_HASHABLE_ALL:
+    """Returns a random value of any type hashed by the electionguard package, including elements with
+       odd-length hex serializations, falsy values serialized as null, and nested sequences."""
+    kind: int = rng.randrange(7 if depth < HASHED_DEPTH else 6)
+    if kind == 0:
+        return int_to_p_unchecked(rng.randrange(P) >> rng.choice([0, rng.randrange(P.bit_length())]))
+    if kind == 1:
+        return int_to_q_unchecked(rng.randrange(Q) >> rng.choice([0, rng.randrange(Q.bit_length())]))
+    if kind == 2:
+        return ''.join(chr(rng.randrange(32, 0x250)) for _ in range(rng.randrange(12)))
+    if kind == 3:
+        return rng.choice([0, 1, -1, rng.getrandbits(rng.randrange(1, 300))])
+    if kind == 4:
+        return None
+    if kind == 5:
+        return []
+    return [random_hashable(rng, depth + 1) for _ in range(rng.randrange(1, 4))]
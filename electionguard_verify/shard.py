@@ -0,0 +1,161 @@
+""" shard.py
+    Nicholas Boucher 2020
+
+    Partial verification results of one shard of an election's ballots, allowing
+    ballot verification to be spread across machines sharing a filesystem and
+    the partial results to be merged into a final verification.
+"""
+
+from os import replace
+from os.path import basename
+from json import dump, load, dumps
+from hashlib import sha256
+from hmac import new as hmac, compare_digest
+from typing import Iterable
+from electionguard_verify.store import encode_products, decode_products
+from electionguard_verify.utils import Invariants, Aggregates, warn
+
+
+# Default file name prefix of partial results within an election results directory
+SHARD_PREFIX: str = 'egverify_shard_'
+# Version of the partial result format, to be incremented whenever the per-shard checks change
+PARTIAL_VERSION: int = 1
+READ: str = 'r'
+READ_BINARY: str = 'rb'
+WRITE: str = 'w'
+
+
+class Partial():
+    """The outcome of the ballot selection encryption, vote limit, and spoiled ballot checks
+       over one shard of an election, along with the shard's contribution to the aggregates (A,B).
+       The tally-level checks which depend on every ballot are left to the merge of all shards."""
+
+    shard_index: int
+    shard_count: int
+    extended_base_hash: str
+    manifest: str
+    total_files: int
+    files: int
+    spoiled_ballots: list[str]
+    ballot_selections: Invariants
+    vote_limits: Invariants
+    spoils: Invariants
+    aggregates: Aggregates
+
+    def __init__(self, shard_index: int, shard_count: int, extended_base_hash: str, manifest: str, total_files: int, files: int, spoiled_ballots: list[str],
+                 ballot_selections: Invariants, vote_limits: Invariants, spoils: Invariants, aggregates: Aggregates):
+        """Instantiate the partial result of shard `shard_index` of `shard_count`, which verified `files` of
+           the `total_files` encrypted ballot files listed by `manifest` and the spoiled ballots `spoiled_ballots`."""
+        self.shard_index = shard_index
+        self.shard_count = shard_count
+        self.extended_base_hash = extended_base_hash
+        self.manifest = manifest
+        self.total_files = total_files
+        self.files = files
+        self.spoiled_ballots = spoiled_ballots
+        self.ballot_selections = ballot_selections
+        self.vote_limits = vote_limits
+        self.spoils = spoils
+        self.aggregates = aggregates
+
+    def as_dict(self) -> dict:
+        """Returns the partial result as a dictionary suitable for serializing as JSON."""
+        return {
+            'version': PARTIAL_VERSION,
+            'shard_index': self.shard_index,
+            'shard_count': self.shard_count,
+            'extended_base_hash': self.extended_base_hash,
+            'manifest': self.manifest,
+            'total_files': self.total_files,
+            'files': self.files,
+            'spoiled_ballots': self.spoiled_ballots,
+            'stages': {invariants.title: {'conditions': invariants.conditions, 'failures': invariants.failures}
+                       for invariants in (self.ballot_selections, self.vote_limits, self.spoils)},
+            'products': encode_products(self.aggregates)
+        }
+
+    def write(self, path: str, key: bytes = None) -> None:
+        """Writes the partial result as JSON to `path` along with its digest, signed with
+           HMAC-SHA256 under `key` if given. The file is replaced atomically so that a
+           merge reading from a shared filesystem never sees a partially written result."""
+        result: dict = self.as_dict()
+        with open(path + '.tmp', WRITE) as f:
+            dump({'result': result, 'digest': digest(result), 'signature': sign(result, key) if key else None}, f, ensure_ascii=False)
+        replace(path + '.tmp', path)
+
+def read_partial(path: str, key: bytes = None) -> Partial:
+    """Returns the partial result written to `path`, raising ValueError if its digest does not match,
+       or if `key` is given and it does not carry a valid signature under `key`."""
+    with open(path, READ) as f:
+        signed: dict = load(f)
+    result: dict = signed['result']
+    if not compare_digest(signed['digest'], digest(result)):
+        raise ValueError(f'Partial result {path} does not match its digest.')
+    if key and not (signed['signature'] and compare_digest(signed['signature'], sign(result, key))):
+        raise ValueError(f'Partial result {path} is not signed with the given key.')
+    if not key and signed['signature']:
+        warn(f'Partial result {path} is signed, but no key was given to check its signature.')
+    if result['version'] != PARTIAL_VERSION:
+        raise ValueError(f'Partial result {path} was written by an incompatible version of the verifier.')
+    stages: list[Invariants] = []
+    for title, stage in result['stages'].items():
+        invariants: Invariants = Invariants(title)
+        invariants.conditions = stage['conditions']
+        invariants.failures = stage['failures']
+        stages.append(invariants)
+    return Partial(result['shard_index'], result['shard_count'], result['extended_base_hash'], result['manifest'], result['total_files'],
+                   result['files'], result['spoiled_ballots'], *stages, decode_products(result['products']))
+
+def merge_partials(partials: list[Partial], manifest: str) -> Partial:
+    """Returns the combination of the partial results of every shard of an election, raising
+       ValueError unless `partials` holds exactly one result for each shard of the same partition
+       of the encrypted ballot files listed by `manifest`."""
+    if not partials:
+        raise ValueError('No partial results were given.')
+    first: Partial = partials[0]
+    if any(partial.shard_count != first.shard_count or partial.manifest != first.manifest for partial in partials):
+        raise ValueError('Partial results were computed over different partitions of the encrypted ballot files.')
+    if first.manifest != manifest:
+        raise ValueError('Partial results were computed over different encrypted ballot files than those being merged.')
+    indices: list[int] = sorted(partial.shard_index for partial in partials)
+    if indices != list(range(first.shard_count)):
+        raise ValueError(f'Expected exactly one partial result for each of {first.shard_count} shards, but found results for shards {indices}.')
+    merged: Partial = Partial(None, first.shard_count, first.extended_base_hash, first.manifest, first.total_files, 0, [],
+                              Invariants(first.ballot_selections.title), Invariants(first.vote_limits.title), Invariants(first.spoils.title), Aggregates())
+    for partial in partials:
+        if partial.extended_base_hash != first.extended_base_hash:
+            merged.extended_base_hash = None
+        merged.files += partial.files
+        merged.spoiled_ballots.extend(partial.spoiled_ballots)
+        merged.ballot_selections.merge(partial.ballot_selections)
+        merged.vote_limits.merge(partial.vote_limits)
+        merged.spoils.merge(partial.spoils)
+        merged.aggregates.merge(partial.aggregates)
+    return merged
+
+def shard_of(name: str, shard_count: int) -> int:
+    """Returns the shard of `shard_count` to which the ballot file or ballot `name` is assigned. Assignment
+       depends only on the name, so every machine partitions the same files identically."""
+    return int.from_bytes(sha256(basename(name).encode()).digest()[:8], 'big') % shard_count
+
+def manifest_digest(files: Iterable[str]) -> str:
+    """Returns a SHA-256 digest of the names of `files`, independent of their order, identifying
+       the set of encrypted ballot files which was partitioned."""
+    return sha256(dumps(sorted(basename(file) for file in files)).encode()).hexdigest()
+
+def digest(result: dict) -> str:
+    """Returns the SHA-256 digest of the canonical JSON encoding of `result`."""
+    return sha256(canonical(result)).hexdigest()
+
+def sign(result: dict, key: bytes) -> str:
+    """Returns the HMAC-SHA256 of the canonical JSON encoding of `result` under `key`."""
+    return hmac(key, canonical(result), sha256).hexdigest()
+
+def canonical(result: dict) -> bytes:
+    """Returns the canonical JSON encoding of `result` over which digests are computed."""
+    return dumps(result, sort_keys=True, separators=(',', ':'), ensure_ascii=False).encode()
+
+def read_key(path: str) -> bytes:
+    """Returns the signing key stored in the file at `path`."""
+    with open(path, READ_BINARY) as f:
+        return f.read().strip()
@@ -0,0 +1,135 @@
+""" store.py
+    Nicholas Boucher 2020
+
+    Persistent store of per-ballot verification results, allowing repeated
+    verifications of a growing election to only verify new or changed ballots.
+"""
+
+from os import makedirs
+from os.path import dirname
+from time import time_ns
+from json import dumps, loads
+from hashlib import sha256
+from sqlite3 import connect, Connection
+from logging import info
+from typing import Iterable, Iterator
+from electionguard.group import ElementModQ
+from electionguard.ballot import CiphertextAcceptedBallot
+from electionguard_verify.pack import SELECTION_COLUMNS, CONTEST_COLUMNS
+from electionguard_verify.arithmetic import Backend, backend
+from electionguard_verify.utils import Aggregates
+
+
+# Default file name of the result store within the cache directory of an election results directory
+STORE_FILE_NAME: str = 'egverify_results.sqlite'
+# Default maximum size in bytes of the stored results
+STORE_SIZE: int = 1024 * 1024 * 1024
+# Version of the stored results, to be incremented whenever the per-ballot checks change
+STORE_VERSION: int = 2
+
+
+class ResultStore():
+    """An SQLite store of the ballots which passed the ballot selection encryption and
+       vote limit checks, keyed by a digest of each ballot's contents and the extended base
+       hash Q̅ of the election, alongside the ballot's contribution to the aggregates (A,B).
+       New results are only saved by `commit`, once every ballot of a run has been verified.
+       The least recently used results are evicted when the store exceeds `max_size` bytes."""
+
+    path: str
+    max_size: int
+    connection: Connection
+    run: int
+    hits: int
+    misses: int
+
+    def __init__(self, path: str, max_size: int = STORE_SIZE, rebuild: bool = False):
+        """Opens or creates the store at `path`, discarding all stored results if `rebuild` is set
+           or they were saved by a different version of the verifier. Raises `sqlite3.Error` or
+           OSError if the store cannot be opened for writing."""
+        self.path = path
+        self.max_size = max_size
+        makedirs(dirname(path) or '.', exist_ok=True)
+        self.connection = connect(path)
+        self.run = time_ns()
+        self.hits = 0
+        self.misses = 0
+        if rebuild or self.connection.execute('PRAGMA user_version').fetchone()[0] != STORE_VERSION:
+            self.connection.execute('DROP TABLE IF EXISTS ballots')
+            self.connection.execute(f'PRAGMA user_version = {STORE_VERSION}')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS ballots (key BLOB PRIMARY KEY, products TEXT NOT NULL, size INTEGER NOT NULL, last_used INTEGER NOT NULL)')
+        self.connection.execute('CREATE INDEX IF NOT EXISTS ballots_last_used ON ballots (last_used)')
+        # Fail now rather than mid-verification if an existing store cannot be written to
+        self.connection.execute('DELETE FROM ballots WHERE 0')
+        self.connection.commit()
+
+    def __enter__(self) -> 'ResultStore':
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Closes the store, discarding any results which were not committed."""
+        self.connection.close()
+
+    def unverified(self, ballots: Iterable[CiphertextAcceptedBallot], extended_base_hash: ElementModQ, aggregates: Aggregates) -> Iterator[CiphertextAcceptedBallot]:
+        """Yields the ballots of `ballots` without stored results under `extended_base_hash`, queueing them
+           to be stored on `commit`. The stored contributions of the remaining ballots are multiplied into `aggregates`."""
+        for ballot in ballots:
+            key: bytes = ballot_digest(ballot, extended_base_hash)
+            row: tuple = self.connection.execute('SELECT products FROM ballots WHERE key = ?', (key,)).fetchone()
+            if row:
+                self.hits += 1
+                aggregates.merge(decode_products(loads(row[0])))
+                self.connection.execute('UPDATE ballots SET last_used = ? WHERE key = ?', (self.run, key))
+            else:
+                self.misses += 1
+                products: str = dumps(encode_products(Aggregates([ballot])))
+                self.connection.execute('INSERT OR REPLACE INTO ballots VALUES (?, ?, ?, ?)', (key, products, len(key) + len(products), self.run))
+                yield ballot
+
+    def commit(self) -> None:
+        """Saves the results of the ballots verified in this run, then evicts the least recently
+           used results until the store fits within its maximum size."""
+        info(f'{self.hits} encrypted ballots were previously verified according to the result store, {self.misses} were verified.')
+        self.connection.commit()
+        size: int = self.connection.execute('SELECT COALESCE(SUM(size), 0) FROM ballots').fetchone()[0]
+        if size > self.max_size:
+            evicted: int = 0
+            for key, row_size in self.connection.execute('SELECT key, size FROM ballots ORDER BY last_used').fetchall():
+                if size <= self.max_size:
+                    break
+                self.connection.execute('DELETE FROM ballots WHERE key = ?', (key,))
+                size -= row_size
+                evicted += 1
+            self.connection.commit()
+            info(f'Evicted {evicted} ballot results from the result store to fit within {self.max_size} bytes.')
+
+def ballot_digest(ballot: CiphertextAcceptedBallot, extended_base_hash: ElementModQ) -> bytes:
+    """Returns a SHA-256 digest of every value of `ballot` read by the ballot selection
+       encryption and vote limit checks, along with the extended base hash Q̅."""
+    digest = sha256()
+    digest.update(hex(extended_base_hash.elem).encode())
+    digest.update(dumps([ballot.object_id, ballot.state.name]).encode())
+    for contest in ballot.contests:
+        digest.update(dumps([contest.object_id, values(contest, CONTEST_COLUMNS)]).encode())
+        for selection in contest.ballot_selections:
+            digest.update(dumps([selection.object_id, selection.is_placeholder_selection, values(selection, SELECTION_COLUMNS)]).encode())
+    return digest.digest()
+
+def values(el, columns: list[tuple[str, str, int]]) -> list[str]:
+    """Returns the `columns` values of a ballot selection or contest `el` in hexadecimal. Values are
+       not checked, so that a malformed ballot is still verified, and fails, rather than rejected here."""
+    return [hex(int(getattr(getattr(el, group), attribute).elem)) for group, attribute, _ in columns]
+
+def encode_products(aggregates: Aggregates) -> list[list[str]]:
+    """Returns the products of `aggregates` as a list of [contest, selection, A, B], with A and B in hexadecimal."""
+    return [[contest_id, selection_id, hex(A), hex(B)] for (contest_id, selection_id), (A, B) in aggregates.products.items()]
+
+def decode_products(products: list[list[str]]) -> Aggregates:
+    """Returns the aggregates encoded by `encode_products`."""
+    arithmetic: Backend = backend()
+    aggregates: Aggregates = Aggregates()
+    for contest_id, selection_id, A, B in products:
+        aggregates.products[contest_id, selection_id] = (arithmetic.integer(int(A, 16)), arithmetic.integer(int(B, 16)))
+    return aggregates
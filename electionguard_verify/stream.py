@@ -0,0 +1,212 @@
+""" stream.py
+    Nicholas Boucher 2020
+
+    Incremental parsing of the tally JSON files, whose size grows with the
+    number of spoiled ballots. Members of the tallies are deserialized one at
+    a time as they are iterated, so that neither the text of a file nor all
+    of its spoiled ballots are held in memory at once.
+"""
+
+from json import JSONDecoder, JSONDecodeError
+from collections.abc import Mapping
+from typing import Any, Callable, Iterator, TextIO
+from electionguard.serializable import read_json_object
+from electionguard.tally import PlaintextTally, PlaintextTallyContest, PublishedCiphertextTally, CiphertextTallyContest
+
+
+# Number of characters read from a file at a time, grown as needed to hold a single value
+CHUNK_SIZE: int = 1 << 20
+WHITESPACE: str = ' \t\n\r'
+# Characters which can continue a JSON number
+NUMBER: str = '0123456789.eE+-'
+READ: str = 'r'
+DECODER: JSONDecoder = JSONDecoder()
+
+
+class JSONReader():
+    """Reads the JSON text of a file incrementally, holding only the text of the value being read.
+       Objects and arrays can be walked member by member, so that large containers are never
+       decoded whole."""
+
+    f: TextIO
+    buffer: str
+    position: int
+    size: int
+
+    def __init__(self, f: TextIO, size: int = CHUNK_SIZE):
+        """Instantiate a reader of the JSON text of the open file `f`, read `size` characters at a time."""
+        self.f = f
+        self.buffer = ''
+        self.position = 0
+        self.size = size
+
+    def fill(self) -> bool:
+        """Reads further text into the buffer, dropping the text already consumed, and returns whether any
+           was read. At least as much text as is buffered is read, so that a long value is decoded in
+           a number of attempts logarithmic in its length."""
+        chunk: str = self.f.read(max(self.size, len(self.buffer) - self.position))
+        self.buffer = self.buffer[self.position:] + chunk
+        self.position = 0
+        return bool(chunk)
+
+    def peek(self) -> str:
+        """Returns the next character which is not whitespace without consuming it, or '' at the end of the file."""
+        while True:
+            while self.position < len(self.buffer) and self.buffer[self.position] in WHITESPACE:
+                self.position += 1
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            if not self.fill():
+                return ''
+
+    def expect(self, char: str) -> None:
+        """Consumes the next character which is not whitespace, raising ValueError unless it is `char`."""
+        if self.peek() != char:
+            raise ValueError(f'Expected {char!r} in JSON file {self.f.name}.')
+        self.position += 1
+
+    def value(self) -> Any:
+        """Consumes and returns the next JSON value, decoded."""
+        self.peek()
+        while True:
+            try:
+                value, end = DECODER.raw_decode(self.buffer, self.position)
+            except JSONDecodeError:
+                if not self.fill():
+                    raise
+                continue
+            # A number followed by nothing but text which could continue it, such as '1.' or '1e', may continue
+            # in the text not yet read, until a delimiter shows that it has ended
+            if isinstance(value, (int, float)) and not isinstance(value, bool) and all(char in NUMBER for char in self.buffer[end:]) and self.fill():
+                continue
+            self.position = end
+            return value
+
+    def members(self) -> Iterator[str]:
+        """Consumes the next JSON object, yielding the key of each member in turn. The value of each
+           member must be consumed, with value, skip, members, or elements, before the next key is taken."""
+        self.expect('{')
+        if self.peek() == '}':
+            self.position += 1
+            return
+        while True:
+            key: str = self.value()
+            self.expect(':')
+            yield key
+            if self.peek() != ',':
+                self.expect('}')
+                return
+            self.position += 1
+
+    def elements(self) -> Iterator[int]:
+        """Consumes the next JSON array, yielding the index of each element in turn. Each element must
+           be consumed before the next index is taken."""
+        self.expect('[')
+        if self.peek() == ']':
+            self.position += 1
+            return
+        index: int = 0
+        while True:
+            yield index
+            index += 1
+            if self.peek() != ',':
+                self.expect(']')
+                return
+            self.position += 1
+
+    def skip(self) -> None:
+        """Consumes the next JSON value without decoding any container within it whole."""
+        char: str = self.peek()
+        if char == '{':
+            for _ in self.members():
+                self.skip()
+        elif char == '[':
+            for _ in self.elements():
+                self.skip()
+        else:
+            self.value()
+
+class StreamedMapping(Mapping):
+    """A read-only mapping of the members of the object found by following `keys` from the top-level
+       object of the JSON file at `path`, deserializing each value with `parse` as it is read rather than
+       holding the values in memory. The file is read again by every iteration and lookup."""
+
+    path: str
+    keys: tuple[str, ...]
+    parse: Callable[[Any], Any]
+
+    def __init__(self, path: str, keys: tuple[str, ...], parse: Callable[[Any], Any]):
+        """Instantiate a mapping of the object at `keys` within the JSON file at `path`."""
+        self.path = path
+        self.keys = keys
+        self.parse = parse
+
+    def __getitem__(self, key: str) -> Any:
+        """Returns the deserialized value of the member `key`, raising KeyError if there is none."""
+        for member, value in stream_members(self.path, self.keys, lambda member: member == key):
+            if member == key:
+                return self.parse(value)
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        """Yields the key of each member, without decoding any values."""
+        for member, _ in stream_members(self.path, self.keys, lambda _: False):
+            yield member
+
+    def __len__(self) -> int:
+        """Returns the number of members."""
+        return sum(1 for _ in self)
+
+    def items(self) -> Iterator[tuple[str, Any]]:
+        """Yields each member's key and deserialized value, reading the file once."""
+        for member, value in stream_members(self.path, self.keys):
+            yield member, self.parse(value)
+
+    def values(self) -> Iterator[Any]:
+        """Yields each member's deserialized value, reading the file once."""
+        for _, value in self.items():
+            yield value
+
+
+def stream_members(path: str, keys: tuple[str, ...], wanted: Callable[[str], bool] = None) -> Iterator[tuple[str, Any]]:
+    """Yields the key and decoded JSON value of each member of the object found by following `keys` from
+       the top-level object of the JSON file at `path`, one at a time. The values of members not `wanted`
+       are skipped and yielded as None. Reading stops once the object has been read."""
+    with open(path, READ) as f:
+        yield from members_at(JSONReader(f), keys, wanted)
+
+def members_at(reader: JSONReader, keys: tuple[str, ...], wanted: Callable[[str], bool] = None) -> Iterator[tuple[str, Any]]:
+    """Yields the members of the object found by following `keys` from the next object of `reader`."""
+    for key in reader.members():
+        if not keys:
+            if wanted is None or wanted(key):
+                yield key, reader.value()
+            else:
+                reader.skip()
+                yield key, None
+        elif key == keys[0]:
+            yield from members_at(reader, keys[1:], wanted)
+            return
+        else:
+            reader.skip()
+
+def read_member(path: str, key: str) -> Any:
+    """Returns the decoded value of the member `key` of the top-level object of the JSON file at `path`,
+       or None if there is none, without decoding any other member."""
+    for member, value in stream_members(path, (), lambda member: member == key):
+        if member == key:
+            return value
+    return None
+
+def read_plaintext_tally(path: str) -> PlaintextTally:
+    """Returns the tally in the JSON file at `path`, with its contests deserialized and its spoiled
+       ballots deserialized one at a time as they are iterated. The contests of a tally are no larger
+       than a single spoiled ballot."""
+    contests: dict[str, PlaintextTallyContest] = {key: read_json_object(value, PlaintextTallyContest) for key, value in stream_members(path, ('contests',))}
+    spoiled_ballots: StreamedMapping = StreamedMapping(path, ('spoiled_ballots',), lambda ballot: {key: read_json_object(contest, PlaintextTallyContest) for key, contest in ballot.items()})
+    return PlaintextTally(read_member(path, 'object_id'), contests, spoiled_ballots)
+
+def read_ciphertext_tally(path: str) -> PublishedCiphertextTally:
+    """Returns the encrypted tally in the JSON file at `path`, with its cast contests deserialized one
+       at a time as they are iterated."""
+    return PublishedCiphertextTally(read_member(path, 'object_id'), StreamedMapping(path, ('cast',), lambda contest: read_json_object(contest, CiphertextTallyContest)))
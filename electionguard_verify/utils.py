@@ -5,16 +5,32 @@
     calculations.
 """
 
-from typing import TypeVar, Iterable
+from os import environ
+from os.path import join, abspath, expanduser
+from hashlib import sha256
+from typing import TypeVar, Iterable, Iterator, Callable, Union
 from logging import info, warning
-from electionguard.group import ElementModP, int_to_p
+from collections import deque, Counter
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from multiprocessing import get_all_start_methods, get_context
+from electionguard.group import ElementModP, int_to_p_unchecked
 from electionguard.election import ElectionDescription, ContestDescription
-from electionguard.ballot import CiphertextAcceptedBallot, CiphertextBallotContest, CiphertextBallotSelection
+from electionguard.ballot import CiphertextAcceptedBallot, BallotBoxState
 from electionguard.key_ceremony import CoefficientValidationSet
+from electionguard.tally import PlaintextTallyContest
+from electionguard_verify.constants import Q
+from electionguard_verify.metrics import Report
+from electionguard_verify.arithmetic import Backend, backend
+from electionguard_verify.fixed_base import FixedBase, TABLE_MEMORY, window_for_uses
 
 
 T: TypeVar = TypeVar('T')
 
+# Number of failing elements listed per invariant when logging validation results
+MAX_REPORTED_FAILURES: int = 10
+# Name of the per-user cache directory holding the files the verifier writes about an election
+CACHE_DIR_NAME: str = 'egverify'
+
 
 class Invariants():
     """Represents a series of conditions that must all hold for the
@@ -22,19 +38,39 @@ class Invariants():
 
     title: str
     conditions: dict[str, bool]
+    failures: dict[str, list[str]]
+    report: Report
+    fail_fast: bool
 
-    def __init__(self, title: str):
-        """Instantiate a new set of invariants collectively labelled `title`."""
+    def __init__(self, title: str, report: Report = None, fail_fast: bool = False):
+        """Instantiate a new set of invariants collectively labelled `title`, recording
+           the outcome of their validation in `report` if given. If `fail_fast` is set,
+           InvariantFailure is raised as soon as any condition fails."""
         self.title = title
         self.conditions = {}
+        self.failures = {}
+        self.report = report
+        self.fail_fast = fail_fast
     
-    def ensure(self, invariant: str, condition: bool) -> bool:
-        """Track the truthiness of `condition` for the invariant labelled `invariant`."""
+    def ensure(self, invariant: str, condition: bool, element: str = None) -> bool:
+        """Track the truthiness of `condition` for the invariant labelled `invariant`,
+           optionally recording the identifier `element` of the value that failed it."""
         if invariant in self.conditions:
             self.conditions[invariant] = self.conditions[invariant] and condition
         else:
             self.conditions[invariant] = condition
+        if not condition and element is not None:
+            self.failures.setdefault(invariant, []).append(element)
+        if not condition and self.fail_fast:
+            raise InvariantFailure(self.title, invariant, element or get_first_el(self.failures.get(invariant, [])))
         return condition
+
+    def merge(self, other: 'Invariants') -> None:
+        """Folds the conditions tracked by `other` (e.g. in a worker process) into this set."""
+        for invariant, elements in other.failures.items():
+            self.failures.setdefault(invariant, []).extend(elements)
+        for invariant, condition in other.conditions.items():
+            self.ensure(invariant, condition)
     
     def validate(self) -> bool:
         """Return whether all conditions are valid, logging the results."""
@@ -44,6 +80,12 @@ class Invariants():
             validity = validity and state
             if not state:
                 error_msg += f'\t\tFailed to validate invariant {invariant}.\n'
+                for element in self.failures.get(invariant, [])[:MAX_REPORTED_FAILURES]:
+                    error_msg += f'\t\t\tFailed for {element}.\n'
+                if len(self.failures.get(invariant, [])) > MAX_REPORTED_FAILURES:
+                    error_msg += f'\t\t\t... and {len(self.failures[invariant]) - MAX_REPORTED_FAILURES} more.\n'
+        if self.report:
+            self.report.record(self.title, validity, self.conditions, self.failures)
         if validity:
             info(f'[VALID]: {self.title}')
         else:
@@ -51,6 +93,21 @@ class Invariants():
             info(error_msg)
         return validity
 
+class InvariantFailure(Exception):
+    """Raised by invariants in fail-fast mode at the first failing condition, identifying
+       the invariant and, where known, the element that failed it."""
+
+    title: str
+    invariant: str
+    element: str
+
+    def __init__(self, title: str, invariant: str, element: str = None):
+        """Instantiate the failure of `invariant` of the invariants labelled `title` for `element`."""
+        super().__init__(title, invariant, element)
+        self.title = title
+        self.invariant = invariant
+        self.element = element
+
 class Contests():
     """Speeds up access to contest descriptions through object_id indexing."""
 
@@ -70,23 +127,174 @@ class Contests():
             return None
 
 class Guardians():
-    """Speeds up access to guardians through owner_id indexing."""
+    """Speeds up access to guardians through owner_id indexing, and precomputes the guardian keys
+       raised to a new challenge in every tally share proof: each guardian's public key Kᵢ, and
+       the recovery keys ∏ⱼKᵢⱼˡʲ with which the other guardians compensate for a missing guardian.
+       Fixed-base tables are built for the keys which appear often enough to pay back their cost,
+       and are shared by every stage verifying tally shares."""
 
     guardians: dict[str,CoefficientValidationSet]
+    number_of_guardians: int
+    memory: int
+    uses: Counter
+    recovery_keys: dict[str,dict[int,ElementModP]]
+    tables: dict[int,Union[FixedBase,ElementModP]]
 
-    def __init__(self, guardians: Iterable[CoefficientValidationSet]):
-        """Indexes guardians by owner_id for quick lookups."""
+    def __init__(self, guardians: Iterable[CoefficientValidationSet], number_of_guardians: int = None, memory: int = TABLE_MEMORY):
+        """Indexes guardians by owner_id for quick lookups. Recovery keys are derived for the sequence
+           orders 1 to `number_of_guardians`, defaulting to the number of guardians given, and tables
+           are built within a further `memory` bytes."""
         self.guardians = {}
         for guardian in guardians:
             self.guardians[guardian.owner_id] = guardian
+        self.number_of_guardians = number_of_guardians or len(self.guardians)
+        self.memory = memory
+        self.uses = Counter()
+        self.recovery_keys = {}
+        self.tables = {}
     
-    def __getitem__(self, guardian: str) -> ContestDescription:
+    def __getitem__(self, guardian: str) -> CoefficientValidationSet:
         """Returns the requested guardian, or None if no such guardian exists."""
         if guardian in self.guardians:
             return self.guardians[guardian]
         else:
             return None
 
+    def expect(self, contests: Iterable[PlaintextTallyContest]) -> None:
+        """Counts the exponentiations of each guardian key needed to verify the tally shares of `contests`,
+           which must be counted before any key is first exponentiated for its table to be built."""
+        for contest in contests:
+            for selection in contest.selections.values():
+                for share in selection.shares:
+                    if share.proof and share.guardian_id in self.guardians and self.public_key(share.guardian_id) is not None:
+                        self.uses[int(self.public_key(share.guardian_id).elem)] += 1
+                    for part in (share.recovered_parts or {}).values():
+                        self.uses[int(part.recovery_key.elem)] += 1
+
+    def public_key(self, guardian: str) -> ElementModP:
+        """Returns the public key Kᵢ of the requested guardian."""
+        return get_first_el(self.guardians[guardian].coefficient_commitments)
+
+    def key(self, guardian: str) -> Union[FixedBase,ElementModP]:
+        """Returns the public key Kᵢ of the requested guardian, as a fixed-base table if one pays off."""
+        return self.base(self.public_key(guardian))
+
+    def recovery_key(self, guardian: str, recovery_key: ElementModP) -> Union[FixedBase,ElementModP]:
+        """Returns the published `recovery_key` for the missing `guardian`, as a fixed-base table if one
+           pays off. As the sequence order ℓ of the compensating guardian is not published, the key is
+           only precomputed when it matches ∏ⱼKᵢⱼˡʲ for a sequence order between 1 and n."""
+        if guardian not in self.guardians:
+            return recovery_key
+        if guardian not in self.recovery_keys:
+            arithmetic: Backend = backend()
+            commitments: list[int] = [arithmetic.integer(commitment.elem) for commitment in self.guardians[guardian].coefficient_commitments]
+            self.recovery_keys[guardian] = {}
+            for sequence_order in range(1, self.number_of_guardians + 1):
+                key: int = arithmetic.integer(1)
+                for j, commitment in enumerate(commitments):
+                    key = key * arithmetic.powmod(commitment, pow(sequence_order, j, Q), arithmetic.p) % arithmetic.p
+                self.recovery_keys[guardian][int(key)] = int_to_p_unchecked(key)
+        derived: ElementModP = self.recovery_keys[guardian].get(int(recovery_key.elem))
+        return self.base(derived) if derived is not None else recovery_key
+
+    def base(self, key: ElementModP) -> Union[FixedBase,ElementModP]:
+        """Returns `key` as a fixed-base table if its expected exponentiations pay back building one,
+           otherwise as is. Tables are built on first use with a window suited to the expected uses."""
+        value: int = int(key.elem)
+        if value not in self.tables:
+            window: int = window_for_uses(self.uses[value], self.memory, max(len(self.uses), 1))
+            self.tables[value] = FixedBase(key, window) if window else key
+        return self.tables[value]
+
+class Aggregates():
+    """Accumulates the products of cast ballot selection ciphertexts (α,β) in a single
+       pass over the ballots, indexed by (contest object_id, selection object_id). Products
+       are held as raw integers of the arithmetic backend in use."""
+
+    products: dict[tuple[str,str],tuple[int,int]]
+
+    def __init__(self, ballots: Iterable[CiphertextAcceptedBallot] = ()):
+        """Aggregates the selections of every cast ballot in `ballots`."""
+        self.products = {}
+        for ballot in ballots:
+            self.add(ballot)
+
+    def add(self, ballot: CiphertextAcceptedBallot) -> None:
+        """Multiplies the selections of `ballot` into the running products if the ballot was cast.
+           Contests and selections which appear more than once on the ballot are skipped."""
+        if ballot.state != BallotBoxState.CAST:
+            return
+        arithmetic: Backend = backend()
+        for contest in unique_by_id(ballot.contests, 'Ballot contains multiple entries for the same contest.'):
+            for selection in unique_by_id(contest.ballot_selections, 'Ballot contains multiple entries for the same selection.'):
+                key: tuple[str,str] = (contest.object_id, selection.object_id)
+                A, B = self.products.get(key, (1, 1))
+                self.products[key] = (A * arithmetic.integer(selection.ciphertext.pad.elem) % arithmetic.p, B * arithmetic.integer(selection.ciphertext.data.elem) % arithmetic.p)
+
+    def merge(self, other: 'Aggregates') -> None:
+        """Multiplies the products accumulated by `other` (e.g. in a worker process) into this set."""
+        p: int = backend().p
+        for key, (A, B) in other.products.items():
+            a, b = self.products.get(key, (1, 1))
+            self.products[key] = (a * A % p, b * B % p)
+
+    def __getitem__(self, key: tuple[str,str]) -> tuple[ElementModP,ElementModP]:
+        """Returns the aggregate (A,B) for the requested (contest, selection), or (1,1) if
+           no cast ballot contained it."""
+        A, B = self.products.get(key, (1, 1))
+        return (int_to_p_unchecked(A), int_to_p_unchecked(B))
+
+def unique_by_id(els: Iterable[T], duplicate_msg: str) -> list[T]:
+    """Returns the elements of `els` whose object_id appears exactly once, emitting
+       `duplicate_msg` as a warning for every object_id that is repeated."""
+    counts: dict[str,int] = {}
+    for el in els:
+        counts[el.object_id] = counts.get(el.object_id, 0) + 1
+    for object_id, count in counts.items():
+        if count > 1:
+            warn(duplicate_msg)
+    return [el for el in els if counts[el.object_id] == 1]
+
+def bisect(invariants: Invariants, checks: list[tuple], holds: Callable[[list[tuple]], bool], exact: Callable[[tuple], bool]) -> None:
+    """Records every check in `checks` as holding in `invariants` if the batch test `holds` passes
+       for all of them, otherwise splits them in half and retries each half. Single checks are
+       made with `exact`. Each check is a tuple starting with its invariant label and ending with
+       the identifier of the element it checks."""
+    if len(checks) == 1:
+        invariants.ensure(checks[0][0], exact(checks[0]), checks[0][-1])
+    elif holds(checks):
+        for check in checks:
+            invariants.ensure(check[0], True)
+    else:
+        info(f'Batch of {len(checks)} checks failed, bisecting.')
+        middle: int = len(checks) // 2
+        bisect(invariants, checks[:middle], holds, exact)
+        bisect(invariants, checks[middle:], holds, exact)
+
+def process_pool(workers: int, initializer: Callable = None, initargs: tuple = ()) -> ProcessPoolExecutor:
+    """Returns a pool of `workers` processes, each first running initializer(*initargs). Workers are
+       started by a fork server where available, as forking a process whose loader threads are
+       running can deadlock a worker on a lock held by one of those threads."""
+    method: str = 'forkserver' if 'forkserver' in get_all_start_methods() else 'spawn'
+    return ProcessPoolExecutor(max_workers=workers, mp_context=get_context(method), initializer=initializer, initargs=initargs)
+
+def bounded_map(pool: Executor, fn: Callable[..., T], els: Iterable, limit: int, *args) -> Iterator[T]:
+    """Yields fn(el, *args) for each element of `els` in order, computed in `pool`. At most
+       `limit` calls are outstanding at a time, so `els` is only consumed as results are taken.
+       An exception raised by a call is raised when its result is taken."""
+    pending: deque[Future] = deque()
+    try:
+        for el in els:
+            if len(pending) >= limit:
+                yield pending.popleft().result()
+            pending.append(pool.submit(fn, el, *args))
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        # Cancel the calls not yet started if the results are abandoned, e.g. after a failing call
+        for future in pending:
+            future.cancel()
+
 def get_first_el(els: list[T]) -> T:
     """Returns the first element of `els`, or None if it is empty."""
     if len(els) > 0:
@@ -94,33 +302,12 @@ def get_first_el(els: list[T]) -> T:
     else:
         return None
 
-def get_contest(ballot: CiphertextAcceptedBallot, contest_id: str) -> CiphertextBallotContest:
-    """Given a ballot, gets the supplied contest. If the contest appears more than once,
-       None is returned."""
-    result: CiphertextBallotContest = None
-    for contest in ballot.contests:
-        if contest.object_id == contest_id:
-            if result != None:
-                warn('Ballot contains multiple entries for the same contest.')
-                return None
-            else:
-                result = contest
-    return result
-
-def get_selection(ballot: CiphertextAcceptedBallot, contest_id: str, selection_id: str) -> CiphertextBallotSelection:
-    """Given a ballot, gets the supplied selection from within the supplied contest.
-       If the contest or selection appear more than once, None is returned."""
-    result: CiphertextBallotSelection = None
-    contest: CiphertextBallotContest = get_contest(ballot, contest_id)
-    if contest:
-        for selection in contest.ballot_selections:
-            if selection.object_id == selection_id:
-                if result != None:
-                    warn('Ballot contains multiple entries for the same selection.')
-                    return None
-                else:
-                    result = selection
-    return result
+def cache_path(directory: str, file_name: str) -> str:
+    """Returns the path of `file_name` within the per-user cache directory of the election results
+       `directory`, keyed by its absolute path. Files the verifier trusts are kept there rather than
+       in the results directory, whose contents are the untrusted artifacts being verified."""
+    root: str = environ.get('XDG_CACHE_HOME') or environ.get('LOCALAPPDATA') or join(expanduser('~'), '.cache')
+    return join(root, CACHE_DIR_NAME, sha256(abspath(directory).encode()).hexdigest()[:32], file_name)
 
 def warn(msg: str) -> None:
     """Emits a warning message `msg` to the logs."""
@@ -5,17 +5,42 @@
     ElectionGuard election results.
 """
 
-from typing import Iterable
+from typing import Iterable, Iterator
+from logging import info
+from collections import Counter, deque
+from contextlib import nullcontext
+from concurrent.futures import Executor
 from electionguard.election import CiphertextElectionContext, ElectionDescription, ElectionConstants
-from electionguard.tally import PublishedCiphertextTally, PlaintextTally
+from electionguard.tally import PublishedCiphertextTally, PlaintextTally, PlaintextTallyContest
 from electionguard.encrypt import EncryptionDevice
-from electionguard.ballot import CiphertextAcceptedBallot, CiphertextBallotSelection, BallotBoxState
+from electionguard.ballot import CiphertextAcceptedBallot
 from electionguard.key_ceremony import CoefficientValidationSet
-from electionguard.hash import hash_elems
-from electionguard.group import ElementModP, mult_p, pow_p, add_q, int_to_p
+from electionguard.group import ElementModP, ElementModPorInt, mult_p, int_to_p
 from electionguard.chaum_pedersen import ChaumPedersenProof
 from electionguard_verify.constants import P, Q, R, G
-from electionguard_verify.utils import Invariants, Contests, Guardians, get_first_el, get_selection, warn
+from electionguard_verify.arithmetic import backend, set_backend
+from electionguard_verify.fixed_base import FixedBase, TABLE_MEMORY, fixed_base, window_for
+from electionguard_verify.equations import Equations, SOUNDNESS, equations_for
+from electionguard_verify.residues import Residues, residues_for
+from electionguard_verify.store import ResultStore
+from electionguard_verify.shard import Partial
+from electionguard_verify.checkpoint import Checkpoint
+from electionguard_verify.sample import Sample
+from electionguard_verify.metrics import Report, COUNTERS, measured, absorbed
+from electionguard_verify.hashing import HashPrefix, hash_elems, hash_prefix
+from electionguard_verify.utils import Invariants, InvariantFailure, Contests, Guardians, Aggregates, bounded_map, process_pool, get_first_el, warn
+
+
+# Number of ballots sent to a worker process at a time
+BALLOT_CHUNK_SIZE: int = 16
+# Number of ballots verified at a time without worker processes, between which progress is recorded
+SERIAL_CHUNK_SIZE: int = 256
+# Default number of ballots queued for worker processes at a time
+IN_FLIGHT: int = 1024
+# Verification stages which can be selected, in the order they are verified
+STAGES: list[str] = ['parameters', 'keys', 'ballots', 'limits', 'aggregation', 'recovery', 'decryption', 'spoiled']
+# Stages verified by the single streaming pass over the encrypted ballots
+BALLOT_STAGES: set[str] = {'ballots', 'limits'}
 
 
 def verify(
@@ -27,195 +52,511 @@ def verify(
     spoiled_ballots: Iterable[CiphertextAcceptedBallot],
     ciphertext_tally: PublishedCiphertextTally,
     plaintext_tally: PlaintextTally,
-    coefficient_validation_sets: Iterable[CoefficientValidationSet] = None
+    coefficient_validation_sets: Iterable[CoefficientValidationSet] = None,
+    workers: int = 1,
+    window: int = None,
+    table_memory: int = TABLE_MEMORY,
+    batch: bool = False,
+    soundness: int = SOUNDNESS,
+    strict_residues: bool = False,
+    in_flight: int = IN_FLIGHT,
+    store: ResultStore = None,
+    report: Report = None,
+    partial: Partial = None,
+    checkpoint: Checkpoint = None,
+    fail_fast: bool = False,
+    stages: Iterable[str] = None,
+    sample: Sample = None
 ) -> bool:
     """ Returns whether the election results provided as arguments represent
         a valid ElectionGuard election. Verification details can be
-        emitted by setting the logging level."""
-    
-    # Verify election paramter cryptographic values
-    election_parameters: Invariants = Invariants('Election Parameters')
-    election_parameters.ensure('p is correct', constants.large_prime == P)
-    election_parameters.ensure('q is correct', constants.small_prime == Q)
-    election_parameters.ensure('r is correct', constants.cofactor == R)
-    election_parameters.ensure('g is correct', constants.generator == G)
-    election_parameters.ensure('k ≥ 1', context.quorum >= 1)
-    election_parameters.ensure('k ≤ n', context.number_of_guardians >= context.quorum)
-    election_parameters.ensure('Q = H(p,Q,g,n,k,d)', context.crypto_base_hash == hash_elems(P, Q, G, context.number_of_guardians, context.quorum, description.crypto_hash()))
-    if not election_parameters.validate():
-        return False
+        emitted by setting the logging level. Ballot selection proofs are
+        checked across `workers` processes when greater than one.
+        Exponentiations of g and K use fixed-base tables of `window` bits,
+        or the largest window fitting in `table_memory` bytes if unset.
+        Guardian keys exponentiated often enough by the tally shares use
+        tables of their own, within a further `table_memory` bytes.
+        If `batch` is set, proof equations are checked with the small-exponents
+        batch test, which accepts a false equation with probability at most
+        2^-`soundness`. Membership of elements in Zₚʳ is checked in batches
+        with the same soundness unless `strict_residues` is set, in which
+        case every element is checked with a full exponentiation.
+        Encrypted ballots are consumed in a single pass, so `ciphertext_ballots`
+        may be a generator loading ballots lazily; at most `in_flight` ballots
+        are queued for worker processes at a time. If a result `store` is given,
+        ballots it holds results for are not verified again, and the results of
+        newly verified ballots are saved to it once they have all passed. The time,
+        resources, and failures of each stage are recorded in `report` if given.
+        If the merged `partial` results of every shard of the election are given,
+        they stand in for verifying `ciphertext_ballots` and the spoiled ballots.
+        If a `checkpoint` is given, stages it records as finished are not verified
+        again, encrypted ballot verification resumes after the ballots it records
+        as verified, and progress is saved to it as verification proceeds.
+        If `fail_fast` is set, verification stops at the first failing condition
+        rather than at the end of the stage it belongs to. If `stages` is given,
+        only the named stages of STAGES are verified, and the inputs read only
+        by other stages may be omitted. The encrypted ballots are then only
+        read to aggregate them if the aggregation stage is selected. If a `sample`
+        is given, only the ballots it includes are verified by the encrypted ballot
+        stages, while every cast ballot is still aggregated. A sample is not recorded
+        in `checkpoint`, and its size and bound are recorded in `report`."""
+
+    # Materialize the guardian coefficients, which are read by multiple stages
+    coefficient_validation_sets = list(coefficient_validation_sets or [])
+    checkpoint = checkpoint or Checkpoint()
+    selected: set[str] = set(STAGES if stages is None else stages)
+    if not selected <= set(STAGES):
+        raise ValueError(f'Unknown verification stages: {", ".join(sorted(selected - set(STAGES)))}. Stages are: {", ".join(STAGES)}.')
+    try:
+        # Verify election paramter cryptographic values
+        election_parameters: Invariants = Invariants('Election Parameters', report, fail_fast)
+        if 'parameters' in selected:
+            if not checkpoint.restore(election_parameters):
+                election_parameters.ensure('p is correct', constants.large_prime == P)
+                election_parameters.ensure('q is correct', constants.small_prime == Q)
+                election_parameters.ensure('r is correct', constants.cofactor == R)
+                election_parameters.ensure('g is correct', constants.generator == G)
+                election_parameters.ensure('k ≥ 1', context.quorum >= 1)
+                election_parameters.ensure('k ≤ n', context.number_of_guardians >= context.quorum)
+                election_parameters.ensure('Q = H(p,Q,g,n,k,d)', context.crypto_base_hash == hash_elems(P, Q, G, context.number_of_guardians, context.quorum, description.crypto_hash()))
+            if not election_parameters.validate():
+                return False
+            checkpoint.finish(election_parameters)
+
+        # Precompute the fixed-base table for g, shared by all following stages
+        window = window or window_for(table_memory, 2)
+        g: FixedBase = fixed_base(constants.generator, window)
+        info(f'Computing with the {backend().name} arithmetic backend.')
+        if batch:
+            info(f'Batch verifying proof equations with soundness error at most 2^-{soundness}.')
+        if not strict_residues:
+            info(f'Batch verifying subgroup membership with soundness error at most 2^-{soundness}.')
+
+        # Verify guardian public key values
+        public_keys: Invariants = Invariants('Guardian Public Keys', report, fail_fast)
+        if 'keys' in selected:
+            if not checkpoint.restore(public_keys):
+                public_key_equations: Equations = equations_for(public_keys, batch, soundness)
+                elgamal_public_key: ElementModP = int_to_p(1)
+                for guardian in coefficient_validation_sets:
+                    elgamal_public_key = mult_p(elgamal_public_key, get_first_el(guardian.coefficient_commitments))
+                    for j, proof in enumerate(guardian.coefficient_proofs):
+                        # Warning: This definition follows the electionguard package in deviating from the official spec
+                        public_keys.ensure('cᵢⱼ = H(Kᵢⱼ,hᵢⱼ)', proof.challenge == hash_elems(proof.public_key, proof.commitment), f'guardian {guardian.owner_id} coefficient {j}')
+                        public_key_equations.check('gᵘⁱʲ mod p = hᵢⱼKᵢⱼᶜⁱ mod p', [(g, proof.response)], [(proof.commitment, 1), (proof.public_key, proof.challenge)], f'guardian {guardian.owner_id} coefficient {j}')
+                public_key_equations.flush()
+                warn('The official electionguard Python implementation has an improper ballot challenge definition. This error will be ignored by this verifier.')
+                public_keys.ensure('K = ∏ᵢ₌₁ⁿ Kᵢ mod p', context.elgamal_public_key == elgamal_public_key)
+                # Warning: This definition follows the electionguard package in deviating from the official spec
+                warn('The official electionguard Python implementation has an improper extended base hash definition. This error will be ignored by this verifier.')
+                public_keys.ensure('Q̅ = H(Q,K)', context.crypto_extended_base_hash == hash_elems(context.crypto_base_hash, context.elgamal_public_key))
+            if not public_keys.validate():
+                return False
+            checkpoint.finish(public_keys)
+
+        # Verify ballot selection encryptions and vote limits, and aggregate cast ballots, in a single streaming pass
+        ballot_selections: Invariants = Invariants('Ballot Selection Encryptions', report, fail_fast)
+        vote_limits: Invariants = Invariants('Vote Limits', report, fail_fast)
+        contests: Contests = Contests(description)
+        aggregates: Aggregates = Aggregates()
+        if checkpoint.restore(ballot_selections, vote_limits):
+            selections, limits, products = Invariants(ballot_selections.title), Invariants(vote_limits.title), checkpoint.aggregates
+        elif partial:
+            # The ballots were verified by shards, whose results only hold if every shard verified this election
+            ballot_selections.ensure('partial results were verified under Q̅', partial.extended_base_hash == hex(context.crypto_extended_base_hash.elem))
+            ballot_selections.ensure('every encrypted ballot file was verified by a shard', partial.files == partial.total_files)
+            selections, limits, products = partial.ballot_selections, partial.vote_limits, partial.aggregates
+        elif selected & BALLOT_STAGES:
+            if sample:
+                info(f'Verifying a random sample of {sample.rate:.2%} of encrypted ballots, drawn with seed {sample.seed}.')
+            selections, limits, products = verify_ballot_stream(ciphertext_ballots, context, constants, contests, window, workers, in_flight, batch, soundness, strict_residues, store, None if sample else checkpoint, fail_fast, sample)
+            if sample and report:
+                report.sample = sample.as_dict()
+        elif 'aggregation' in selected:
+            # Only the aggregates are needed, so the cast ballots are multiplied together without being verified
+            selections, limits, products = Invariants(ballot_selections.title), Invariants(vote_limits.title), Aggregates(ciphertext_ballots)
+        else:
+            selections, limits, products = Invariants(ballot_selections.title), Invariants(vote_limits.title), Aggregates()
+        ballot_selections.merge(selections)
+        vote_limits.merge(limits)
+        aggregates.merge(products)
+        if 'ballots' in selected:
+            warn('The official electionguard Python implementation always fails the validation gᶜ¹Kᵛ¹ = b₁βᶜ¹ (mod p). This error will be ignored by this verifier.')
+            if not ballot_selections.validate():
+                return False
+
+        # Verify adherence to vote limits
+        if 'limits' in selected:
+            warn('The official electionguard Python implementation fails to publish the required values (A,B) and (a,b) for every ballot, making it impossible to verify multiple required tests. This error will be ignored by this verifier.')
+            if not vote_limits.validate():
+                return False
+        if BALLOT_STAGES <= selected:
+            if store:
+                store.commit()
+            if not sample:
+                checkpoint.finish(ballot_selections, vote_limits, aggregates=aggregates)
+
+        # Verify ballot chaining
+        ballot_chaining: Invariants = Invariants('Ballot Chaining', report, fail_fast)
+        if 'ballots' in selected:
+            # Warning: It is currently not possible to verify ballot chaining, as the electionguard package contains the following errors:
+            # - Fails to establish an ordering of published encrypted ballots by providing a suitable index field
+            # - Contains no "first" ballot with previous_hash == H₀ = H(Q̅), per the specification
+            # - Fails to include any ballot device information in the hash calculation, as required by the electionguard spec
+            warn('The official electionguard Python implementation fails to index ballots and adhere to the proper ballot chaining hash definition. This error will be ignored by this verifier.')
+            if not ballot_chaining.validate():
+                return False
+            checkpoint.finish(ballot_chaining)
+
+        # Count the uses of each guardian key by the tally and spoiled ballot shares, so that its precomputation can be shared by both stages
+        guardians: Guardians = Guardians(coefficient_validation_sets, context.number_of_guardians, table_memory)
+        if selected & {'aggregation', 'recovery'}:
+            guardians.expect(plaintext_tally.contests.values())
+        if 'spoiled' in selected and not partial:
+            for ballot in plaintext_tally.spoiled_ballots.values():
+                guardians.expect(ballot.values())
+
+        # Verify correctness of ballot aggregation and partial decryptions
+        ballot_aggregations: Invariants = Invariants('Ballot Aggregations & Partial Decryptions', report, fail_fast)
+        if 'aggregation' in selected:
+            if not checkpoint.restore(ballot_aggregations):
+                aggregation_equations: Equations = equations_for(ballot_aggregations, batch, soundness)
+                aggregation_residues: Residues = residues_for(ballot_aggregations, strict_residues, soundness)
+                for contest in plaintext_tally.contests.values():
+                    for selection in contest.selections.values():
+                        A, B = aggregates[contest.object_id, selection.object_id]
+                        challenge: HashPrefix = hash_prefix(context.crypto_extended_base_hash, selection.message.pad, selection.message.data)
+                        ballot_aggregations.ensure('A = ∏ⱼαⱼ', selection.message.pad == A, f'{contest.object_id}/{selection.object_id}')
+                        ballot_aggregations.ensure('B = ∏ⱼβⱼ', selection.message.data == B, f'{contest.object_id}/{selection.object_id}')
+                        for share in selection.shares:
+                            element: str = f'{contest.object_id}/{selection.object_id} share of {share.guardian_id}'
+                            if share.proof:
+                                ballot_aggregations.ensure('vᵢ ∈ Zᵩ', share.proof.response.is_in_bounds(), element)
+                                aggregation_residues.check('aᵢ ∈ Zₚʳ', share.proof.pad, element)
+                                aggregation_residues.check('bᵢ ∈ Zₚʳ', share.proof.data, element)
+                                ballot_aggregations.ensure('cᵢ = H(Q̅,A,B,aᵢ,bᵢ,Mᵢ)', share.proof.challenge == challenge.hash(share.proof.pad, share.proof.data, share.share), element)
+                                aggregation_equations.check('Aᵛⁱ = bᵢMᵢᶜⁱ (mod p)', [(selection.message.pad, share.proof.response)], [(share.proof.data, 1), (share.share, share.proof.challenge)], element)
+                                if share.guardian_id in guardians.guardians:
+                                    aggregation_equations.check('gᵛⁱ = aᵢKᵢᶜⁱ (mod p)', [(g, share.proof.response)], [(share.proof.pad, 1), (guardians.key(share.guardian_id), share.proof.challenge)], element)
+                                else:
+                                    ballot_aggregations.ensure('tally share guardians are valid election guardians', False, element)
+                aggregation_equations.flush()
+                aggregation_residues.flush()
+            if not ballot_aggregations.validate():
+                return False
+            checkpoint.finish(ballot_aggregations)
+
+        # Verify correctness of recovered data for missing guardians
+        missing_guardians: Invariants = Invariants('Recovered Data for Missing Guardians', report, fail_fast)
+        if 'recovery' in selected:
+            if not checkpoint.restore(missing_guardians):
+                missing_guardian_equations: Equations = equations_for(missing_guardians, batch, soundness)
+                missing_guardian_residues: Residues = residues_for(missing_guardians, strict_residues, soundness)
+                for contest in plaintext_tally.contests.values():
+                    for selection in contest.selections.values():
+                        challenge: HashPrefix = hash_prefix(context.crypto_extended_base_hash, selection.message.pad, selection.message.data)
+                        for share in selection.shares:
+                            missing_guardians.ensure('tally share contains exactly one proof or recovered part', (not share.proof) ^ (not share.recovered_parts), f'{contest.object_id}/{selection.object_id} share of {share.guardian_id}')
+                            if share.recovered_parts:
+                                for part in share.recovered_parts.values():
+                                    element: str = f'{contest.object_id}/{selection.object_id} share of {share.guardian_id} recovered by {part.guardian_id}'
+                                    missing_guardians.ensure('vᵢₗ ∈ Zᵩ', part.proof.response.is_in_bounds(), element)
+                                    missing_guardian_residues.check('aᵢₗ ∈ Zₚʳ', part.proof.pad, element)
+                                    missing_guardian_residues.check('bᵢₗ ∈ Zₚʳ', part.proof.data, element)
+                                    missing_guardians.ensure('cᵢₗ = H(Q̅,A,B,aᵢₗ,bᵢₗ,Mᵢₗ)', part.proof.challenge == challenge.hash(part.proof.pad, part.proof.data, part.share), element)
+                                    missing_guardian_equations.check('Aᵛⁱˡ = bᵢₗMᵢₗᶜⁱˡ (mod p)', [(selection.message.pad, part.proof.response)], [(part.proof.data, 1), (part.share, part.proof.challenge)], element)
+                                    if part.guardian_id in guardians.guardians:
+                                        missing_guardian_equations.check('gᵛⁱˡ = aᵢₗ(∏ⱼ₌₀ᵏ⁻¹Kᵢⱼˡʲ)ᶜⁱˡ (mod p)', [(g, part.proof.response)], [(part.proof.pad, 1), (guardians.recovery_key(share.guardian_id, part.recovery_key), part.proof.challenge)], element)
+                                    else:
+                                        missing_guardians.ensure('tally share reconstruction guardians are valid election guardians', False, element)
+                missing_guardian_equations.flush()
+                missing_guardian_residues.flush()
+            if not missing_guardians.validate():
+                return False
+            checkpoint.finish(missing_guardians)
 
-    # Verify guardian public key values
-    public_keys: Invariants = Invariants('Guardian Public Keys')
-    elgamal_public_key: ElementModP = int_to_p(1)
-    for guardian in coefficient_validation_sets:
-        elgamal_public_key = mult_p(elgamal_public_key, get_first_el(guardian.coefficient_commitments))
-        for proof in guardian.coefficient_proofs:
-            # Warning: This definition follows the electionguard package in deviating from the official spec
-            public_keys.ensure('cᵢⱼ = H(Kᵢⱼ,hᵢⱼ)', proof.challenge == hash_elems(proof.public_key, proof.commitment))
-            public_keys.ensure('gᵘⁱʲ mod p = hᵢⱼKᵢⱼᶜⁱ mod p', pow_p(constants.generator, proof.response) == mult_p(proof.commitment, pow_p(proof.public_key, proof.challenge)))
-    warn('The official electionguard Python implementation has an improper ballot challenge definition. This error will be ignored by this verifier.')
-    public_keys.ensure('K = ∏ᵢ₌₁ⁿ Kᵢ mod p', context.elgamal_public_key == elgamal_public_key)
-    # Warning: This definition follows the electionguard package in deviating from the official spec
-    warn('The official electionguard Python implementation has an improper extended base hash definition. This error will be ignored by this verifier.')
-    public_keys.ensure('Q̅ = H(Q,K)', context.crypto_extended_base_hash == hash_elems(context.crypto_base_hash, context.elgamal_public_key))
-    if not public_keys.validate():
+        # Verify correctness of construction of replacement partial decryptions
+        reconstructed_decryptions: Invariants = Invariants('Reconstructed Partial Decryptions for Missing Guardians', report, fail_fast)
+        if 'recovery' in selected:
+            # Warning: the Lagrange coefficients used in reconstruction are not published. Because of this, it is impossible to verify:
+            # - whether the Lagrange coefficients are correctly computed
+            # - whether the missing tally shares, which depend on the Lagrange coefficients, are correctly computed.
+            warn('The official electionguard Python implementation fails to publish Lagrange coefficients for missing guardian reconstructions, making it impossible to verify these values. This error will be ignored by this verifier.')
+            if not reconstructed_decryptions.validate():
+                return False
+            checkpoint.finish(reconstructed_decryptions)
+
+        # Verify correct decryption of tallies
+        tally_decryption: Invariants = Invariants('Decryption of Tallies', report, fail_fast)
+        if 'decryption' in selected:
+            if not checkpoint.restore(tally_decryption):
+                for contest in plaintext_tally.contests.values():
+                    tally_decryption.ensure('tally contest label exists in ballot coding file', contest.object_id in contests.contests, contest.object_id)
+                    for selection in contest.selections.values():
+                        tally_decryption.ensure('B = M (∏ᵢ₌₁ⁿ Mᵢ) mod p', selection.message.data == mult_p(selection.value, *map(lambda x: x.share, selection.shares)), f'{contest.object_id}/{selection.object_id}')
+                        tally_decryption.ensure('M = gᵗ mod p', selection.value == g.pow(selection.tally), f'{contest.object_id}/{selection.object_id}')
+            if not tally_decryption.validate():
+                return False
+            checkpoint.finish(tally_decryption)
+
+        # Verify spoiled ballots
+        spoils: Invariants = Invariants('Spoiled Ballots', report, fail_fast)
+        if 'spoiled' in selected:
+            if not checkpoint.restore(spoils):
+                if partial:
+                    spoils.ensure('every spoiled ballot was verified by a shard', sorted(partial.spoiled_ballots) == sorted(plaintext_tally.spoiled_ballots))
+                    spoils.merge(partial.spoils)
+                else:
+                    spoils.merge(verify_spoiled_ballots(plaintext_tally.spoiled_ballots, context, constants, guardians, contests, window, batch, soundness, strict_residues, fail_fast))
+            # Warning: All other warnings also apply to spoiled ballots.
+            warn('All other warnings also apply to spoiled ballot verification steps.')
+            if not spoils.validate():
+                return False
+            checkpoint.finish(spoils)
+
+    except InvariantFailure as failure:
+        # Record the failure which stopped verification against the stage it belongs to
+        stage: Invariants = Invariants(failure.title, report)
+        stage.ensure(failure.invariant, False, failure.element)
+        stage.validate()
+        warn(f'Stopped verification at the first failure: {failure.title} failed to validate invariant {failure.invariant}, for {failure.element or "an unidentified element"}.')
         return False
-    
-    # Verify ballot selection encryptions
-    ballot_selections: Invariants = Invariants('Ballot Selection Encryptions')
-    for ballot in ciphertext_ballots:
+
+    # All selected verification steps have succeeded
+    return True
+
+
+def ballot_pool(workers: int, context: CiphertextElectionContext, constants: ElectionConstants, window: int) -> Executor:
+    """Returns a pool of `workers` processes ready to verify the ballots of the election with `context`
+       and `constants`, using fixed-base tables with the given `window`."""
+    return process_pool(workers, start_worker, (backend().name, constants.generator, context.elgamal_public_key, window))
+
+def start_worker(backend_name: str, generator: ElementModPorInt, public_key: ElementModPorInt, window: int) -> None:
+    """Prepares a worker process to verify ballots, selecting the arithmetic backend `backend_name`
+       in use by the parent process and building the fixed-base tables for g and K once."""
+    set_backend(backend_name)
+    fixed_base(generator, window)
+    fixed_base(public_key, window)
+
+def verify_ballots(
+    ballots: Iterable[CiphertextAcceptedBallot],
+    context: CiphertextElectionContext,
+    constants: ElectionConstants,
+    contests: Contests,
+    window: int,
+    batch: bool = False,
+    soundness: int = SOUNDNESS,
+    strict_residues: bool = False,
+    fail_fast: bool = False
+) -> tuple[Invariants, Invariants, Aggregates, Counter]:
+    """ Returns the ballot selection encryption and vote limit invariants checked
+        across `ballots`, along with the aggregates of the cast ballots among them
+        and the counts of the operations performed.
+        Each ballot is visited once, so `ballots` may be a generator. Runs standalone
+        so that ballots can be sharded across worker processes."""
+    ballot_selections: Invariants = Invariants('Ballot Selection Encryptions', fail_fast=fail_fast)
+    vote_limits: Invariants = Invariants('Vote Limits', fail_fast=fail_fast)
+    aggregates: Aggregates = Aggregates()
+    counters: Counter = Counter(COUNTERS)
+    selection_equations: Equations = equations_for(ballot_selections, batch, soundness)
+    selection_residues: Residues = residues_for(ballot_selections, strict_residues, soundness)
+    g: FixedBase = fixed_base(constants.generator, window)
+    K: FixedBase = fixed_base(context.elgamal_public_key, window)
+    challenge: HashPrefix = hash_prefix(context.crypto_extended_base_hash)
+    for ballot in ballots:
         for contest in ballot.contests:
             for selection in contest.ballot_selections:
-                ballot_selections.ensure('α ∈ Zₚʳ', selection.ciphertext.pad.is_valid_residue())
-                ballot_selections.ensure('β ∈ Zₚʳ', selection.ciphertext.data.is_valid_residue())
-                ballot_selections.ensure('a₀ ∈ Zₚʳ', selection.proof.proof_zero_pad.is_valid_residue())
-                ballot_selections.ensure('b₀ ∈ Zₚʳ', selection.proof.proof_zero_data.is_valid_residue())
-                ballot_selections.ensure('a₁ ∈ Zₚʳ', selection.proof.proof_one_pad.is_valid_residue())
-                ballot_selections.ensure('b₁ ∈ Zₚʳ', selection.proof.proof_one_pad.is_valid_residue())
-                ballot_selections.ensure('c = H(Q̅,α,β,a₀,b₀,a₁,b₁)', selection.proof.challenge == hash_elems(context.crypto_extended_base_hash, selection.ciphertext.pad, selection.ciphertext.data, selection.proof.proof_zero_pad, selection.proof.proof_zero_data, selection.proof.proof_one_pad, selection.proof.proof_one_data))
-                ballot_selections.ensure('c₀ ∈ Zᵩ', selection.proof.proof_zero_challenge.is_in_bounds())
-                ballot_selections.ensure('c₁ ∈ Zᵩ', selection.proof.proof_one_challenge.is_in_bounds())
-                ballot_selections.ensure('v₀ ∈ Zᵩ', selection.proof.proof_zero_response.is_in_bounds())
-                ballot_selections.ensure('v₁ ∈ Zᵩ', selection.proof.proof_one_response.is_in_bounds())
-                ballot_selections.ensure('c = c₀+c₁ mod q', selection.proof.challenge == add_q(selection.proof.proof_zero_challenge, selection.proof.proof_one_challenge))
-                ballot_selections.ensure('gᵛ⁰ = a₀αᶜ⁰ (mod p)', pow_p(constants.generator, selection.proof.proof_zero_response) == mult_p(selection.proof.proof_zero_pad, pow_p(selection.ciphertext.pad, selection.proof.proof_zero_challenge)))
-                ballot_selections.ensure('gᵛ¹ = a₁αᶜ¹ (mod p)', pow_p(constants.generator, selection.proof.proof_one_response) == mult_p(selection.proof.proof_one_pad, pow_p(selection.ciphertext.pad, selection.proof.proof_one_challenge)))
-                ballot_selections.ensure('Kᵛ⁰ = b₀βᶜ⁰ (mod p)', pow_p(context.elgamal_public_key, selection.proof.proof_zero_response) == mult_p(selection.proof.proof_zero_data, pow_p(selection.ciphertext.data, selection.proof.proof_zero_challenge)))
+                element: str = f'{ballot.object_id}/{contest.object_id}/{selection.object_id}'
+                selection_residues.check('α ∈ Zₚʳ', selection.ciphertext.pad, element)
+                selection_residues.check('β ∈ Zₚʳ', selection.ciphertext.data, element)
+                selection_residues.check('a₀ ∈ Zₚʳ', selection.proof.proof_zero_pad, element)
+                selection_residues.check('b₀ ∈ Zₚʳ', selection.proof.proof_zero_data, element)
+                selection_residues.check('a₁ ∈ Zₚʳ', selection.proof.proof_one_pad, element)
+                selection_residues.check('b₁ ∈ Zₚʳ', selection.proof.proof_one_pad, element)
+                ballot_selections.ensure('c = H(Q̅,α,β,a₀,b₀,a₁,b₁)', selection.proof.challenge == challenge.hash(selection.ciphertext.pad, selection.ciphertext.data, selection.proof.proof_zero_pad, selection.proof.proof_zero_data, selection.proof.proof_one_pad, selection.proof.proof_one_data), element)
+                ballot_selections.ensure('c₀ ∈ Zᵩ', selection.proof.proof_zero_challenge.is_in_bounds(), element)
+                ballot_selections.ensure('c₁ ∈ Zᵩ', selection.proof.proof_one_challenge.is_in_bounds(), element)
+                ballot_selections.ensure('v₀ ∈ Zᵩ', selection.proof.proof_zero_response.is_in_bounds(), element)
+                ballot_selections.ensure('v₁ ∈ Zᵩ', selection.proof.proof_one_response.is_in_bounds(), element)
+                ballot_selections.ensure('c = c₀+c₁ mod q', selection.proof.challenge.elem == (selection.proof.proof_zero_challenge.elem + selection.proof.proof_one_challenge.elem) % Q, element)
+                selection_equations.check('gᵛ⁰ = a₀αᶜ⁰ (mod p)', [(g, selection.proof.proof_zero_response)], [(selection.proof.proof_zero_pad, 1), (selection.ciphertext.pad, selection.proof.proof_zero_challenge)], element)
+                selection_equations.check('gᵛ¹ = a₁αᶜ¹ (mod p)', [(g, selection.proof.proof_one_response)], [(selection.proof.proof_one_pad, 1), (selection.ciphertext.pad, selection.proof.proof_one_challenge)], element)
+                selection_equations.check('Kᵛ⁰ = b₀βᶜ⁰ (mod p)', [(K, selection.proof.proof_zero_response)], [(selection.proof.proof_zero_data, 1), (selection.ciphertext.data, selection.proof.proof_zero_challenge)], element)
                 # Warning: Ommitting test, as it fails against electionguard package
-                # ballot_selections.ensure('gᶜ¹Kᵛ¹ = b₁βᶜ¹ (mod p)', mult_p(pow_p(constants.generator, selection.proof.proof_one_challenge), pow_p(context.elgamal_public_key, selection.proof.proof_one_response)) == mult_p(selection.proof.proof_one_pad, pow_p(selection.ciphertext.data, selection.proof.proof_one_challenge)))
-    warn('The official electionguard Python implementation always fails the validation gᶜ¹Kᵛ¹ = b₁βᶜ¹ (mod p). This error will be ignored by this verifier.')
-    if not ballot_selections.validate():
-        return False
-    
-    # Verify adherence to vote limits
-    vote_limits: Invariants = Invariants('Vote Limits')
-    contests: Contests = Contests(description)
-    for ballot in ciphertext_ballots:
-        for contest in ballot.contests:
+                # selection_equations.check('gᶜ¹Kᵛ¹ = b₁βᶜ¹ (mod p)', [(g, selection.proof.proof_one_challenge), (K, selection.proof.proof_one_response)], [(selection.proof.proof_one_pad, 1), (selection.ciphertext.data, selection.proof.proof_one_challenge)], element)
             contest_description = contests[contest.object_id]
-            vote_limits.ensure('all contests appear in election description', contest_description != None)
+            element: str = f'{ballot.object_id}/{contest.object_id}'
+            vote_limits.ensure('all contests appear in election description', contest_description != None, element)
             if contest_description:
-                vote_limits.ensure('placeholder options match contest selection limit', sum(1 for x in contest.ballot_selections if x.is_placeholder_selection) == contest_description.votes_allowed)
-            vote_limits.ensure('V ∈ Zᵩ', contest.proof.response.is_in_bounds())
+                vote_limits.ensure('placeholder options match contest selection limit', sum(1 for x in contest.ballot_selections if x.is_placeholder_selection) == contest_description.votes_allowed, element)
+            vote_limits.ensure('V ∈ Zᵩ', contest.proof.response.is_in_bounds(), element)
             # Warning: Multiple tests are ommitted, as the current electionguard package does not seem to output (A,B) and (a,b)
-    warn('The official electionguard Python implementation fails to publish the required values (A,B) and (a,b) for every ballot, making it impossible to verify multiple required tests. This error will be ignored by this verifier.')
-    if not vote_limits.validate():
-        return False
+        aggregates.add(ballot)
+    selection_equations.flush()
+    selection_residues.flush()
+    return ballot_selections, vote_limits, aggregates, COUNTERS - counters
 
-    # Verify ballot chaining
-    ballot_chaining: Invariants = Invariants('Ballot Chaining')
-    # Warning: It is currently not possible to verify ballot chaining, as the electionguard package contains the following errors:
-    # - Fails to establish an ordering of published encrypted ballots by providing a suitable index field
-    # - Contains no "first" ballot with previous_hash == H₀ = H(Q̅), per the specification
-    # - Fails to include any ballot device information in the hash calculation, as required by the electionguard spec
-    warn('The official electionguard Python implementation fails to index ballots and adhere to the proper ballot chaining hash definition. This error will be ignored by this verifier.')
-    if not ballot_chaining.validate():
-        return False
-    
-    # Verify correctness of ballot aggregation and partial decryptions
-    ballot_aggregations: Invariants = Invariants('Ballot Aggregations & Partial Decryptions')
-    guardians: Guardians = Guardians(coefficient_validation_sets)
-    for contest in plaintext_tally.contests.values():
-        for selection in contest.selections.values():
-            A: ElementModP = int_to_p(1)
-            B: ElementModP = int_to_p(1)
-            for ballot in ciphertext_ballots:
-                if ballot.state == BallotBoxState.CAST:
-                    ballot_selection: CiphertextBallotSelection = get_selection(ballot, contest.object_id, selection.object_id)
-                    if ballot_selection:
-                        A = mult_p(A, ballot_selection.ciphertext.pad)
-                        B = mult_p(B, ballot_selection.ciphertext.data)
-            ballot_aggregations.ensure('A = ∏ⱼαⱼ', selection.message.pad == A)
-            ballot_aggregations.ensure('B = ∏ⱼβⱼ', selection.message.data == B)
-            for share in selection.shares:
-                if share.proof:
-                    ballot_aggregations.ensure('vᵢ ∈ Zᵩ', share.proof.response.is_in_bounds())
-                    ballot_aggregations.ensure('aᵢ ∈ Zₚʳ', share.proof.pad.is_valid_residue())
-                    ballot_aggregations.ensure('bᵢ ∈ Zₚʳ', share.proof.data.is_valid_residue())
-                    ballot_aggregations.ensure('cᵢ = H(Q̅,A,B,aᵢ,bᵢ,Mᵢ)', share.proof.challenge == hash_elems(context.crypto_extended_base_hash, selection.message.pad, selection.message.data, share.proof.pad, share.proof.data, share.share))
-                    ballot_aggregations.ensure('Aᵛⁱ = bᵢMᵢᶜⁱ (mod p)', pow_p(selection.message.pad, share.proof.response) == mult_p(share.proof.data, pow_p(share.share, share.proof.challenge)))
-                    if share.guardian_id in guardians.guardians:
-                        ballot_aggregations.ensure('gᵛⁱ = aᵢKᵢᶜⁱ (mod p)', pow_p(constants.generator, share.proof.response) == mult_p(share.proof.pad, pow_p(get_first_el(guardians[share.guardian_id].coefficient_commitments), share.proof.challenge)))
-                    else:
-                        ballot_aggregations.ensure('tally share guardians are valid election guardians', False)
-    if not ballot_aggregations.validate():
-        return False
 
-    # Verify correctness of recovered data for missing guardians
-    missing_guardians: Invariants = Invariants('Recovered Data for Missing Guardians')
-    for contest in plaintext_tally.contests.values():
-        for selection in contest.selections.values():
-            for share in selection.shares:
-                missing_guardians.ensure('tally share contains exactly one proof or recovered part', (not share.proof) ^ (not share.recovered_parts))
-                if share.recovered_parts:
-                    for part in share.recovered_parts.values():
-                        missing_guardians.ensure('vᵢₗ ∈ Zᵩ', part.proof.response.is_in_bounds())
-                        missing_guardians.ensure('aᵢₗ ∈ Zₚʳ', part.proof.pad.is_valid_residue())
-                        missing_guardians.ensure('bᵢₗ ∈ Zₚʳ', part.proof.data.is_valid_residue())
-                        missing_guardians.ensure('cᵢₗ = H(Q̅,A,B,aᵢₗ,bᵢₗ,Mᵢₗ)', part.proof.challenge == hash_elems(context.crypto_extended_base_hash, selection.message.pad, selection.message.data, part.proof.pad, part.proof.data, part.share))
-                        missing_guardians.ensure('Aᵛⁱˡ = bᵢₗMᵢₗᶜⁱˡ (mod p)', pow_p(selection.message.pad, part.proof.response) == mult_p(part.proof.data, pow_p(part.share, part.proof.challenge)))
-                        if part.guardian_id in guardians.guardians:
-                            missing_guardians.ensure('gᵛⁱˡ = aᵢₗ(∏ⱼ₌₀ᵏ⁻¹Kᵢⱼˡʲ)ᶜⁱˡ (mod p)', pow_p(constants.generator, part.proof.response) == mult_p(part.proof.pad, pow_p(part.recovery_key, part.proof.challenge)))
-                        else:
-                            missing_guardians.ensure('tally share reconstruction guardians are valid election guardians', False)
-    if not missing_guardians.validate():
-        return False
+def verify_ballot_stream(
+    ballots: Iterable[CiphertextAcceptedBallot],
+    context: CiphertextElectionContext,
+    constants: ElectionConstants,
+    contests: Contests,
+    window: int,
+    workers: int = 1,
+    in_flight: int = IN_FLIGHT,
+    batch: bool = False,
+    soundness: int = SOUNDNESS,
+    strict_residues: bool = False,
+    store: ResultStore = None,
+    checkpoint: Checkpoint = None,
+    fail_fast: bool = False,
+    sample: Sample = None,
+    pool: Executor = None
+) -> tuple[Invariants, Invariants, Aggregates]:
+    """ Returns the ballot selection encryption and vote limit invariants checked
+        across `ballots`, along with the aggregates of the cast ballots among them.
+        Ballots are checked across `workers` processes when greater than one, with
+        at most `in_flight` ballots queued at a time. Ballots a result `store` holds
+        results for are not verified again. Progress is recorded in `checkpoint` after
+        each chunk of ballots, resuming after the ballots it records as verified.
+        If `fail_fast` is set, InvariantFailure is raised at the first failing condition.
+        If a `sample` is given, ballots outside it are aggregated without being verified.
+        A `pool` from ballot_pool() is used in place of starting one, so that a caller
+        verifying ballots repeatedly starts its worker processes only once."""
+    ballot_selections: Invariants = Invariants('Ballot Selection Encryptions')
+    vote_limits: Invariants = Invariants('Vote Limits')
+    aggregates: Aggregates = Aggregates()
+    if checkpoint:
+        ballots = checkpoint.resume(ballots, aggregates, ballot_selections, vote_limits)
 
-    # Verify correctness of construction of replacement partial decryptions
-    reconstructed_decryptions: Invariants = Invariants('Reconstructed Partial Decryptions for Missing Guardians')
-    # Warning: the Lagrange coefficients used in reconstruction are not published. Because of this, it is impossible to verify:
-    # - whether the Lagrange coefficients are correctly computed
-    # - whether the missing tally shares, which depend on the Lagrange coefficients, are correctly computed.
-    warn('The official electionguard Python implementation fails to publish Lagrange coefficients for missing guardian reconstructions, making it impossible to verify these values. This error will be ignored by this verifier.')
-    if not reconstructed_decryptions.validate():
-        return False
+    # Chunks are verified in order, each recording how many ballots it covers, including those
+    # already held by the store or outside the sample, so that progress is counted in input ballots
+    size: int = BALLOT_CHUNK_SIZE if workers > 1 else SERIAL_CHUNK_SIZE
+    covered: deque[tuple[int, Aggregates]] = deque()
+    def unverified_chunks() -> Iterator[list[CiphertextAcceptedBallot]]:
+        chunk: list[CiphertextAcceptedBallot] = []
+        drawn: int = 0
+        stored: Aggregates = Aggregates()
+        for ballot in ballots:
+            drawn += 1
+            if sample and not sample.includes(ballot):
+                stored.add(ballot)
+                continue
+            chunk.extend(store.unverified([ballot], context.crypto_extended_base_hash, stored) if store else [ballot])
+            if len(chunk) >= size:
+                covered.append((drawn, stored))
+                yield chunk
+                chunk, drawn, stored = [], 0, Aggregates()
+        if drawn:
+            covered.append((drawn, stored))
+            yield chunk
+
+    with nullcontext(pool) if pool or workers <= 1 else ballot_pool(workers, context, constants, window) as pool:
+        if pool:
+            # Workers report their own resource usage, as they are not children of this process
+            results: Iterator = absorbed(bounded_map(pool, measured, unverified_chunks(), max(1, in_flight // BALLOT_CHUNK_SIZE), verify_ballots, context, constants, contests, window, batch, soundness, strict_residues, fail_fast))
+        else:
+            results: Iterator = (verify_ballots(chunk, context, constants, contests, window, batch, soundness, strict_residues, fail_fast) for chunk in unverified_chunks())
+        for selections, limits, products, counters in results:
+            drawn, stored = covered.popleft()
+            ballot_selections.merge(selections)
+            vote_limits.merge(limits)
+            aggregates.merge(products)
+            aggregates.merge(stored)
+            # Operations counted in worker processes are not yet reflected in this process
+            if pool:
+                COUNTERS.update(counters)
+            if checkpoint:
+                checkpoint.advance(drawn, aggregates, ballot_selections, vote_limits)
+    return ballot_selections, vote_limits, aggregates
 
-    # Verify correct decryption of tallies
-    tally_decryption: Invariants = Invariants('Decryption of Tallies')
-    for contest in plaintext_tally.contests.values():
-        tally_decryption.ensure('tally contest label exists in ballot coding file', contest.object_id in contests.contests)
-        for selection in contest.selections.values():
-            tally_decryption.ensure('B = M (∏ᵢ₌₁ⁿ Mᵢ) mod p', selection.message.data == mult_p(selection.value, *map(lambda x: x.share, selection.shares)))
-            tally_decryption.ensure('M = gᵗ mod p', selection.value == pow_p(constants.generator, selection.tally))
-    if not tally_decryption.validate():
-        return False
 
-    # Verify spoiled ballots
-    spoils: Invariants = Invariants('Spoiled Ballots')
-    for ballot in plaintext_tally.spoiled_ballots.values():
+def verify_spoiled_ballots(
+    spoiled_ballots: dict[str, dict[str, PlaintextTallyContest]],
+    context: CiphertextElectionContext,
+    constants: ElectionConstants,
+    guardians: Guardians,
+    contests: Contests,
+    window: int,
+    batch: bool = False,
+    soundness: int = SOUNDNESS,
+    strict_residues: bool = False,
+    fail_fast: bool = False
+) -> Invariants:
+    """ Returns the spoiled ballot invariants checked across the decrypted
+        `spoiled_ballots`, indexed by ballot object_id."""
+    spoils: Invariants = Invariants('Spoiled Ballots', fail_fast=fail_fast)
+    g: FixedBase = fixed_base(constants.generator, window)
+    spoiled_equations: Equations = equations_for(spoils, batch, soundness)
+    spoiled_residues: Residues = residues_for(spoils, strict_residues, soundness)
+    for ballot_id, ballot in spoiled_ballots.items():
         for contest in ballot.values():
-            tally_decryption.ensure('tally contest label exists in ballot coding file', contest.object_id in contests.contests)
+            spoils.ensure('tally contest label exists in ballot coding file', contest.object_id in contests.contests, f'{ballot_id}/{contest.object_id}')
             for selection in contest.selections.values():
+                challenge: HashPrefix = hash_prefix(context.crypto_extended_base_hash, selection.message.pad, selection.message.data)
                 for share in selection.shares:
-                    spoils.ensure('tally share contains exactly one proof or recovered part', (not share.proof) ^ (not share.recovered_parts))
+                    element: str = f'{ballot_id}/{contest.object_id}/{selection.object_id} share of {share.guardian_id}'
+                    spoils.ensure('tally share contains exactly one proof or recovered part', (not share.proof) ^ (not share.recovered_parts), element)
                     if share.proof:
-                        spoils.ensure('vᵢ ∈ Zᵩ', share.proof.response.is_in_bounds())
-                        spoils.ensure('aᵢ ∈ Zₚʳ', share.proof.pad.is_valid_residue())
-                        spoils.ensure('bᵢ ∈ Zₚʳ', share.proof.data.is_valid_residue())
-                        spoils.ensure('cᵢ = H(Q̅,A,B,aᵢ,bᵢ,Mᵢ)', share.proof.challenge == hash_elems(context.crypto_extended_base_hash, selection.message.pad, selection.message.data, share.proof.pad, share.proof.data, share.share))
-                        spoils.ensure('Aᵛⁱ = bᵢMᵢᶜⁱ (mod p)', pow_p(selection.message.pad, share.proof.response) == mult_p(share.proof.data, pow_p(share.share, share.proof.challenge)))
+                        spoils.ensure('vᵢ ∈ Zᵩ', share.proof.response.is_in_bounds(), element)
+                        spoiled_residues.check('aᵢ ∈ Zₚʳ', share.proof.pad, element)
+                        spoiled_residues.check('bᵢ ∈ Zₚʳ', share.proof.data, element)
+                        spoils.ensure('cᵢ = H(Q̅,A,B,aᵢ,bᵢ,Mᵢ)', share.proof.challenge == challenge.hash(share.proof.pad, share.proof.data, share.share), element)
+                        spoiled_equations.check('Aᵛⁱ = bᵢMᵢᶜⁱ (mod p)', [(selection.message.pad, share.proof.response)], [(share.proof.data, 1), (share.share, share.proof.challenge)], element)
                         if share.guardian_id in guardians.guardians:
-                            spoils.ensure('gᵛⁱ = aᵢKᵢᶜⁱ (mod p)', pow_p(constants.generator, share.proof.response) == mult_p(share.proof.pad, pow_p(get_first_el(guardians[share.guardian_id].coefficient_commitments), share.proof.challenge)))
+                            spoiled_equations.check('gᵛⁱ = aᵢKᵢᶜⁱ (mod p)', [(g, share.proof.response)], [(share.proof.pad, 1), (guardians.key(share.guardian_id), share.proof.challenge)], element)
                         else:
-                            spoils.ensure('tally share guardians are valid election guardians', False)
+                            spoils.ensure('tally share guardians are valid election guardians', False, element)
                     if share.recovered_parts:
                         for part in share.recovered_parts.values():
-                            spoils.ensure('vᵢₗ ∈ Zᵩ', part.proof.response.is_in_bounds())
-                            spoils.ensure('aᵢₗ ∈ Zₚʳ', part.proof.pad.is_valid_residue())
-                            spoils.ensure('bᵢₗ ∈ Zₚʳ', part.proof.data.is_valid_residue())
-                            spoils.ensure('cᵢₗ = H(Q̅,A,B,aᵢₗ,bᵢₗ,Mᵢₗ)', part.proof.challenge == hash_elems(context.crypto_extended_base_hash, selection.message.pad, selection.message.data, part.proof.pad, part.proof.data, part.share))
-                            spoils.ensure('Aᵛⁱˡ = bᵢₗMᵢₗᶜⁱˡ (mod p)', pow_p(selection.message.pad, part.proof.response) == mult_p(part.proof.data, pow_p(part.share, part.proof.challenge)))
+                            element = f'{ballot_id}/{contest.object_id}/{selection.object_id} share of {share.guardian_id} recovered by {part.guardian_id}'
+                            spoils.ensure('vᵢₗ ∈ Zᵩ', part.proof.response.is_in_bounds(), element)
+                            spoiled_residues.check('aᵢₗ ∈ Zₚʳ', part.proof.pad, element)
+                            spoiled_residues.check('bᵢₗ ∈ Zₚʳ', part.proof.data, element)
+                            spoils.ensure('cᵢₗ = H(Q̅,A,B,aᵢₗ,bᵢₗ,Mᵢₗ)', part.proof.challenge == challenge.hash(part.proof.pad, part.proof.data, part.share), element)
+                            spoiled_equations.check('Aᵛⁱˡ = bᵢₗMᵢₗᶜⁱˡ (mod p)', [(selection.message.pad, part.proof.response)], [(part.proof.data, 1), (part.share, part.proof.challenge)], element)
                             if part.guardian_id in guardians.guardians:
-                                spoils.ensure('gᵛⁱˡ = aᵢₗ(∏ⱼ₌₀ᵏ⁻¹Kᵢⱼˡʲ)ᶜⁱˡ (mod p)', pow_p(constants.generator, part.proof.response) == mult_p(part.proof.pad, pow_p(part.recovery_key, part.proof.challenge)))
+                                spoiled_equations.check('gᵛⁱˡ = aᵢₗ(∏ⱼ₌₀ᵏ⁻¹Kᵢⱼˡʲ)ᶜⁱˡ (mod p)', [(g, part.proof.response)], [(part.proof.pad, 1), (guardians.recovery_key(share.guardian_id, part.recovery_key), part.proof.challenge)], element)
                             else:
-                                spoils.ensure('tally share reconstruction guardians are valid election guardians', False)
-                spoils.ensure('B = M (∏ᵢ₌₁ⁿ Mᵢ) mod p', selection.message.data == mult_p(selection.value, *map(lambda x: x.share, selection.shares)))
-                spoils.ensure('M = gᵗ mod p', selection.value == pow_p(constants.generator, selection.tally))
-    # Warning: All other warnings also apply to spoiled ballots.
-    warn('All other warnings also apply to spoiled ballot verification steps.')
-    if not spoils.validate():
-        return False
+                                spoils.ensure('tally share reconstruction guardians are valid election guardians', False, element)
+                spoils.ensure('B = M (∏ᵢ₌₁ⁿ Mᵢ) mod p', selection.message.data == mult_p(selection.value, *map(lambda x: x.share, selection.shares)), f'{ballot_id}/{contest.object_id}/{selection.object_id}')
+                spoils.ensure('M = gᵗ mod p', selection.value == g.pow(selection.tally), f'{ballot_id}/{contest.object_id}/{selection.object_id}')
+    spoiled_equations.flush()
+    spoiled_residues.flush()
+    return spoils
 
-    # All verification steps have succeeded
-    return True
\ No newline at end of file
+
+def verify_shard(
+    description: ElectionDescription,
+    context: CiphertextElectionContext,
+    constants: ElectionConstants,
+    ciphertext_ballots: Iterable[CiphertextAcceptedBallot],
+    spoiled_ballots: dict[str, dict[str, PlaintextTallyContest]],
+    coefficient_validation_sets: Iterable[CoefficientValidationSet],
+    workers: int = 1,
+    window: int = None,
+    table_memory: int = TABLE_MEMORY,
+    batch: bool = False,
+    soundness: int = SOUNDNESS,
+    strict_residues: bool = False,
+    in_flight: int = IN_FLIGHT,
+    report: Report = None
+) -> tuple[Invariants, Invariants, Invariants, Aggregates]:
+    """ Returns the ballot selection encryption, vote limit, and spoiled ballot
+        invariants checked across one shard of an election's encrypted ballots
+        `ciphertext_ballots` and decrypted `spoiled_ballots`, along with the
+        aggregates of the shard's cast ballots. The remaining stages, which
+        depend on every ballot, are verified by passing the merged results of
+        all shards to verify(). Options are as for verify()."""
+    window = window or window_for(table_memory, 2)
+    contests: Contests = Contests(description)
+    ballot_selections, vote_limits, aggregates = verify_ballot_stream(ciphertext_ballots, context, constants, contests, window, workers, in_flight, batch, soundness, strict_residues)
+    guardians: Guardians = Guardians(coefficient_validation_sets, context.number_of_guardians, table_memory)
+    for ballot in spoiled_ballots.values():
+        guardians.expect(ballot.values())
+    spoils: Invariants = verify_spoiled_ballots(spoiled_ballots, context, constants, guardians, contests, window, batch, soundness, strict_residues)
+    for invariants in (ballot_selections, vote_limits, spoils):
+        invariants.report = report
+        invariants.validate()
+    return ballot_selections, vote_limits, spoils, aggregates
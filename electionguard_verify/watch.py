@@ -0,0 +1,117 @@
+""" watch.py
+    Nicholas Boucher 2020
+
+    Continuous verification of the encrypted ballots of an election as they are
+    published during voting, so that only the tally-level verification stages
+    remain to be run once the tally is published.
+"""
+
+from os import stat
+from os.path import exists
+from logging import info
+from typing import Iterable, Iterator
+from concurrent.futures import Executor
+from electionguard.election import CiphertextElectionContext, ElectionConstants
+from electionguard.ballot import CiphertextAcceptedBallot, BallotBoxState
+from electionguard_verify.equations import SOUNDNESS
+from electionguard_verify.checkpoint import Checkpoint
+from electionguard_verify.verify import IN_FLIGHT, verify_ballot_stream
+from electionguard_verify.utils import Invariants, Contests, Aggregates, MAX_REPORTED_FAILURES, warn
+
+
+# Default number of seconds between scans of the watched directories
+POLL_INTERVAL: float = 5
+
+
+class Watcher():
+    """Keeps the running ballot selection encryption and vote limit invariants, and the running
+       aggregates (A,B), over the encrypted ballots verified so far. A published file is only read
+       once its size and modification time are unchanged between two scans, so that files which
+       are still being written are not read. Files are assumed not to change once published."""
+
+    ballot_selections: Invariants
+    vote_limits: Invariants
+    aggregates: Aggregates
+    cast: int
+    spoiled: int
+    seen: set[str]
+    pending: dict[str, tuple[int, int]]
+    failed: set[str]
+
+    def __init__(self):
+        """Instantiate a watcher which has not yet verified any ballots."""
+        self.ballot_selections = Invariants('Ballot Selection Encryptions')
+        self.vote_limits = Invariants('Vote Limits')
+        self.aggregates = Aggregates()
+        self.cast = 0
+        self.spoiled = 0
+        self.seen = set()
+        self.pending = {}
+        self.failed = set()
+
+    def settled(self, paths: Iterable[str]) -> list[str]:
+        """Returns those of `paths` which were not returned by an earlier scan and are unchanged since
+           the previous scan, recording the state of the rest to compare against at the next scan."""
+        ready: list[str] = []
+        for path in paths:
+            if path in self.seen or not exists(path):
+                continue
+            status = stat(path)
+            state: tuple[int, int] = (status.st_size, status.st_mtime_ns)
+            if self.pending.get(path) == state:
+                del self.pending[path]
+                self.seen.add(path)
+                ready.append(path)
+            else:
+                self.pending[path] = state
+        return ready
+
+    def verify(
+        self,
+        ballots: Iterable[CiphertextAcceptedBallot],
+        context: CiphertextElectionContext,
+        constants: ElectionConstants,
+        contests: Contests,
+        window: int,
+        workers: int = 1,
+        in_flight: int = IN_FLIGHT,
+        batch: bool = False,
+        soundness: int = SOUNDNESS,
+        strict_residues: bool = False,
+        pool: Executor = None,
+        unreadable: list[str] = None
+    ) -> None:
+        """Verifies the newly published `ballots`, folding their outcome into the running invariants
+           and aggregates. Ballots are streamed as for verify(), so at most `in_flight` are queued at
+           a time and publication faster than verification leaves the backlog on disk. Each failing
+           invariant is warned about as soon as it is found, rather than once the tally is published.
+           Ballots are verified in `pool` if given, which is kept for every batch of ballots rather
+           than started for each. Files which `ballots` could not load, collected in `unreadable`
+           as it is consumed, are recorded as failed ballots."""
+        cast, spoiled = self.cast, self.spoiled
+        def counted() -> Iterator[CiphertextAcceptedBallot]:
+            for ballot in ballots:
+                if ballot.state == BallotBoxState.CAST:
+                    self.cast += 1
+                else:
+                    self.spoiled += 1
+                yield ballot
+        selections, limits, products = verify_ballot_stream(counted(), context, constants, contests, window, workers, in_flight, batch, soundness, strict_residues, pool=pool)
+        for path in unreadable or []:
+            selections.ensure('published ballot files are well-formed', False, path)
+        self.ballot_selections.merge(selections)
+        self.vote_limits.merge(limits)
+        self.aggregates.merge(products)
+        info(f'Verified {self.cast - cast} newly published cast and {self.spoiled - spoiled} spoiled encrypted ballots, {self.cast} cast and {self.spoiled} spoiled in total.')
+        for invariants in (self.ballot_selections, self.vote_limits):
+            for invariant, condition in invariants.conditions.items():
+                if not condition and invariant not in self.failed:
+                    self.failed.add(invariant)
+                    warn(f'Published encrypted ballots failed to validate invariant {invariant}, for {", ".join(invariants.failures.get(invariant, [])[:MAX_REPORTED_FAILURES]) or "unidentified elements"}.')
+
+    def checkpoint(self) -> Checkpoint:
+        """Returns an in-memory checkpoint recording the encrypted ballot stages as finished with
+           the outcome of the ballots verified so far, from which verify() runs the remaining stages."""
+        checkpoint: Checkpoint = Checkpoint()
+        checkpoint.finish(self.ballot_selections, self.vote_limits, aggregates=self.aggregates)
+        return checkpoint
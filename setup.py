@@ -12,7 +12,7 @@ setup(name='electionguard_verify',
         author='Nicholas Boucher',
         author_email='nicholas.d.boucher+electionguardpy@gmail.com',
         license='MIT',
-        packages=find_packages(),
+        packages=find_packages(exclude=['benchmarks']),
         entry_points={
             'console_scripts': ['egverify=electionguard_verify.command_line:main'],
         },
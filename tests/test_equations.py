@@ -0,0 +1,130 @@
+""" test_equations.py
+    Nicholas Boucher 2020
+
+    Behavioural tests of the exponentiation routines and of the batch checking
+    of equations: simultaneous exponentiation, fixed-base tables, and the
+    bisection of failing batches down to the equations which fail.
+"""
+
+from random import Random
+from pytest import fixture, mark
+from electionguard_verify.constants import P, Q, G
+from electionguard_verify.arithmetic import BACKENDS, backend, set_backend
+from electionguard_verify.multiexp import multiexp
+from electionguard_verify.fixed_base import FixedBase, fixed_base
+from electionguard_verify.equations import BatchEquations, Equations, equal
+from electionguard_verify.utils import Invariants, bisect
+
+
+@fixture(params=list(BACKENDS))
+def arithmetic(request):
+    """Each available arithmetic backend in turn, restoring the backend in use afterwards."""
+    previous: str = backend().name
+    yield set_backend(request.param)
+    set_backend(previous)
+
+@fixture
+def rng():
+    return Random(0)
+
+def product(terms: list[tuple[int, int]]) -> int:
+    """Returns the product of base^exponent mod p over `terms` using built-in arithmetic."""
+    result: int = 1
+    for base, exponent in terms:
+        result = result * pow(base, exponent, P) % P
+    return result
+
+def residue(rng: Random) -> int:
+    """Returns a random element of the order q subgroup."""
+    return pow(G, rng.randrange(1, Q), P)
+
+
+@mark.parametrize('exponents', [[], [0], [1], [5], [0, 1], [1, 1, 1], [Q - 1, 2], [3, 1 << 300, 7, 0]])
+def test_multiexp_edge_exponents(arithmetic, rng, exponents):
+    terms: list[tuple[int, int]] = [(rng.randrange(P), exponent) for exponent in exponents]
+    assert int(multiexp(terms)) == product(terms)
+
+@mark.parametrize('count', [2, 3, 8, 32])
+def test_multiexp_random(arithmetic, rng, count):
+    for _ in range(10):
+        terms: list[tuple[int, int]] = [(rng.randrange(P), rng.getrandbits(rng.randrange(1, Q.bit_length() + 64))) for _ in range(count)]
+        assert int(multiexp(terms)) == product(terms)
+
+@mark.parametrize('window', [1, 2, 5, 8])
+def test_fixed_base_matches_pow(arithmetic, rng, window):
+    base: int = residue(rng)
+    table: FixedBase = FixedBase(base, window)
+    for exponent in [0, 1, 2, Q - 1, (1 << Q.bit_length()) - 1] + [rng.randrange(Q) for _ in range(10)]:
+        assert int(table.raw_pow(exponent)) == pow(base, exponent, P)
+        assert int(table.pow(exponent).elem) == pow(base, exponent, P)
+
+def test_fixed_base_outside_table(arithmetic, rng):
+    base: int = residue(rng)
+    table: FixedBase = FixedBase(base, 4, 64)
+    for exponent in [1 << 64, rng.getrandbits(300), -1, -rng.randrange(Q)]:
+        assert int(table.raw_pow(exponent)) == pow(base, exponent, P)
+
+def test_fixed_base_tables_rebuilt_per_backend(rng):
+    base: int = residue(rng)
+    previous: str = backend().name
+    try:
+        for name in BACKENDS:
+            set_backend(name)
+            table: FixedBase = fixed_base(base, 3)
+            assert table is fixed_base(base, 3)
+            assert table.arithmetic.name == name
+    finally:
+        set_backend(previous)
+
+
+def equations(rng: Random, count: int, failing: set[int]) -> list[tuple[str, list, list, str]]:
+    """Returns `count` equations gᵃhᵇ = gᵃ⁺ᵇ' with h = gᵏ, of which those at indices `failing` are false."""
+    result: list[tuple[str, list, list, str]] = []
+    h_exponent: int = rng.randrange(1, Q)
+    h: int = pow(G, h_exponent, P)
+    for i in range(count):
+        a, b = rng.randrange(Q), rng.randrange(Q)
+        rhs: int = (a + b * h_exponent + (i in failing)) % Q
+        result.append(('equation holds', [(G, a), (h, b)], [(G, rhs)], f'equation-{i}'))
+    return result
+
+@mark.parametrize('failing', [set(), {0}, {5}, {3, 4, 11}, set(range(16))])
+def test_bisect_isolates_failures(rng, failing):
+    checks: list[tuple] = [('check holds', i, f'check-{i}') for i in range(16)]
+    batches: list[int] = []
+    def holds(batch: list[tuple]) -> bool:
+        batches.append(len(batch))
+        return not any(check[1] in failing for check in batch)
+    invariants: Invariants = Invariants('bisection')
+    bisect(invariants, checks, holds, lambda check: check[1] not in failing)
+    assert invariants.conditions == {'check holds': not failing}
+    assert sorted(invariants.failures.get('check holds', [])) == sorted(f'check-{i}' for i in failing)
+    if not failing:
+        assert batches == [16]
+
+@mark.parametrize('failing', [set(), {0}, {7}, {1, 6}])
+def test_batch_equations_match_exact(arithmetic, rng, failing):
+    exact: Invariants = Invariants('exact')
+    batched: Invariants = Invariants('batched')
+    checkers: list[Equations] = [Equations(exact), BatchEquations(batched, size=3)]
+    for invariant, lhs, rhs, element in equations(rng, 8, failing):
+        for checker in checkers:
+            checker.check(invariant, lhs, rhs, element)
+    for checker in checkers:
+        checker.flush()
+    assert batched.conditions == exact.conditions == {'equation holds': not failing}
+    assert sorted(batched.failures.get('equation holds', [])) == sorted(exact.failures.get('equation holds', [])) == sorted(f'equation-{i}' for i in failing)
+
+def test_batch_rejects_order_two_component(arithmetic, rng):
+    h: int = residue(rng)
+    # -h and h differ only in the order 2 component, which an even random exponent would cancel
+    equation: tuple = ('equation holds', [(P - h, 1)], [(h, 1)], 'negated')
+    assert not equal(equation[1], equation[2])
+    checker: BatchEquations = BatchEquations(Invariants('batched'))
+    assert not any(checker.holds([equation]) for _ in range(16))
+
+def test_batch_rejects_out_of_range_bases(arithmetic, rng):
+    h: int = residue(rng)
+    checker: BatchEquations = BatchEquations(Invariants('batched'))
+    assert not checker.holds([('equation holds', [(h + P, 1)], [(h, 1)], 'unreduced')])
+    assert not checker.holds([('equation holds', [(0, 1)], [(0, 1)], 'zero')])
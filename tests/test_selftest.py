@@ -0,0 +1,32 @@
+""" test_selftest.py
+    Nicholas Boucher 2020
+
+    Differential tests of every available arithmetic backend and of the hash
+    implementation against built-in integer arithmetic and the electionguard
+    package, as run at runtime by `egverify self-test`.
+"""
+
+from random import Random
+from pytest import fixture, mark
+from electionguard_verify.arithmetic import BACKENDS, backend, set_backend
+from electionguard_verify.selftest import TRIALS, self_test, check_backend
+
+# Seeds from which the random inputs of each differential test are drawn
+SEEDS: list[int] = [0, 1, 2]
+
+
+@fixture(params=list(BACKENDS))
+def arithmetic(request):
+    """Each available arithmetic backend in turn, restoring the backend in use afterwards."""
+    previous: str = backend().name
+    yield set_backend(request.param)
+    set_backend(previous)
+
+@mark.parametrize('seed', SEEDS)
+def test_backend_matches_builtin_arithmetic(arithmetic, seed):
+    assert check_backend(Random(seed), TRIALS) == []
+
+def test_self_test_covers_every_backend():
+    previous: str = backend().name
+    assert self_test(trials=5) == {name: [] for name in BACKENDS}
+    assert backend().name == previous
@@ -0,0 +1,66 @@
+""" test_shard.py
+    Nicholas Boucher 2020
+
+    Tests of distributed verification, running the shards of a generated election
+    as separate processes and merging their partial results.
+"""
+
+from sys import executable
+from os import remove
+from os.path import join, split, dirname, abspath
+from json import load, dump
+from shutil import copytree
+from subprocess import Popen, run
+from pytest import fixture
+from electionguard.publish import BALLOTS_DIR
+from electionguard_verify.loader import json_files
+from benchmarks.generate import Parameters, generate
+
+SHARDS: int = 3
+# Source checkout in which the command line utility is run
+ROOT: str = dirname(dirname(abspath(__file__)))
+# Runs the command line utility, with its subcommand and arguments following
+EGVERIFY: list[str] = [executable, '-c', 'import sys; from electionguard_verify.command_line import main; sys.exit(main())']
+
+
+@fixture(scope='module')
+def election(tmp_path_factory) -> str:
+    """The results directory of a small generated election."""
+    directory: str = str(tmp_path_factory.mktemp('election'))
+    generate(directory, Parameters(guardians=3, quorum=2, missing=1, contests=2, selections=2, ballots=8, spoiled=2, seed=0))
+    return directory
+
+@fixture(scope='module')
+def partials(election, tmp_path_factory) -> list[str]:
+    """The partial results of every shard of `election`, verified by concurrent processes."""
+    output: str = str(tmp_path_factory.mktemp('partials'))
+    paths: list[str] = [join(output, f'shard_{index}.json') for index in range(SHARDS)]
+    shards: list[Popen] = [Popen(EGVERIFY + ['shard', election, '--shard-index', str(index), '--shard-count', str(SHARDS), '-o', path, '-n'], cwd=ROOT)
+                           for index, path in enumerate(paths)]
+    assert all(shard.wait() == 0 for shard in shards)
+    return paths
+
+def merge(election: str, paths: list[str]) -> int:
+    """Returns the exit status of merging the partial results at `paths` for `election`."""
+    return run(EGVERIFY + ['merge', election, *paths, '-n'], cwd=ROOT).returncode
+
+def test_merge_of_every_shard(election, partials):
+    assert merge(election, partials) == 0
+
+def test_merge_with_missing_shard(election, partials):
+    assert merge(election, partials[1:]) != 0
+
+def test_merge_with_tampered_partial(election, partials, tmp_path):
+    with open(partials[0]) as f:
+        signed: dict = load(f)
+    signed['result']['files'] += 1
+    tampered: str = str(tmp_path / 'tampered.json')
+    with open(tampered, 'w') as f:
+        dump(signed, f)
+    assert merge(election, [tampered] + partials[1:]) != 0
+
+def test_merge_over_different_ballots(election, partials, tmp_path):
+    changed: str = str(tmp_path / 'election')
+    copytree(election, changed)
+    remove(json_files(join(changed, split(BALLOTS_DIR)[-1]))[0])
+    assert merge(changed, partials) != 0
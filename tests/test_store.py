@@ -0,0 +1,90 @@
+""" test_store.py
+    Nicholas Boucher 2020
+
+    Tests of where the result store is kept, of opening it from read-only directories,
+    and of the digests under which ballot results are stored.
+"""
+
+from os import chmod, geteuid, stat
+from os.path import join, dirname
+from argparse import Namespace
+from types import SimpleNamespace
+from sqlite3 import Error as SQLiteError
+from pytest import fixture, mark, raises
+from electionguard.ballot import BallotBoxState
+from electionguard_verify.constants import Q
+from electionguard_verify.pack import SELECTION_COLUMNS, CONTEST_COLUMNS
+from electionguard_verify.store import ResultStore, STORE_FILE_NAME, STORE_SIZE, ballot_digest
+from electionguard_verify.command_line import open_store
+
+# File permissions are not enforced for the superuser
+requires_permissions = mark.skipif(geteuid() == 0, reason='file permissions are not enforced for root')
+
+
+@fixture
+def directory(tmp_path, monkeypatch):
+    """An election directory which is made read-only by tests, and writable again afterwards,
+       with the user's cache directory kept outside it."""
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / 'cache'))
+    election = tmp_path / 'election'
+    election.mkdir()
+    mode: int = stat(election).st_mode
+    yield election
+    chmod(election, mode)
+
+def store_args(directory, result_store: str = None) -> Namespace:
+    """Returns the parsed command line arguments opening the result store `result_store` for `directory`."""
+    return Namespace(directory=str(directory), result_store=result_store, result_store_size=STORE_SIZE // (1024 * 1024), rebuild_cache=False)
+
+def test_default_store_outside_election_directory(directory):
+    store: ResultStore = open_store(store_args(directory))
+    assert store is not None
+    assert not store.path.startswith(str(directory))
+    store.close()
+
+def test_default_store_per_election_directory(directory, tmp_path):
+    other = tmp_path / 'other'
+    other.mkdir()
+    first: ResultStore = open_store(store_args(directory))
+    second: ResultStore = open_store(store_args(other))
+    assert dirname(first.path) != dirname(second.path)
+    first.close()
+    second.close()
+
+@requires_permissions
+def test_default_store_with_read_only_election_directory(directory):
+    chmod(directory, 0o555)
+    store: ResultStore = open_store(store_args(directory))
+    assert store is not None
+    store.close()
+
+@requires_permissions
+def test_new_store_in_read_only_directory(directory):
+    path: str = join(directory, STORE_FILE_NAME)
+    chmod(directory, 0o555)
+    with raises(SQLiteError):
+        ResultStore(path)
+    assert open_store(store_args(directory, path)) is None
+
+@requires_permissions
+def test_existing_read_only_store(directory):
+    path: str = join(directory, STORE_FILE_NAME)
+    ResultStore(path).close()
+    chmod(path, 0o444)
+    chmod(directory, 0o555)
+    with raises(SQLiteError):
+        ResultStore(path)
+    assert open_store(store_args(directory, path)) is None
+
+def ballot_with(value: int) -> SimpleNamespace:
+    """Returns a stand-in for a ballot of one contest and one selection, every value of which is `value`."""
+    def columns(names: list[tuple[str, str, int]]) -> dict[str, SimpleNamespace]:
+        return {group: SimpleNamespace(**{attribute: SimpleNamespace(elem=value) for g, attribute, _ in names if g == group}) for group, _, _ in names}
+    selection = SimpleNamespace(object_id='selection', is_placeholder_selection=False, **columns(SELECTION_COLUMNS))
+    contest = SimpleNamespace(object_id='contest', ballot_selections=[selection], **columns(CONTEST_COLUMNS))
+    return SimpleNamespace(object_id='ballot', state=BallotBoxState.CAST, contests=[contest])
+
+def test_digest_of_out_of_range_values():
+    extended_base_hash = SimpleNamespace(elem=1)
+    digests: set[bytes] = {ballot_digest(ballot_with(value), extended_base_hash) for value in (1, -1, 1 << 256, Q << 4096)}
+    assert len(digests) == 4
@@ -0,0 +1,29 @@
+""" test_stream.py
+    Nicholas Boucher 2020
+
+    Tests of the incremental JSON reader against values split across reads.
+"""
+
+from json import loads
+from pytest import mark
+from electionguard_verify.stream import JSONReader, members_at
+
+TEXT: str = '{"a":1.5e10,"b":true,"c":[1,-2.25E-3,3],"d":12345678901234567890,"e":{"f":"1.5"},"g":null}'
+
+
+@mark.parametrize('size', range(1, len(TEXT) + 2))
+def test_values_split_across_reads(tmp_path, size):
+    path = tmp_path / 'split.json'
+    path.write_text(TEXT)
+    with open(path) as f:
+        reader: JSONReader = JSONReader(f, size)
+        values: dict = {key: reader.value() for key in reader.members()}
+    assert values == loads(TEXT)
+
+@mark.parametrize('size', [1, 2, 3, 7, 9])
+def test_skipped_members_split_across_reads(tmp_path, size):
+    path = tmp_path / 'split.json'
+    path.write_text(TEXT)
+    with open(path) as f:
+        members: dict = dict(members_at(JSONReader(f, size), (), lambda key: key == 'b'))
+    assert members == {'a': None, 'b': True, 'c': None, 'd': None, 'e': None, 'g': None}